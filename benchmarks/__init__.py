@@ -0,0 +1,38 @@
+"""Standalone benchmarks. Run from the repository root, e.g. ``python -m benchmarks.renderers``.
+
+Unless ``DATABASE_URL`` is set they run against a throwaway in-memory SQLite database.
+"""
+import logging
+import os
+import statistics
+import time
+
+
+def setup_django(migrate=True):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "spyCatsTest.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("DATABASE_URL", "sqlite://:memory:")
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    # settings.LOGGING echoes every statement; that would drown the numbers.
+    logging.getLogger("django.db.backends").setLevel(logging.WARNING)
+    if migrate:
+        call_command("migrate", verbosity=0)
+
+
+def timeit(func, repeat=5, number=1):
+    """Run ``func`` ``number`` times per round and return the per-call timings (seconds) of each round."""
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return rounds
+
+
+def report(label, rounds):
+    print(f"{label:<40} best {min(rounds) * 1000:9.3f} ms   median {statistics.median(rounds) * 1000:9.3f} ms")
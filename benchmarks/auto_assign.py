@@ -0,0 +1,87 @@
+"""Assign free cats to open missions one by one (what ``PATCH /missions/<id>/assign-cat/`` does per call)
+vs ``missions.assignment.auto_assign()``.
+
+One by one, every mission costs the serializer's "cat already has an active mission" query and a save;
+that is timed on ``--one-by-one`` missions and extrapolated. ``auto_assign()`` does all ``--missions``
+(1 to 3 targets each, as many cats) with two selects and one update per ``--batch-size``.
+
+    python -m benchmarks.auto_assign --missions 100000
+"""
+import argparse
+import time
+
+from benchmarks import report, setup_django
+
+
+def build(count):
+    from decimal import Decimal
+
+    from cats.models import SpyCat
+    from missions.models import Mission, Target
+
+    SpyCat.objects.bulk_create(
+        (SpyCat(name=f"Cat {i}", years_of_experience=i % 15, breed="Siamese", salary=Decimal("1234.56"))
+         for i in range(count)), batch_size=5000,
+    )
+    missions = Mission.objects.bulk_create((Mission(completed_at=None) for _ in range(count)), batch_size=5000)
+    Target.objects.bulk_create(
+        (Target(mission=m, name=f"Target {i}", country="UA") for m in missions for i in range(1 + m.pk % 3)),
+        batch_size=5000,
+    )
+
+
+def reset():
+    from missions.models import Mission
+
+    Mission.objects.update(cat=None)
+
+
+def one_by_one(count):
+    from cats.models import SpyCat
+    from missions.assignment import free_cats, open_missions
+    from missions.serializers import MissionAssignCatSerializer
+
+    cat_ids = list(free_cats().values_list("pk", flat=True)[:count])
+    missions = list(open_missions().only("id", "cat_id", "completed_at")[:count])
+    for mission, cat_id in zip(missions, cat_ids):
+        serializer = MissionAssignCatSerializer(mission, data={"cat": cat_id}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+    return len(missions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--missions", type=int, default=100_000)
+    parser.add_argument("--one-by-one", type=int, default=2000, help="missions assigned one by one")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from missions.assignment import auto_assign
+
+    started = time.perf_counter()
+    build(args.missions)
+    print(f"{args.missions} cats, {args.missions} missions built in {time.perf_counter() - started:.1f} s\n")
+
+    rounds = []
+    for _ in range(args.repeat):
+        reset()
+        started = time.perf_counter()
+        done = one_by_one(args.one_by_one)
+        rounds.append((time.perf_counter() - started) / done * args.missions)
+    report(f"one by one (x{args.missions // args.one_by_one} of {args.one_by_one})", rounds)
+
+    rounds = []
+    for _ in range(args.repeat):
+        reset()
+        started = time.perf_counter()
+        _, assigned = auto_assign(mission_order="targets", batch_size=args.batch_size)
+        rounds.append(time.perf_counter() - started)
+        assert len(assigned) == args.missions, len(assigned)
+    report("auto_assign()", rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Delete unassigned missions (3 targets with notes each) with ``QuerySet.delete()`` vs ``bulk_delete()``.
+
+``delete()`` is what ``DELETE /missions/<id>/`` used to do: Django's collector loads every target and
+note and cascades in Python. ``bulk_delete()`` runs one statement per table and batch.
+
+    python -m benchmarks.bulk_delete --missions 5000 --batch-size 500
+"""
+import argparse
+import time
+
+from benchmarks import report, setup_django
+
+
+def build_missions(count):
+    from missions.models import Mission, Note, Target
+
+    missions = Mission.objects.bulk_create(Mission() for _ in range(count))
+    targets = Target.objects.bulk_create(
+        Target(mission=m, name=f"Target {i}", country="UA") for m in missions for i in range(3)
+    )
+    Note.objects.bulk_create(Note(target=t, text="Observe north perimeter at 03:00") for t in targets)
+
+
+def delete_all(method, batch_size):
+    from missions.models import Mission
+
+    while True:
+        ids = list(Mission.objects.filter(cat__isnull=True).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return
+        getattr(Mission.objects.filter(id__in=ids), method)()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--missions", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    print(f"{args.missions} missions, {args.missions * 3} targets and notes, batches of {args.batch_size}")
+    for method in ("delete", "bulk_delete"):
+        rounds = []
+        for _ in range(args.repeat):
+            build_missions(args.missions)
+            started = time.perf_counter()
+            delete_all(method, args.batch_size)
+            rounds.append(time.perf_counter() - started)
+        report(f"QuerySet.{method}()", rounds)
+
+
+if __name__ == "__main__":
+    main()
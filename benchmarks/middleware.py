@@ -0,0 +1,67 @@
+"""Per-request cost of the middleware stack on API routes: lean (``API_PATH_PREFIXES``) vs the whole stack.
+
+Each request goes through a real ``WSGIHandler`` built with either setting, once as an anonymous client and
+once carrying the session cookie of a logged-in admin (the case where sessions and auth cost queries).
+The views are the same for both stacks, so the difference is what the skipped middleware costs.
+
+    python -m benchmarks.middleware [--requests 2000]
+"""
+import argparse
+import os
+
+from benchmarks import report, setup_django, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000, help="requests per round")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("THROTTLE_USER_RATE", "")
+    os.environ.setdefault("THROTTLE_ANON_RATE", "")
+    setup_django()
+    from decimal import Decimal
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connection
+    from django.test import Client, RequestFactory, override_settings
+
+    from cats.models import SpyCat
+
+    cats = SpyCat.objects.bulk_create(
+        SpyCat(name=f"Cat {i}", years_of_experience=i % 10, breed="Siamese", salary=Decimal("1234.56"))
+        for i in range(20)
+    )
+    admin = get_user_model().objects.create_superuser("admin", password="benchmark")
+    browser = Client()
+    browser.force_login(admin)
+    session_cookie = f"{settings.SESSION_COOKIE_NAME}={browser.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    handlers = {"lean": WSGIHandler()}
+    with override_settings(API_PATH_PREFIXES=[]):
+        handlers["full"] = WSGIHandler()
+
+    def start_response(status, headers):
+        assert status.startswith("200"), status
+
+    factory = RequestFactory(HTTP_HOST="localhost")
+    for path in (f"/cats/{cats[0].pk}/", "/cats/?ordering=id"):
+        for client, extra in (("anonymous", {}), ("admin session", {"HTTP_COOKIE": session_cookie})):
+            print(f"\nGET {path}, {client}")
+            for name, handler in handlers.items():
+                def request():
+                    # The handler reads (and closes) wsgi.input; give each request a fresh copy.
+                    b"".join(handler(factory.get(path, **extra).environ, start_response))
+
+                queries = []
+                with connection.execute_wrapper(lambda execute, sql, *params: queries.append(sql) or execute(sql, *params)):
+                    request()
+                rounds = timeit(request, repeat=args.repeat, number=args.requests)
+                report(f"  {name} stack ({len(queries)} queries)", rounds)
+
+
+if __name__ == "__main__":
+    main()
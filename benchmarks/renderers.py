@@ -0,0 +1,64 @@
+"""Compare DRF's stdlib ``JSONRenderer`` with the orjson/msgpack renderers on 1k-mission pages.
+
+    python -m benchmarks.renderers [--missions 1000]
+"""
+import argparse
+
+from benchmarks import report, setup_django, timeit
+
+
+def build_missions(count):
+    from decimal import Decimal
+
+    from cats.models import SpyCat
+    from missions.models import Mission, Note, Target
+
+    cats = SpyCat.objects.bulk_create(
+        SpyCat(name=f"Cat {i}", years_of_experience=i % 10, breed="Siamese", salary=Decimal("1234.56"))
+        for i in range(count)
+    )
+    missions = Mission.objects.bulk_create(Mission(cat=cat) for cat in cats)
+    targets = Target.objects.bulk_create(
+        Target(mission=m, name=f"Target {i}", country="UA", completed=bool(i % 2))
+        for m in missions for i in range(3)
+    )
+    Note.objects.bulk_create(Note(target=t, text="Observe north perimeter at 03:00") for t in targets)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--missions", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+
+    from cats.models import SpyCat
+    from core.renderers import MessagePackRenderer, ORJSONRenderer
+    from missions.models import Mission
+    from missions.serializers import MissionSerializer
+
+    build_missions(args.missions)
+    payloads = {
+        "MissionSerializer page": {
+            "count": args.missions,
+            "results": MissionSerializer(Mission.objects.with_fieldset(), many=True).data,
+        },
+        # Raw values: Decimal and datetime objects go through the renderers' fallback encoders.
+        "raw cat rows (Decimal)": list(SpyCat.objects.values()),
+    }
+    renderers = {
+        "JSONRenderer (stdlib)": JSONRenderer(),
+        "ORJSONRenderer": ORJSONRenderer(),
+        "MessagePackRenderer": MessagePackRenderer(),
+    }
+    for payload_name, payload in payloads.items():
+        print(f"\n{payload_name}")
+        for name, renderer in renderers.items():
+            size = len(renderer.render(payload))
+            report(f"  {name} ({size // 1024} KiB)", timeit(lambda: renderer.render(payload), repeat=args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Many concurrent subscribers of ``/missions/<id>/events/`` on the ASGI application, in process.
+
+Opens ``--subscribers`` streams, reports the memory and threads they hold while idle, then
+publishes ``--events`` events from a worker thread (like a sync write would) and measures how long
+it takes until every subscriber has received each one.
+
+    python -m benchmarks.sse --subscribers 5000 --events 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from benchmarks import setup_django
+
+
+class Subscriber:
+    def __init__(self, app, path):
+        self.app = app
+        self.path = path
+        self.chunks = 0
+        self.received = asyncio.Event()
+        self.ready = asyncio.Event()
+        self._disconnect = asyncio.Event()
+        self._request_sent = False
+
+    async def run(self):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": self.path, "raw_path": self.path.encode(), "query_string": b"",
+            "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 1), "server": ("localhost", 80),
+        }
+        await self.app(scope, self._receive, self._send)
+
+    async def _receive(self):
+        if not self._request_sent:
+            self._request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message):
+        if message["type"] != "http.response.body" or not message.get("body"):
+            return
+        self.chunks += 1
+        if self.chunks == 1:
+            self.ready.set()
+        else:
+            self.received.set()
+
+    def disconnect(self):
+        self._disconnect.set()
+
+
+async def main(subscribers, events):
+    from core.pubsub import get_broker
+    from missions.events import mission_topic
+    from missions.models import Mission
+    from spyCatsTest.asgi import application as app
+
+    mission = await Mission.objects.acreate()
+    path = f"/missions/{mission.id}/events/"
+    broker = get_broker()
+
+    threads = threading.active_count()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    clients = [Subscriber(app, path) for _ in range(subscribers)]
+    tasks = [asyncio.create_task(client.run()) for client in clients]
+    await asyncio.gather(*(client.ready.wait() for client in clients))
+    connect_time = time.perf_counter() - started
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"{subscribers} subscribers connected in {connect_time:.2f} s")
+    print(f"idle: {held / subscribers / 1024:.1f} KiB per subscriber, "
+          f"{threading.active_count() - threads} extra threads in total")
+
+    latencies = []
+    for number in range(events):
+        for client in clients:
+            client.received.clear()
+        message = {"event": "target", "data": {"id": number, "completed": True}}
+        started = time.perf_counter()
+        threading.Thread(target=broker.publish, args=(mission_topic(mission.id), message)).start()
+        await asyncio.gather(*(client.received.wait() for client in clients))
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    print(f"fan-out to all subscribers: median {statistics.median(latencies) * 1000:.1f} ms, "
+          f"max {latencies[-1] * 1000:.1f} ms")
+
+    for client in clients:
+        client.disconnect()
+    await asyncio.wait(tasks, timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=20)
+    args = parser.parse_args()
+
+    # The async view reaches the database from a worker thread, which can't see an in-memory database.
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/sse.sqlite3")
+    setup_django()
+    asyncio.run(main(args.subscribers, args.events))
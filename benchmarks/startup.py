@@ -0,0 +1,91 @@
+"""Worker startup profile: time to first request and per-package import cost (``-X importtime``).
+
+Every run boots the WSGI application in a fresh interpreter and serves one request through it,
+like a freshly (re)started gunicorn worker does.
+
+    python -m benchmarks.startup                                   # default settings
+    python -m benchmarks.startup --env DJANGO_DOCS_ENABLED=0 --env DJANGO_ADMIN_ENABLED=0
+"""
+import argparse
+import collections
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BOOT = r"""
+import io, sys, time
+t0 = time.time()
+from spyCatsTest.wsgi import application
+t1 = time.time()
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": sys.argv[1], "QUERY_STRING": "", "SERVER_NAME": "localhost",
+    "SERVER_PORT": "80", "HTTP_HOST": "localhost", "REMOTE_ADDR": "127.0.0.1",
+    "wsgi.input": io.BytesIO(), "wsgi.url_scheme": "http", "wsgi.errors": sys.stderr,
+}
+status = []
+b"".join(application(environ, lambda s, h, *a: status.append(s)))
+t2 = time.time()
+print("BOOT", t0, t1, t2, status[0], flush=True)
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def boot(env, path, importtime=False):
+    cmd = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", BOOT, path]
+    started = time.time()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+    line = next(ln for ln in proc.stdout.splitlines() if ln.startswith("BOOT"))
+    _, t0, t1, t2, status = line.split(" ", 4)
+    return {
+        "interpreter": float(t0) - started,
+        "app_load": float(t1) - float(t0),
+        "first_request": float(t2) - float(t1),
+        "total": float(t2) - started,
+        "status": status,
+    }, proc.stderr
+
+
+def import_report(stderr, top=20):
+    by_package = collections.Counter()
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            by_package[match[4].split(".")[0]] += int(match[1])
+    total = sum(by_package.values())
+    print(f"\nImport cost by top-level package (self time, total {total / 1000:.0f} ms):")
+    for package, micros in by_package.most_common(top):
+        print(f"  {package:<28}{micros / 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/cats/", help="URL of the first request")
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the booted app")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "spyCatsTest.settings")
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.setdefault("DATABASE_URL", f"sqlite:///{workdir}/startup.sqlite3")
+    env.update(item.split("=", 1) for item in args.env)
+    subprocess.run([sys.executable, "manage.py", "migrate", "--noinput", "-v0"], env=env, check=True,
+                   capture_output=True)
+
+    runs = [boot(env, args.path)[0] for _ in range(args.runs)]
+    print(f"First request to {args.path}: HTTP {runs[0]['status']} (median of {args.runs} runs)")
+    for phase in ("interpreter", "app_load", "first_request", "total"):
+        print(f"  {phase:<16}{statistics.median(r[phase] for r in runs) * 1000:8.1f} ms")
+
+    _, stderr = boot(env, args.path, importtime=True)
+    import_report(stderr)
+
+
+if __name__ == "__main__":
+    main()
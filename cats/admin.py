@@ -1,5 +1,13 @@
 from django.contrib import admin
 
 from cats.models import SpyCat
+from core.pagination import EstimatedCountPaginator
 
-admin.site.register(SpyCat)
+
+@admin.register(SpyCat)
+class SpyCatAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "breed", "years_of_experience", "salary")
+    search_fields = ("=id", "^name")
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
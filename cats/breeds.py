@@ -0,0 +1,60 @@
+"""Local copy of TheCatAPI breed registry, so creating a cat doesn't wait on the external API.
+
+The copy is refreshed in the background (task ``cats.refresh_breeds``) once it is older than
+``BREEDS_REFRESH_SECONDS``; the API is called inline only while there is no copy at all.
+"""
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from cats.models import Breed
+
+
+class BreedRegistryUnavailable(Exception):
+    pass
+
+
+def fetch_breed_names():
+    """Lowercased breed names and alternative names from TheCatAPI."""
+    try:
+        response = requests.get(settings.BREEDS_API_URL, timeout=settings.BREEDS_API_TIMEOUT)
+    except requests.RequestException as exc:
+        raise BreedRegistryUnavailable(str(exc)) from exc
+    if response.status_code != 200:
+        raise BreedRegistryUnavailable(f"TheCatAPI responded {response.status_code}")
+
+    names = set()
+    for breed_data in response.json():
+        names.add(breed_data["name"].strip().lower())
+        if breed_data.get("alt_names"):
+            names.update(alt.strip().lower() for alt in breed_data["alt_names"].split(",") if alt.strip())
+    return names
+
+
+def refresh_breeds():
+    names = fetch_breed_names()
+    now = timezone.now()
+    with transaction.atomic():
+        Breed.objects.all().delete()
+        # Another request refreshing at the same time may have committed the same names since the delete.
+        Breed.objects.bulk_create(
+            [Breed(name=name, refreshed_at=now) for name in names],
+            update_conflicts=True, unique_fields=["name"], update_fields=["refreshed_at"],
+        )
+    return len(names)
+
+
+def is_known_breed(breed):
+    """Whether ``breed`` is in the registry; raises ``BreedRegistryUnavailable`` if there is no copy yet."""
+    refreshed_at = Breed.objects.aggregate(at=Max("refreshed_at"))["at"]
+    if refreshed_at is None:
+        refresh_breeds()
+    elif refreshed_at < timezone.now() - timedelta(seconds=settings.BREEDS_REFRESH_SECONDS):
+        from cats.tasks import refresh_breeds_task
+
+        refresh_breeds_task.enqueue(unique=True)
+    return Breed.objects.filter(name=breed.lower()).exists()
@@ -0,0 +1,167 @@
+"""``GET /cats/<id>/dashboard/``: a cat, its active mission (targets, notes) and its completed count.
+
+Built with three queries and cached per cat under a version key. Every write that can change a
+dashboard drops its cat's version once the transaction commits, so the next request builds it again
+under a new version (also the response's ``ETag``). That only works if every process sees the drop:
+without ``CACHE_SHARED`` dashboards are built on every request and the ``ETag`` is a hash of the data.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+from rest_framework import serializers
+
+from cats.models import SpyCat
+from cats.serializers import SpyCatSerializer
+from core.signals import rows_deleted, rows_saved
+from missions.assignment import missions_assigned
+from missions.models import Mission, MissionArchive, Note, Target
+from missions.serializers import MissionSerializer
+
+
+class SpyCatDashboardSerializer(serializers.Serializer):
+    cat = SpyCatSerializer()
+    active_mission = MissionSerializer(allow_null=True)
+    completed_missions = serializers.IntegerField(help_text="Completed missions, archived ones included.")
+
+
+def _count(queryset):
+    counted = queryset.order_by().values("cat_id").annotate(count=Count("*")).values("count")
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def build_dashboard(cat_id):
+    """The dashboard data of ``cat_id``, or None when there is no such cat."""
+    cat = SpyCat.objects.annotate(
+        completed_live=_count(Mission.objects.filter(cat_id=OuterRef("pk"), completed_at__isnull=False)),
+        completed_archived=_count(MissionArchive.objects.filter(cat_id=OuterRef("pk"))),
+    ).filter(pk=cat_id).first()
+    if cat is None:
+        return None
+    # A cat has at most one active mission (AssignCat enforces it).
+    active_mission = Mission.objects.filter(cat_id=cat_id, completed_at__isnull=True).prefetch_related(
+        Prefetch("targets", queryset=Target.objects.select_related("note"))
+    ).first()
+    return SpyCatDashboardSerializer({
+        "cat": cat,
+        "active_mission": active_mission,
+        "completed_missions": cat.completed_live + cat.completed_archived,
+    }).data
+
+
+def cache_enabled():
+    return settings.CACHE_SHARED and settings.DASHBOARD_CACHE_SECONDS > 0
+
+
+def content_etag(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def version_key(cat_id):
+    return f"cat-dashboard-version:{cat_id}"
+
+
+def dashboard_version(cat_id):
+    key = version_key(cat_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def get_dashboard(cat_id, version):
+    """Cached ``build_dashboard()`` for the current ``version`` of the cat."""
+    key = f"cat-dashboard:{cat_id}:{version}"
+    data = cache.get(key)
+    if data is None:
+        data = build_dashboard(cat_id)
+        if data is not None:
+            cache.set(key, data, settings.DASHBOARD_CACHE_SECONDS)
+    return data
+
+
+def invalidate(cat_ids, using="default"):
+    """Give the cats' dashboards a new version once the current transaction commits."""
+    keys = [version_key(cat_id) for cat_id in set(cat_ids) if cat_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys), using=using)
+
+
+def _mission_cat_ids(using, **lookup):
+    return Mission.objects.using(using).filter(**lookup).values_list("cat_id", flat=True)
+
+
+def cat_written(sender, instance, using, **kwargs):
+    invalidate([instance.pk], using)
+
+
+def cats_written(sender, pks, using, **kwargs):
+    invalidate(pks, using)
+
+
+def mission_saving(sender, instance, using, **kwargs):
+    # Loaded without cat_id: read the cat it belongs to before the save can move it.
+    if not instance._state.adding and not hasattr(instance, "loaded_cat_id"):
+        instance.loaded_cat_id = _mission_cat_ids(using, pk=instance.pk).first()
+
+
+def mission_written(sender, instance, using, **kwargs):
+    # Both the cat it now has and the one it had: a reassigned mission leaves that cat's dashboard.
+    invalidate([instance.cat_id, getattr(instance, "loaded_cat_id", None)], using)
+    instance.loaded_cat_id = instance.cat_id
+
+
+def missions_assigned_in_bulk(sender, assignments, using, **kwargs):
+    invalidate(assignments.values(), using)
+
+
+def target_written(sender, instance, using, **kwargs):
+    if Target.mission.is_cached(instance):
+        invalidate([instance.mission.cat_id], using)
+    else:
+        invalidate(_mission_cat_ids(using, pk=instance.mission_id), using)
+
+
+def targets_saved(sender, pks, using, **kwargs):
+    invalidate(_mission_cat_ids(using, targets__pk__in=pks), using)
+
+
+def note_written(sender, instance, using, **kwargs):
+    if Note.target.is_cached(instance) and Target.mission.is_cached(instance.target):
+        invalidate([instance.target.mission.cat_id], using)
+    else:
+        invalidate(_mission_cat_ids(using, targets__pk=instance.target_id), using)
+
+
+def notes_saved(sender, pks, using, parents=None, **kwargs):
+    if parents is not None:
+        invalidate([cat_id for _, _, cat_id in parents.values()], using)
+    else:
+        invalidate(_mission_cat_ids(using, targets__note__pk__in=pks), using)
+
+
+post_save.connect(cat_written, sender=SpyCat, dispatch_uid="cats-dashboard-cat-saved")
+post_delete.connect(cat_written, sender=SpyCat, dispatch_uid="cats-dashboard-cat-deleted")
+rows_saved.connect(cats_written, sender=SpyCat, dispatch_uid="cats-dashboard-cats-saved")
+rows_deleted.connect(cats_written, sender=SpyCat, dispatch_uid="cats-dashboard-cats-deleted")
+pre_save.connect(mission_saving, sender=Mission, dispatch_uid="cats-dashboard-mission-saving")
+post_save.connect(mission_written, sender=Mission, dispatch_uid="cats-dashboard-mission-saved")
+post_delete.connect(mission_written, sender=Mission, dispatch_uid="cats-dashboard-mission-deleted")
+missions_assigned.connect(missions_assigned_in_bulk, dispatch_uid="cats-dashboard-missions-assigned")
+post_save.connect(target_written, sender=Target, dispatch_uid="cats-dashboard-target-saved")
+post_delete.connect(target_written, sender=Target, dispatch_uid="cats-dashboard-target-deleted")
+rows_saved.connect(targets_saved, sender=Target, dispatch_uid="cats-dashboard-targets-saved")
+post_save.connect(note_written, sender=Note, dispatch_uid="cats-dashboard-note-saved")
+post_delete.connect(note_written, sender=Note, dispatch_uid="cats-dashboard-note-deleted")
+rows_saved.connect(notes_saved, sender=Note, dispatch_uid="cats-dashboard-notes-saved")
+# Not needed: rows_saved of missions (completed_at follows a target write, which already dropped the
+# version; cat=None is set on a cat that is being deleted; bulk assignment sends missions_assigned),
+# rows_deleted of missions/targets/notes (only unassigned missions are bulk deleted; archiving keeps the
+# completed count).
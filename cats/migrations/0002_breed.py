@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Breed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
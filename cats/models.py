@@ -1,7 +1,60 @@
-from django.db import models
+from django.apps import apps
+from django.db import connections, models, router, transaction
 
-class SpyCat(models.Model):
+from core.models import AtomicSaveModel
+from core.signals import rows_deleted, rows_saved
+
+
+class SpyCatQuerySet(models.QuerySet):
+    def with_fieldset(self, fieldset=None, expand=None):
+        """Load only what a ``SpyCatSerializer`` limited to ``fieldset``/``expand`` is going to read."""
+        expand = expand or {}
+        queryset = self
+        if fieldset is not None:
+            columns = {f.name for f in self.model._meta.concrete_fields}
+            queryset = queryset.only(*(name for name in fieldset if name in columns))
+        if "missions" in expand and (fieldset is None or "missions" in fieldset):
+            mission_model = self.model._meta.get_field("missions").related_model
+            mission_fields = None if fieldset is None else fieldset["missions"] or None
+            missions = mission_model.objects.with_fieldset(mission_fields, expand["missions"])
+            queryset = queryset.prefetch_related(models.Prefetch("missions", queryset=missions))
+        return queryset
+
+    def bulk_delete(self):
+        """Delete these cats, unassigning their (live and archived) missions; return how many were deleted.
+
+        The set-based counterpart of ``delete()``, which collects the missions to ``SET_NULL`` them.
+        """
+        using = self._db or router.db_for_write(self.model)
+        mission_model = self.model._meta.get_field("missions").related_model
+        with transaction.atomic(using=using):
+            cats = self.using(using)
+            if connections[using].features.has_select_for_update:
+                cats = cats.select_for_update()
+            ids = list(cats.values_list("pk", flat=True))
+            if not ids:
+                return 0
+            missions = mission_model.objects.using(using).filter(cat_id__in=ids)
+            mission_ids = list(missions.values_list("pk", flat=True)) if rows_saved.has_listeners(mission_model) else []
+            missions.update(cat=None)
+            rows_saved.send(sender=mission_model, pks=mission_ids, using=using)
+            apps.get_model("missions", "MissionArchive").objects.using(using).filter(cat_id__in=ids).unassign()
+            self.model.objects.using(using).filter(pk__in=ids)._raw_delete(using)
+            rows_deleted.send(sender=self.model, pks=ids, using=using)
+        return len(ids)
+
+
+class SpyCat(AtomicSaveModel):
     name = models.CharField(max_length=255)
     years_of_experience = models.PositiveIntegerField()
     breed = models.CharField(max_length=255)
     salary = models.DecimalField(max_digits=10, decimal_places=2)
+
+    objects = SpyCatQuerySet.as_manager()
+
+
+class Breed(models.Model):
+    """A breed name or alternative name (lowercased) known to TheCatAPI; see ``cats.breeds``."""
+
+    name = models.CharField(max_length=255, unique=True)
+    refreshed_at = models.DateTimeField()
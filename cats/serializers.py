@@ -1,9 +1,12 @@
 from rest_framework import serializers
 
 from cats.models import SpyCat
+from core.fieldsets import SparseFieldsetMixin
 
 
-class SpyCatSerializer(serializers.ModelSerializer):
+class SpyCatSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    expandable_fields = {"missions": ("missions.serializers.MissionSerializer", {"many": True})}
+
     class Meta:
         model = SpyCat
         fields = ['id', 'name', 'years_of_experience', 'breed', 'salary']
@@ -0,0 +1,7 @@
+from cats import breeds
+from jobs.queue import task
+
+
+@task("cats.refresh_breeds")
+def refresh_breeds_task():
+    breeds.refresh_breeds()
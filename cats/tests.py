@@ -53,6 +53,40 @@ def test_create_spycat_breed_api_502(api_client, breed_api_unavailable):
     assert r.status_code == 502
 
 
+@pytest.mark.django_db
+def test_create_spycat_uses_local_breed_copy_and_refreshes_in_background(api_client, breed_api_success, monkeypatch,
+                                                                          settings):
+    from cats.models import Breed
+    from jobs.models import Task
+
+    payload = {"name": "Cat", "years_of_experience": 1, "breed": "Highlander", "salary": "1000.00"}
+    assert api_client.post("/cats/create/", payload, format="json").status_code == 201
+
+    monkeypatch.setattr("requests.get", lambda *a, **kw: pytest.fail("TheCatAPI called on the request path"))
+    assert api_client.post("/cats/create/", payload, format="json").status_code == 201
+    assert not Task.objects.exists()
+
+    settings.BREEDS_REFRESH_SECONDS = 0
+    assert api_client.post("/cats/create/", payload, format="json").status_code == 201
+    assert api_client.post("/cats/create/", payload, format="json").status_code == 201
+    assert list(Task.objects.values_list("name", flat=True)) == ["cats.refresh_breeds"]
+    assert Breed.objects.filter(name="britannica").exists()
+
+
+@pytest.mark.django_db
+def test_refresh_breeds_alongside_another_refresh(breed_api_success, monkeypatch):
+    from django.db.models import QuerySet
+
+    from cats.breeds import refresh_breeds
+    from cats.models import Breed
+
+    refresh_breeds()
+    # The other refresh commits its rows after this one's delete ran.
+    monkeypatch.setattr(QuerySet, "delete", lambda self: (0, {}))
+    assert refresh_breeds() == 5
+    assert Breed.objects.count() == 5
+
+
 @pytest.mark.django_db
 def test_create_spycat_missing_breed_400(api_client):
     payload = {
@@ -121,3 +155,111 @@ def test_list_cat_missions_only_for_that_cat(api_client, make_cat, make_mission,
         items = r.data
     assert len(items) >= 1
     assert all(item["cat"] == cat1.id for item in items)
+
+
+@pytest.mark.django_db
+def test_list_spycats_sparse_fields(api_client, make_cat):
+    cat = make_cat(name="Sparse")
+    r = api_client.get("/cats/?fields=id,name")
+    assert r.status_code == 200
+    assert r.data["results"] == [{"id": cat.id, "name": "Sparse"}]
+
+
+@pytest.mark.django_db
+def test_retrieve_spycat_expand_missions(api_client, make_cat, make_mission, make_target):
+    cat = make_cat()
+    m = make_mission(cat=cat)
+    make_target(mission=m, name="T1")
+
+    r = api_client.get(f"/cats/{cat.id}/?fields=id,missions.id,missions.targets.name&expand=missions")
+    assert r.status_code == 200
+    assert r.data == {"id": cat.id, "missions": [{"id": m.id, "targets": [{"name": "T1"}]}]}
+
+
+@pytest.mark.django_db
+def test_retrieve_spycat_expand_sparse_missions_prefetches_once(api_client, make_cat, make_mission,
+                                                                 django_assert_num_queries):
+    cat = make_cat()
+    missions = [make_mission(cat=cat) for _ in range(3)]
+
+    # The cat and its missions; not one more per mission for its cat_id.
+    with django_assert_num_queries(2):
+        r = api_client.get(f"/cats/{cat.id}/?fields=id,missions.id&expand=missions")
+    assert r.status_code == 200
+    assert r.data == {"id": cat.id, "missions": [{"id": m.id} for m in missions]}
+
+
+@pytest.mark.django_db
+def test_cat_dashboard(api_client, make_cat, make_mission, make_target, django_assert_num_queries,
+                       django_capture_on_commit_callbacks, settings):
+    from django.core.cache import cache
+
+    settings.CACHE_SHARED = True  # The tests run in one process.
+    cache.clear()
+    cat = make_cat(name="Dash")
+    done = make_mission(cat=cat)
+    make_target(mission=done, completed=True)
+    active = make_mission(cat=cat)
+    target = make_target(mission=active, name="T1")
+
+    # Cat with its completed count, active mission, its targets with their notes.
+    with django_assert_num_queries(3):
+        r = api_client.get(f"/cats/{cat.id}/dashboard/")
+    assert r.status_code == 200
+    assert r.data["cat"]["name"] == "Dash"
+    assert r.data["active_mission"]["id"] == active.id
+    assert [t["name"] for t in r.data["active_mission"]["targets"]] == ["T1"]
+    assert r.data["completed_missions"] == 1
+    etag = r["ETag"]
+
+    with django_assert_num_queries(0):
+        r = api_client.get(f"/cats/{cat.id}/dashboard/")
+    assert r.status_code == 200 and r["ETag"] == etag
+    r = api_client.get(f"/cats/{cat.id}/dashboard/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        r = api_client.post(f"/missions/targets/{target.id}/note/create/", {"text": "Seen"}, format="json")
+    assert r.status_code == 201
+    r = api_client.get(f"/cats/{cat.id}/dashboard/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 200 and r["ETag"] != etag
+    assert r.data["active_mission"]["targets"][0]["note"]["text"] == "Seen"
+
+    # Reassigned: the mission leaves the first cat's dashboard too.
+    other = make_cat(name="Other")
+    api_client.get(f"/cats/{other.id}/dashboard/")
+    with django_capture_on_commit_callbacks(execute=True):
+        r = api_client.patch(f"/missions/{active.id}/assign-cat/", {"cat": other.id}, format="json")
+    assert r.status_code == 200
+    assert api_client.get(f"/cats/{cat.id}/dashboard/").data["active_mission"] is None
+    assert api_client.get(f"/cats/{other.id}/dashboard/").data["active_mission"]["id"] == active.id
+
+    with django_capture_on_commit_callbacks(execute=True):
+        r = api_client.patch(f"/missions/targets/{target.id}/", {"completed": True}, format="json")
+    assert r.status_code == 200
+    r = api_client.get(f"/cats/{other.id}/dashboard/")
+    assert r.data["active_mission"] is None
+    assert r.data["completed_missions"] == 1
+
+
+@pytest.mark.django_db
+def test_cat_dashboard_is_not_cached_without_a_shared_cache(api_client, make_cat, make_mission, settings):
+    from django.core.cache import cache
+
+    settings.CACHE_SHARED = False
+    cache.clear()
+    cat = make_cat(name="Dash")
+    etag = api_client.get(f"/cats/{cat.id}/dashboard/")["ETag"]
+    assert api_client.get(f"/cats/{cat.id}/dashboard/", HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert not cache.get(f"cat-dashboard-version:{cat.id}")
+
+    # Written without any invalidation: the next request still sees it.
+    make_mission(cat=cat)
+    r = api_client.get(f"/cats/{cat.id}/dashboard/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 200 and r["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_cat_dashboard_unknown_cat_404(api_client):
+    r = api_client.get("/cats/999999/dashboard/")
+    assert r.status_code == 404
@@ -1,10 +1,11 @@
 from django.urls import path
 
-from cats.views import RetrieveUpdateRemoveSpyCat, ListCatMissions, CreateSpyCat, ListSpyCats
+from cats.views import RetrieveUpdateRemoveSpyCat, ListCatMissions, CreateSpyCat, ListSpyCats, SpyCatDashboard
 
 urlpatterns = [
     path("create/", CreateSpyCat.as_view(), name="cat-create"),
     path("", ListSpyCats.as_view(), name="cat-list"),
     path("<int:pk>/missions/", ListCatMissions.as_view(), name="cat-missions"),
+    path("<int:pk>/dashboard/", SpyCatDashboard.as_view(), name="cat-dashboard"),
     path("<int:pk>/", RetrieveUpdateRemoveSpyCat.as_view(), name="cat-detail"),
 ]
\ No newline at end of file
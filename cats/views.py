@@ -1,13 +1,21 @@
-from django.shortcuts import get_object_or_404
+from django.http import Http404
+from django.utils.http import parse_etags
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter, OpenApiExample
 from rest_framework import generics, status
-import requests
 from rest_framework.response import Response
 
+from cats.breeds import BreedRegistryUnavailable, is_known_breed
+from cats.dashboard import SpyCatDashboardSerializer, build_dashboard, cache_enabled, content_etag, \
+    dashboard_version, get_dashboard
 from cats.models import SpyCat
 from cats.serializers import SpyCatSerializer, UpdateSpyCatSerializer
-from missions.models import Mission
+from core.fieldsets import SparseFieldsetViewMixin, fieldset_parameters, restrict_data
+from core.idempotency import IdempotencyMixin, idempotency_key_parameter
+from core.objectcache import object_cache
+from core.pagination import EstimatedCountPageNumberPagination
+from missions.archive import LiveThenArchived, include_archived, include_archived_parameter
+from missions.models import Mission, MissionArchive
 from missions.serializers import MissionSerializer
 
 
@@ -15,10 +23,11 @@ from missions.serializers import MissionSerializer
     tags=["Cats"],
     summary="Create a spy cat",
     description=(
-        "Creates a new spy cat. The `breed` is validated against TheCatAPI "
-        "(`GET https://api.thecatapi.com/v1/breeds`). "
-        "Returns **400** if the breed is unknown, **502** when the external registry is unavailable."
+        "Creates a new spy cat. The `breed` is validated against a local copy of TheCatAPI registry "
+        "(`GET https://api.thecatapi.com/v1/breeds`), refreshed in the background. "
+        "Returns **400** if the breed is unknown, **502** when there is no copy yet and the registry is unavailable."
     ),
+    parameters=[idempotency_key_parameter],
     request=SpyCatSerializer,
     responses={
         201: SpyCatSerializer,
@@ -36,7 +45,7 @@ from missions.serializers import MissionSerializer
         request_only=True,
     )],
 )
-class CreateSpyCat(generics.CreateAPIView):
+class CreateSpyCat(IdempotencyMixin, generics.CreateAPIView):
     queryset = SpyCat.objects.all()
     serializer_class = SpyCatSerializer
 
@@ -48,23 +57,15 @@ class CreateSpyCat(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        response = requests.get("https://api.thecatapi.com/v1/breeds")
-        if response.status_code != 200:
+        try:
+            known = is_known_breed(breed)
+        except BreedRegistryUnavailable:
             return Response(
                 {"error": "Service unavailable, try again later."},
                 status=status.HTTP_502_BAD_GATEWAY,
             )
 
-        breeds_data = response.json()
-
-        all_names = []
-        for breed_data in breeds_data:
-            all_names.append(breed_data["name"].lower())
-            if breed_data.get("alt_names"):
-                for alt in breed_data["alt_names"].split(","):
-                    all_names.append(alt.strip().lower())
-
-        if breed.lower() not in all_names:
+        if not known:
             return Response(
                 {"error": f"Breed '{breed}' not found."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -77,18 +78,25 @@ class CreateSpyCat(generics.CreateAPIView):
     tags=["Cats"],
     summary="List spy cats",
     description="Returns a paginated list of cats.",
+    parameters=fieldset_parameters(expandable=["missions"]),
     responses={200: OpenApiResponse(response=SpyCatSerializer(many=True))},
 )
-class ListSpyCats(generics.ListAPIView):
-    queryset = SpyCat.objects.all()
+class ListSpyCats(SparseFieldsetViewMixin, generics.ListAPIView):
     serializer_class = SpyCatSerializer
 
+    def get_queryset(self):
+        return SpyCat.objects.with_fieldset(self.get_fieldset(), self.get_expand())
+
 
 @extend_schema(
     tags=["Cats", "Missions"],
     summary="List missions of a specific cat",
     description="Returns missions assigned to the given cat (path param `pk` is the cat ID).",
-    parameters=[OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Cat ID")],
+    parameters=[
+        OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Cat ID"),
+        *fieldset_parameters(expandable=["cat"]),
+        include_archived_parameter,
+    ],
     responses={200: OpenApiResponse(response=MissionSerializer(many=True))},
     examples=[OpenApiExample(
         "List missions of a cat (response trimmed)",
@@ -96,18 +104,85 @@ class ListSpyCats(generics.ListAPIView):
         response_only=True,
     )],
 )
-class ListCatMissions(generics.ListAPIView):
+class ListCatMissions(SparseFieldsetViewMixin, generics.ListAPIView):
     serializer_class = MissionSerializer
+    # Same page shape as ListAllMissions; filtered by cat, so the count is always exact.
+    pagination_class = EstimatedCountPageNumberPagination
 
     def get_queryset(self):
         cat_id = self.kwargs.get("pk")
-        get_object_or_404(SpyCat, pk=cat_id)
-        return Mission.objects.filter(cat_id=cat_id).select_related("cat").prefetch_related("targets__note")
+        if object_cache(SpyCat).get(cat_id) is None:
+            raise Http404("No SpyCat matches the given query.")
+        return Mission.objects.filter(cat_id=cat_id).with_fieldset(self.get_fieldset(), self.get_expand())
+
+    def list(self, request, *args, **kwargs):
+        if not include_archived(request):
+            return super().list(request, *args, **kwargs)
+        fieldset = self.get_fieldset()
+        missions = LiveThenArchived(
+            self.filter_queryset(self.get_queryset()).order_by("id"),
+            MissionArchive.objects.filter(cat_id=self.kwargs["pk"]).order_by("id").values_list("data", flat=True),
+            lambda rows: self.get_serializer(rows, many=True).data,
+            lambda rows: restrict_data(rows, fieldset),
+        )
+        return self.get_paginated_response(self.paginate_queryset(missions))
 
 
-class RetrieveUpdateRemoveSpyCat(generics.RetrieveUpdateDestroyAPIView):
+@extend_schema(
+    tags=["Cats"],
+    summary="Cat dashboard",
+    description=(
+        "The cat, its active mission (with targets and notes, `null` if it has none) and how many missions it "
+        "has completed. Cached until any of it changes; send the `ETag` back in `If-None-Match` to get **304**."
+    ),
+    parameters=[OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Cat ID")],
+    responses={
+        200: SpyCatDashboardSerializer,
+        304: OpenApiResponse(description="Not modified"),
+        404: OpenApiResponse(description="Not found"),
+    },
+)
+class SpyCatDashboard(generics.GenericAPIView):
+    serializer_class = SpyCatDashboardSerializer
+
+    def get(self, request, pk):
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if cache_enabled():
+            version = dashboard_version(pk)
+            etag = f'"{version}"'
+            if etag in if_none_match:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+            data = get_dashboard(pk, version)
+        else:
+            data = build_dashboard(pk)
+            etag = f'"{content_etag(data)}"' if data is not None else None
+        if data is None:
+            raise Http404("No SpyCat matches the given query.")
+        if etag in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(data, headers={"ETag": etag})
+
+
+class RetrieveUpdateRemoveSpyCat(IdempotencyMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = SpyCat.objects.all()
 
+    def get_queryset(self):
+        if self.request.method == "GET":
+            return SpyCat.objects.with_fieldset(self.get_fieldset(), self.get_expand())
+        return super().get_queryset()
+
+    def get_object(self):
+        if self.request.method != "GET" or self.get_expand():
+            return super().get_object()
+        # A plain read: the cached row will do (writes load the current one).
+        cat = object_cache(SpyCat).get(self.kwargs["pk"])
+        if cat is None:
+            raise Http404("No SpyCat matches the given query.")
+        return cat
+
+    def perform_destroy(self, instance):
+        SpyCat.objects.filter(pk=instance.pk).bulk_delete()
+
     def get_serializer_class(self):
         if self.request.method.lower() == "patch":
             return UpdateSpyCatSerializer
@@ -116,7 +191,10 @@ class RetrieveUpdateRemoveSpyCat(generics.RetrieveUpdateDestroyAPIView):
     @extend_schema(
         tags=["Cats"],
         summary="Retrieve a spy cat",
-        parameters=[OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Cat ID")],
+        parameters=[
+            OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Cat ID"),
+            *fieldset_parameters(expandable=["missions"]),
+        ],
         responses={200: SpyCatSerializer, 404: OpenApiResponse(description="Not found")},
     )
     def get(self, request, *args, **kwargs):
@@ -134,7 +212,10 @@ class RetrieveUpdateRemoveSpyCat(generics.RetrieveUpdateDestroyAPIView):
     @extend_schema(
         tags=["Cats"],
         summary="Update a spy cat",
-        parameters=[OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Cat ID")],
+        parameters=[
+            OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Cat ID"),
+            idempotency_key_parameter,
+        ],
         request=UpdateSpyCatSerializer,
         responses={200: SpyCatSerializer, 404: OpenApiResponse(description="Not found")},
         examples=[OpenApiExample(
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from changes.models import Change, ChangeLogHorizon
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep the change log bounded: drop entries superseded by a newer one for the same object, "
+        "then tombstones older than CHANGES_RETENTION_DAYS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10_000, help="Log ids per delete statement.")
+        parser.add_argument("--retention-days", type=int, default=settings.CHANGES_RETENTION_DAYS)
+
+    def handle(self, *args, batch_size, retention_days, **options):
+        # Superseded entries can go at any time: every cursor before them also sees the newer entry.
+        # Only numbered entries count; the others are numbered by the next feed read.
+        Change.assign_positions()
+        newer = Change.objects.filter(
+            resource=OuterRef("resource"), object_id=OuterRef("object_id"), position__gt=OuterRef("position"),
+        )
+        last_id = Change.objects.aggregate(last=Max("id"))["last"] or 0
+        superseded = 0
+        for start in range(0, last_id, batch_size):
+            superseded += (
+                Change.objects.filter(id__gt=start, id__lte=start + batch_size, position__isnull=False)
+                .filter(Exists(newer)).delete()[0]
+            )
+
+        # What is left is the latest entry per object; only old tombstones (deleted or archived rows)
+        # are dropped, and a cursor from before them has to re-sync in full (410 from the feed).
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        tombstones = Change.objects.filter(
+            action__in=[Change.Action.DELETE, Change.Action.ARCHIVE], created_at__lt=cutoff, position__isnull=False,
+        )
+        with transaction.atomic():
+            pruned_through = tombstones.aggregate(last=Max("position"))["last"]
+            expired = 0
+            if pruned_through is not None:
+                expired = tombstones.filter(position__lte=pruned_through).delete()[0]
+                horizon, _ = ChangeLogHorizon.objects.select_for_update().get_or_create(pk=1)
+                if pruned_through > horizon.pruned_through:
+                    horizon.pruned_through = pruned_through
+                    horizon.save(update_fields=["pruned_through"])
+
+        self.stdout.write(self.style.SUCCESS(f"Removed {superseded} superseded and {expired} expired entries."))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:54
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def number_existing(apps, schema_editor):
+    # Cursors handed out so far are ids: keep them valid.
+    apps.get_model("changes", "Change").objects.update(position=F("id"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='change',
+            name='changes_cha_resourc_bf1be7_idx',
+        ),
+        migrations.AddField(
+            model_name='change',
+            name='position',
+            field=models.BigIntegerField(null=True, unique=True),
+        ),
+        migrations.RunPython(number_existing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['resource', 'object_id', 'position'], name='changes_cha_resourc_dcc047_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changes', '0002_change_position'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='change',
+            name='action',
+            field=models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete'), ('archive', 'Archive')], max_length=7),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import models, transaction
+from django.db.models import F, Max, Min
+
+
+class Change(models.Model):
+    """One write to a cat, mission, target or note; ``position`` is the feed cursor."""
+
+    class Action(models.TextChoices):
+        UPSERT = "upsert"
+        DELETE = "delete"
+        # Moved to ``MissionArchive``: gone from the live endpoints, readable with ``include_archived``.
+        ARCHIVE = "archive"
+
+    resource = models.CharField(max_length=16)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=7, choices=Action.choices)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set by assign_positions() once the entry is committed; ids are taken at insert, not at commit.
+    position = models.BigIntegerField(null=True, unique=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["resource", "object_id", "position"])]
+
+    @classmethod
+    def assign_positions(cls):
+        """Number the committed entries that have none yet, after every numbered one.
+
+        One numbering runs at a time (the ``ChangeLogHorizon`` row is locked), and an entry is numbered
+        the first time it is seen committed: positions follow commit order, so a transaction that commits
+        a smaller id late still lands after every cursor handed out before.
+        """
+        with transaction.atomic():
+            ChangeLogHorizon.objects.select_for_update().get_or_create(pk=1)
+            pending = cls.objects.filter(position__isnull=True).aggregate(first=Min("id"), last=Max("id"))
+            if pending["first"] is None:
+                return
+            last_position = cls.objects.aggregate(last=Max("position"))["last"] or 0
+            cls.objects.filter(position__isnull=True, id__gte=pending["first"], id__lte=pending["last"]).update(
+                position=F("id") + (last_position - pending["first"] + 1)
+            )
+
+
+class ChangeLogHorizon(models.Model):
+    """Single row: changes up to position ``pruned_through`` may have been removed by retention."""
+
+    pruned_through = models.BigIntegerField(default=0)
+
+    @classmethod
+    def get(cls):
+        return cls.objects.filter(pk=1).values_list("pruned_through", flat=True).first() or 0
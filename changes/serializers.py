@@ -0,0 +1,16 @@
+from rest_framework import serializers
+
+
+class ChangeIdsSerializer(serializers.Serializer):
+    upsert = serializers.ListField(child=serializers.IntegerField(), required=False)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False)
+    archive = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class ChangeBatchSerializer(serializers.Serializer):
+    cursor = serializers.IntegerField(help_text="Pass as `after` to get the next batch.")
+    has_more = serializers.BooleanField()
+    changes = serializers.DictField(
+        child=ChangeIdsSerializer(),
+        help_text="Changed ids per resource (`cat`, `mission`, `target`, `note`); only the latest action per object.",
+    )
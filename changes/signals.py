@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from changes.models import Change
+from core.signals import rows_deleted, rows_saved
+
+RESOURCES = {
+    "cats.SpyCat": "cat",
+    "missions.Mission": "mission",
+    "missions.Target": "target",
+    "missions.Note": "note",
+}
+
+
+def record(model, pks, action, using):
+    resource = RESOURCES[model._meta.label]
+    Change.objects.using(using).bulk_create([
+        Change(resource=resource, object_id=pk, action=action) for pk in pks
+    ])
+
+
+def saved(sender, instance, using, **kwargs):
+    record(sender, [instance.pk], Change.Action.UPSERT, using)
+
+
+def deleted(sender, instance, using, **kwargs):
+    record(sender, [instance.pk], Change.Action.DELETE, using)
+
+
+def bulk_saved(sender, pks, using, **kwargs):
+    record(sender, pks, Change.Action.UPSERT, using)
+
+
+def bulk_deleted(sender, pks, using, archived=False, **kwargs):
+    record(sender, pks, Change.Action.ARCHIVE if archived else Change.Action.DELETE, using)
+
+
+def cat_deleting(sender, instance, using, **kwargs):
+    # Mission.cat is SET_NULL: the collector updates the missions without sending post_save.
+    from missions.models import Mission
+
+    record(Mission, Mission.objects.using(using).filter(cat_id=instance.pk).values_list("pk", flat=True),
+           Change.Action.UPSERT, using)
+
+
+for label in RESOURCES:
+    post_save.connect(saved, sender=label, dispatch_uid=f"changes-saved-{label}")
+    post_delete.connect(deleted, sender=label, dispatch_uid=f"changes-deleted-{label}")
+    rows_saved.connect(bulk_saved, sender=label, dispatch_uid=f"changes-rows-saved-{label}")
+    rows_deleted.connect(bulk_deleted, sender=label, dispatch_uid=f"changes-rows-deleted-{label}")
+pre_delete.connect(cat_deleting, sender="cats.SpyCat", dispatch_uid="changes-cat-deleting")
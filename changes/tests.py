@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from changes.models import Change
+
+
+def changes_after(api_client, after=0, **params):
+    r = api_client.get("/changes/", {"after": after, **params})
+    assert r.status_code == 200, r.data
+    return r.data
+
+
+@pytest.mark.django_db
+def test_create_mission_records_mission_and_bulk_created_targets(api_client, make_cat):
+    cat = make_cat()
+    r = api_client.post("/missions/create/", {
+        "cat": cat.id, "targets": [{"name": "T1", "country": "US"}, {"name": "T2", "country": "UA"}],
+    }, format="json")
+    target_ids = sorted(t["id"] for t in r.data["targets"])
+
+    data = changes_after(api_client)
+    assert data["has_more"] is False
+    assert data["changes"] == {
+        "cat": {"upsert": [cat.id]},
+        "mission": {"upsert": [r.data["id"]]},
+        "target": {"upsert": target_ids},
+    }
+    assert changes_after(api_client, data["cursor"])["changes"] == {}
+
+
+@pytest.mark.django_db
+def test_deleted_mission_is_compacted_to_tombstones(api_client, make_mission, make_target, make_note):
+    m = make_mission()
+    t = make_target(mission=m)
+    make_note(t)
+    cursor = changes_after(api_client)["cursor"]
+
+    make_target(mission=m, name="T2").save()
+    assert api_client.delete(f"/missions/{m.id}/").status_code == 204
+
+    changes = changes_after(api_client, cursor)["changes"]
+    assert changes["mission"] == {"delete": [m.id]}
+    assert changes["note"] == {"delete": [t.note.id]}
+    assert "upsert" not in changes["target"] and len(changes["target"]["delete"]) == 2
+
+
+@pytest.mark.django_db
+def test_archived_mission_is_recorded_as_archive_not_delete(api_client, make_cat, make_mission, make_target,
+                                                            make_note):
+    from missions.archive import archive_batch
+
+    m = make_mission(cat=make_cat())
+    t = make_target(m, completed=True)
+    make_note(t)
+    cursor = changes_after(api_client)["cursor"]
+
+    assert archive_batch(timezone.now() + timedelta(seconds=1), 10) == 1
+
+    assert changes_after(api_client, cursor)["changes"] == {
+        "mission": {"archive": [m.id]}, "target": {"archive": [t.id]}, "note": {"archive": [t.note.id]},
+    }
+    assert api_client.get(f"/missions/{m.id}/?include_archived=true").status_code == 200
+
+
+@pytest.mark.django_db
+def test_deleting_cat_records_unassigned_missions(api_client, make_cat, make_mission):
+    cat = make_cat()
+    m = make_mission(cat=cat)
+    cursor = changes_after(api_client)["cursor"]
+
+    assert api_client.delete(f"/cats/{cat.id}/").status_code == 204
+    assert changes_after(api_client, cursor)["changes"] == {
+        "mission": {"upsert": [m.id]},
+        "cat": {"delete": [cat.id]},
+    }
+
+
+@pytest.mark.django_db
+def test_changes_are_batched_by_cursor(api_client, make_cat):
+    cats = [make_cat(name=f"Cat {i}") for i in range(3)]
+
+    first = changes_after(api_client, limit=2)
+    assert first["has_more"] is True
+    assert first["changes"] == {"cat": {"upsert": [cats[0].id, cats[1].id]}}
+    second = changes_after(api_client, first["cursor"], limit=2)
+    assert second["has_more"] is False
+    assert second["changes"] == {"cat": {"upsert": [cats[2].id]}}
+
+
+@pytest.mark.django_db
+def test_late_commit_of_a_smaller_id_is_not_skipped(api_client, make_cat):
+    late, early = make_cat(name="Late"), make_cat(name="Early")
+    # The first entry's transaction commits after a client read the second one's.
+    entry = Change.objects.get(resource="cat", object_id=late.id)
+    Change.objects.filter(pk=entry.pk).delete()
+    first = changes_after(api_client)
+    assert first["changes"] == {"cat": {"upsert": [early.id]}}
+
+    Change.objects.create(id=entry.id, resource="cat", object_id=late.id, action=Change.Action.UPSERT)
+    second = changes_after(api_client, first["cursor"])
+    assert second["changes"] == {"cat": {"upsert": [late.id]}}
+    assert second["cursor"] > first["cursor"]
+
+
+@pytest.mark.django_db
+def test_compact_changes_drops_superseded_entries_and_expires_old_tombstones(api_client, make_cat):
+    cat = make_cat()
+    cat.save()
+    gone_id = make_cat(name="Gone").id
+    api_client.delete(f"/cats/{gone_id}/")
+    cursor = changes_after(api_client)["cursor"]
+
+    call_command("compact_changes", stdout=None)
+    assert Change.objects.count() == 2
+    assert changes_after(api_client)["changes"] == {"cat": {"upsert": [cat.id], "delete": [gone_id]}}
+
+    Change.objects.update(created_at=timezone.now() - timedelta(days=30))
+    call_command("compact_changes", stdout=None)
+    assert list(Change.objects.values_list("object_id", flat=True)) == [cat.id]
+    assert api_client.get("/changes/", {"after": 0}).status_code == 410
+    assert changes_after(api_client, cursor)["changes"] == {}
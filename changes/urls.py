@@ -0,0 +1,7 @@
+from django.urls import path
+
+from changes.views import ListChanges
+
+urlpatterns = [
+    path("", ListChanges.as_view(), name="change-list"),
+]
@@ -0,0 +1,77 @@
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from changes.models import Change, ChangeLogHorizon
+from changes.serializers import ChangeBatchSerializer
+
+
+def _int_param(request, name, default, minimum=0, maximum=None):
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValidationError({name: "Must be an integer."})
+    if value < minimum:
+        raise ValidationError({name: f"Must be at least {minimum}."})
+    return value if maximum is None else min(value, maximum)
+
+
+@extend_schema(
+    tags=["Changes"],
+    summary="Change feed",
+    description=(
+        "Ids of cats, missions, targets and notes written after the `after` cursor, oldest first, "
+        "compacted to the latest action per object. Start with `after=0`, then pass the returned "
+        "`cursor` until `has_more` is false, and fetch the upserted objects by id. `archive` lists "
+        "missions (and their targets and notes) moved to the archive: gone from the live endpoints, "
+        "still readable with `include_archived`. "
+        "**410** means the cursor is older than the log retention: re-sync in full and start over."
+    ),
+    parameters=[
+        OpenApiParameter("after", OpenApiTypes.INT, OpenApiParameter.QUERY, description="Cursor (default 0)"),
+        OpenApiParameter("limit", OpenApiTypes.INT, OpenApiParameter.QUERY,
+                         description="Log entries per batch (default 500, max 5000)"),
+    ],
+    responses={
+        200: ChangeBatchSerializer,
+        400: OpenApiResponse(description="Invalid cursor/limit"),
+        410: OpenApiResponse(description="Cursor expired"),
+    },
+)
+class ListChanges(generics.GenericAPIView):
+    serializer_class = ChangeBatchSerializer
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        after = _int_param(request, "after", 0)
+        limit = _int_param(request, "limit", 500, minimum=1, maximum=5000)
+        if after < ChangeLogHorizon.get():
+            return Response({"detail": "Cursor has expired; re-sync in full and start again from 0."},
+                            status=status.HTTP_410_GONE)
+
+        # Ids are allocated before commit, so a slower transaction can still commit a smaller id;
+        # the cursor is the commit-ordered position instead, which entries get once committed.
+        Change.assign_positions()
+        entries = list(
+            Change.objects.filter(position__gt=after)
+            .order_by("position")
+            .values_list("position", "resource", "object_id", "action")[:limit + 1]
+        )
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        latest = {}
+        for _, resource, object_id, action in entries:
+            latest.pop((resource, object_id), None)
+            latest[(resource, object_id)] = action
+        changes = {}
+        for (resource, object_id), action in latest.items():
+            changes.setdefault(resource, {}).setdefault(action, []).append(object_id)
+
+        return Response({
+            "cursor": entries[-1][0] if entries else after,
+            "has_more": has_more,
+            "changes": changes,
+        })
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from django.apps import apps
+        from django.conf import settings
+
+        from core.objectcache import register
+
+        for label in settings.OBJECT_CACHE_MODELS:
+            register(apps.get_model(label))
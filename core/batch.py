@@ -0,0 +1,156 @@
+"""``POST /batch/``: several API calls in one round trip and one transaction.
+
+Each operation is dispatched in-process to the view its path resolves to, so it goes through the
+same serializers and rules as a separate request. A value ``"$<n>.<field>..."`` -- a whole string
+in ``body``, or a part of ``path`` -- is replaced by that field of operation ``n``'s response,
+e.g. ``"$0.id"`` or ``"/missions/targets/$0.targets.1.id/note/create/"``.
+
+The first operation that fails (status >= 400) rolls the whole batch back.
+"""
+import io
+import re
+
+import orjson
+from django.conf import settings
+from django.core.handlers.wsgi import LimitedStream, WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiExample, OpenApiResponse, extend_schema
+from rest_framework import serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.idempotency import IdempotencyMixin, idempotency_key_parameter
+
+REFERENCE = re.compile(r"\$(\d+)((?:\.[\w-]+)+)")
+
+# Headers of the batch request that must not be passed on to its operations.
+SKIPPED_META = ("CONTENT_LENGTH", "CONTENT_TYPE", "HTTP_IDEMPOTENCY_KEY", "QUERY_STRING")
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(["GET", "POST", "PATCH", "DELETE"])
+    path = serializers.RegexField(r"^/", max_length=2000)
+    body = serializers.JSONField(required=False, allow_null=True, default=None)
+
+
+class BatchSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(many=True, allow_empty=False, max_length=settings.BATCH_MAX_OPERATIONS)
+
+
+class BatchError(Exception):
+    pass
+
+
+def _lookup(results, match, index):
+    source = int(match[1])
+    if source >= index:
+        raise BatchError(f"{match[0]} refers to an operation that has not run yet.")
+    value = results[source]["body"]
+    for part in match[2][1:].split("."):
+        try:
+            value = value[int(part)] if isinstance(value, list) else value[part]
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise BatchError(f"{match[0]} is not in the response of operation {source}.")
+    return value
+
+
+def resolve_references(value, results, index):
+    """Return ``value`` with the ``$<n>.<field>`` references to earlier ``results`` filled in."""
+    if isinstance(value, dict):
+        return {key: resolve_references(item, results, index) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(item, results, index) for item in value]
+    if isinstance(value, str):
+        whole = REFERENCE.fullmatch(value)
+        if whole:
+            return _lookup(results, whole, index)
+        return REFERENCE.sub(lambda match: str(_lookup(results, match, index)), value)
+    return value
+
+
+@extend_schema(
+    tags=["Batch"],
+    summary="Run several API calls in one request",
+    description=(
+        "Runs up to `BATCH_MAX_OPERATIONS` operations in order, in one transaction, and returns all "
+        "their responses. `\"$<n>.<field>\"` in a `body` value or a `path` is replaced by that field "
+        "of operation `n`'s response. The first failing operation rolls everything back; the response "
+        "then has its status and `failed` is its index. Rate limits count every operation."
+    ),
+    parameters=[idempotency_key_parameter],
+    request=BatchSerializer,
+    responses={
+        200: OpenApiResponse(response=OpenApiTypes.OBJECT, description="`results`: `status` and `body` of each operation"),
+        400: OpenApiResponse(description="Invalid batch / an operation failed"),
+    },
+    examples=[OpenApiExample(
+        "Create a mission, assign a cat and add a note",
+        value={"operations": [
+            {"method": "POST", "path": "/missions/create/",
+             "body": {"targets": [{"name": "Harbor Warehouse", "country": "US"}]}},
+            {"method": "PATCH", "path": "/missions/$0.id/assign-cat/", "body": {"cat": 3}},
+            {"method": "POST", "path": "/missions/targets/$0.targets.0.id/note/create/",
+             "body": {"text": "Observe north perimeter at 03:00"}},
+        ]},
+        request_only=True,
+    )],
+)
+class BatchView(IdempotencyMixin, APIView):
+    def check_throttles(self, request):
+        operations = request.data.get("operations") if isinstance(request.data, dict) else None
+        # At most what a valid batch can cost: a longer one fails validation right after.
+        self.throttle_weight = min(len(operations), settings.BATCH_MAX_OPERATIONS) if (
+            isinstance(operations, list) and operations
+        ) else 1
+        super().check_throttles(request)
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = []
+        with transaction.atomic():
+            for index, operation in enumerate(serializer.validated_data["operations"]):
+                try:
+                    path = resolve_references(operation["path"], results, index)
+                    body = resolve_references(operation["body"], results, index)
+                    response = self.run_operation(request, operation["method"], path, body)
+                except BatchError as exc:
+                    response = Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+                results.append({"status": response.status_code, "body": response.data})
+                if response.status_code >= 400:
+                    transaction.set_rollback(True)
+                    return Response({"failed": index, "results": results}, status=response.status_code)
+        return Response({"results": results})
+
+    def run_operation(self, request, method, path, body):
+        path, _, query = path.partition("?")
+        try:
+            match = resolve(path)
+        except Resolver404:
+            raise BatchError(f"{path} does not exist.")
+        view_class = getattr(match.func, "cls", None)
+        if view_class is None or issubclass(view_class, BatchView):
+            raise BatchError(f"{path} cannot be part of a batch.")
+
+        content = b"" if body is None else orjson.dumps(body)
+        environ = {key: value for key, value in request.META.items() if key not in SKIPPED_META}
+        environ.update({
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "SCRIPT_NAME": "",
+            "QUERY_STRING": query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(content)),
+            "wsgi.input": LimitedStream(io.BytesIO(content), len(content)),
+        })
+        sub_request = WSGIRequest(environ)
+        sub_request.batch_operation = True
+        if hasattr(request._request, "user"):
+            sub_request.user = request._request.user
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if not hasattr(response, "data"):
+            raise BatchError(f"{path} cannot be part of a batch.")
+        return response
@@ -0,0 +1,74 @@
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from rest_framework.test import APIClient
+
+from cats.models import SpyCat
+from missions.models import Mission, Target
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def make_cat(db):
+    def _make_cat(**kw):
+        defaults = dict(
+            name="Cat 1",
+            years_of_experience=3,
+            breed="British Shorthair",
+            salary=Decimal("3000.00"),
+        )
+        defaults.update(kw)
+        return SpyCat.objects.create(**defaults)
+    return _make_cat
+
+
+@pytest.fixture
+def make_mission(db):
+    def _make_mission(cat=None):
+        return Mission.objects.create(cat=cat)
+    return _make_mission
+
+
+@pytest.fixture
+def make_target(db):
+    def _make_target(mission, name="Target A", country="US", completed=False):
+        return Target.objects.create(
+            mission=mission, name=name, country=country, completed=completed
+        )
+    return _make_target
+
+
+@pytest.fixture
+def replica_db(db, settings, tmp_path):
+    """A second SQLite database standing in for a read replica (same schema, separate data).
+
+    The connection is opened while the alias is still unknown to ``connections`` so the test
+    case's database isolation treats it as a dynamically created connection.
+    """
+    alias = "replica"
+    replica_settings = {
+        **connections.settings["default"],
+        "NAME": str(tmp_path / "replica.sqlite3"),
+        "TEST": {"NAME": str(tmp_path / "replica.sqlite3")},
+    }
+    connections.settings[alias] = replica_settings
+    replica = connections[alias]
+    del connections.settings[alias]
+    replica.ensure_connection()
+    connections.settings[alias] = replica_settings
+
+    settings.DATABASE_REPLICAS = []
+    call_command("migrate", database=alias, verbosity=0)
+    settings.DATABASE_REPLICAS = [alias]
+    cache.clear()
+    yield alias
+    replica.close()
+    del connections[alias]
+    del connections.settings[alias]
+    cache.clear()
@@ -0,0 +1,62 @@
+"""Builds ``DATABASES`` entries from ``DATABASE_URL``-style URLs plus ``DB_*`` environment variables.
+
+``DB_POOL_MODE`` selects how PostgreSQL connections are managed:
+
+* ``persistent`` (default) -- one connection per worker thread kept for ``DB_CONN_MAX_AGE`` seconds
+  and validated before reuse.
+* ``pool`` -- a psycopg 3 connection pool per process (``DB_POOL_MIN_SIZE``, ``DB_POOL_MAX_SIZE``,
+  ``DB_POOL_TIMEOUT``, ``DB_POOL_MAX_IDLE``, ``DB_POOL_MAX_LIFETIME``); connections are checked
+  when handed out, so the ones killed by a database restart are replaced instead of failing a request.
+* ``pgbouncer`` -- for PgBouncer in transaction pooling mode: no server-side cursors (they do not
+  survive the transaction) and no prepared statements, while still keeping the client-side
+  connection to PgBouncer open.
+"""
+import os
+
+import dj_database_url
+
+POOL_MODES = ("persistent", "pool", "pgbouncer")
+
+
+def _int(env, name, default):
+    return int(env.get(name, default))
+
+
+def database_config(url, env=None):
+    env = os.environ if env is None else env
+    mode = env.get("DB_POOL_MODE", "persistent")
+    if mode not in POOL_MODES:
+        raise ValueError(f"DB_POOL_MODE must be one of {', '.join(POOL_MODES)}, got {mode!r}.")
+
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=_int(env, "DB_CONN_MAX_AGE", 600),
+        conn_health_checks=True,
+        ssl_require=False,
+    )
+    if config["ENGINE"] == "django.db.backends.sqlite3":
+        # As for the default SQLite database in settings: writers queue for the lock up front.
+        config.setdefault("OPTIONS", {}).update(transaction_mode="IMMEDIATE", timeout=20)
+    if config["ENGINE"] != "django.db.backends.postgresql":
+        return config
+
+    options = config.setdefault("OPTIONS", {})
+    options.setdefault("connect_timeout", _int(env, "DB_CONNECT_TIMEOUT", 10))
+
+    if mode == "pool":
+        # Django refuses persistent connections on top of its own pool; with CONN_HEALTH_CHECKS it hands
+        # the pool ConnectionPool.check_connection, which checks every connection as it is handed out.
+        config["CONN_MAX_AGE"] = 0
+        config["CONN_HEALTH_CHECKS"] = True
+        options["pool"] = {
+            "min_size": _int(env, "DB_POOL_MIN_SIZE", 2),
+            "max_size": _int(env, "DB_POOL_MAX_SIZE", 10),
+            "timeout": _int(env, "DB_POOL_TIMEOUT", 10),
+            "max_idle": _int(env, "DB_POOL_MAX_IDLE", 300),
+            "max_lifetime": _int(env, "DB_POOL_MAX_LIFETIME", 3600),
+        }
+    elif mode == "pgbouncer":
+        config["DISABLE_SERVER_SIDE_CURSORS"] = True
+        # Django already disables prepared statements unless asked; make sure nobody does.
+        options.pop("prepare_threshold", None)
+    return config
@@ -0,0 +1,104 @@
+from django.utils.module_loading import import_string
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+
+
+def parse_fieldset(value):
+    """Turn ``"id,targets.name,targets.note"`` into ``{"id": {}, "targets": {"name": {}, "note": {}}}``.
+
+    An empty dict means "the whole field"; ``None`` is returned for a missing/blank value.
+    """
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for part in (p.strip() for p in path.split(".")):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def restrict_data(data, fieldset):
+    """Apply a parsed ``fieldset`` to data that was rendered earlier (a dict or a list of dicts)."""
+    if fieldset is None:
+        return data
+    if isinstance(data, list):
+        return [restrict_data(item, fieldset) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {name: restrict_data(value, fieldset[name] or None) for name, value in data.items() if name in fieldset}
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin: ``fields=`` keeps only the given fields, ``expand=`` swaps in ``expandable_fields``.
+
+    ``expandable_fields`` maps a field name to ``(serializer class or dotted path, kwargs)``.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expand:
+            self.expand(expand)
+        if fields is not None:
+            self.restrict(fields)
+
+    def expand(self, expand):
+        for name, nested_expand in expand.items():
+            if name not in self.expandable_fields:
+                continue
+            serializer_class, kwargs = self.expandable_fields[name]
+            if isinstance(serializer_class, str):
+                serializer_class = import_string(serializer_class)
+            self.fields[name] = serializer_class(read_only=True, **kwargs)
+            nested = self._nested(name)
+            if nested_expand and nested is not None:
+                nested.expand(nested_expand)
+
+    def restrict(self, fieldset):
+        for name in list(self.fields):
+            if name not in fieldset:
+                self.fields.pop(name)
+                continue
+            nested = self._nested(name)
+            if fieldset[name] and nested is not None:
+                nested.restrict(fieldset[name])
+
+    def _nested(self, name):
+        field = self.fields[name]
+        field = getattr(field, "child", field)
+        return field if isinstance(field, SparseFieldsetMixin) else None
+
+
+class SparseFieldsetViewMixin:
+    """View mixin that reads ``?fields=``/``?expand=`` and hands them to a ``SparseFieldsetMixin`` serializer."""
+
+    def get_fieldset(self):
+        return parse_fieldset(self.request.query_params.get("fields"))
+
+    def get_expand(self):
+        return parse_fieldset(self.request.query_params.get("expand")) or {}
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if self.request is not None and issubclass(serializer_class, SparseFieldsetMixin):
+            kwargs.setdefault("fields", self.get_fieldset())
+            kwargs.setdefault("expand", self.get_expand())
+        return super().get_serializer(*args, **kwargs)
+
+
+def fieldset_parameters(expandable=()):
+    """OpenAPI query parameters documenting ``fields`` and, when there is something to expand, ``expand``."""
+    parameters = [
+        OpenApiParameter(
+            "fields", OpenApiTypes.STR, OpenApiParameter.QUERY,
+            description="Comma-separated list of fields to return; nested fields use dots (e.g. `id,targets.name`).",
+        ),
+    ]
+    if expandable:
+        parameters.append(OpenApiParameter(
+            "expand", OpenApiTypes.STR, OpenApiParameter.QUERY,
+            description=f"Comma-separated list of related objects to embed: {', '.join(f'`{e}`' for e in expandable)}.",
+        ))
+    return parameters
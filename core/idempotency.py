@@ -0,0 +1,138 @@
+"""``Idempotency-Key`` support for write endpoints.
+
+A client that retries a POST/PATCH with the same ``Idempotency-Key`` header gets the stored response
+of the first attempt (with ``Idempotent-Replayed: true``) instead of running it again. Responses are
+kept for ``IDEMPOTENCY_TTL`` seconds in the ``idempotency`` cache, whose ``MAX_ENTRIES`` bounds the
+store. Keys belong to the client that sent them: its ``Authorization`` header or session cookie, or
+else its address. While the first request is still running (an ``IdempotencyLock`` row), a repeat
+waits for it (up to ``IDEMPOTENCY_LOCK_SECONDS``) rather than redoing the work. 5xx responses are not
+stored, so a retry after a server error really retries.
+"""
+import hashlib
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import IdempotencyLock
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+idempotency_key_parameter = OpenApiParameter(
+    HEADER, OpenApiTypes.STR, OpenApiParameter.HEADER,
+    description="Unique key of this request. A retry with the same key replays the first response.",
+)
+
+
+def client_scope(request):
+    """Whose keys these are: the client's credential if it sent one, else its address.
+
+    Read from the request itself: API paths run without the authentication middleware (``API_PATH_PREFIXES``).
+    """
+    credential = request.headers.get("Authorization") or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if credential:
+        return f"credential:{credential}"
+    return f"address:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def storage_key(method, path, key, client=""):
+    """Cache key of the response to ``key``; keys are per endpoint and per client (``client_scope()``)."""
+    scope = f"{method}:{path}:{client}:{key}"
+    return "idempotency:" + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def acquire(key, token):
+    """Insert the lock row of ``key``; False while another request holds it."""
+    now = timezone.now()
+    IdempotencyLock.objects.filter(key=key, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyLock.objects.create(
+                key=key, token=token, expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def release(key, token):
+    # Conditional: a lock that expired and was taken over by another request stays theirs.
+    IdempotencyLock.objects.filter(key=key, token=token).delete()
+
+
+class IdempotencyMixin:
+    """API view mixin: honour ``Idempotency-Key`` on the view's POST/PATCH requests."""
+
+    idempotent_methods = ("POST", "PATCH")
+    poll_interval = 0.05
+
+    def dispatch(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or request.method not in self.idempotent_methods:
+            return super().dispatch(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return self._respond(request, args, kwargs, Response(
+                {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            ))
+
+        cache = caches["idempotency"]
+        cache_key = storage_key(request.method, request.path, key, client_scope(request))
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_SECONDS
+        token = uuid.uuid4().hex
+        while True:
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return self._replay(request, args, kwargs, stored, fingerprint)
+            if acquire(cache_key, token):
+                break
+            if time.monotonic() >= deadline:
+                return self._respond(request, args, kwargs, Response(
+                    {"detail": "A request with this Idempotency-Key is still in progress."},
+                    status=status.HTTP_409_CONFLICT,
+                ))
+            time.sleep(self.poll_interval)
+
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code < 500 and hasattr(response, "data"):
+                headers = {name: response[name] for name in ("Location",) if response.has_header(name)}
+                cache.set(cache_key, {
+                    "fingerprint": fingerprint,
+                    "status": response.status_code,
+                    "data": response.data,
+                    "headers": headers,
+                }, settings.IDEMPOTENCY_TTL)
+            return response
+        finally:
+            release(cache_key, token)
+
+    def _replay(self, request, args, kwargs, stored, fingerprint):
+        if stored["fingerprint"] != fingerprint:
+            return self._respond(request, args, kwargs, Response(
+                {"detail": f"{HEADER} was already used with a different request body."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            ))
+        response = Response(stored["data"], status=stored["status"], headers=stored["headers"])
+        response[REPLAYED_HEADER] = "true"
+        return self._respond(request, args, kwargs, response)
+
+    def _respond(self, request, args, kwargs, response):
+        # What APIView.dispatch() does around the handler: content negotiation and default headers.
+        self.args, self.kwargs = args, kwargs
+        self.request = self.initialize_request(request, *args, **kwargs)
+        self.headers = self.default_response_headers
+        self.response = self.finalize_response(self.request, response, *args, **kwargs)
+        return self.response
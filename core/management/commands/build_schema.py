@@ -0,0 +1,18 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.schema import dump_schema, generate_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema and store it in OPENAPI_SCHEMA_FILE so it is not generated at runtime."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", default=settings.OPENAPI_SCHEMA_FILE)
+
+    def handle(self, *args, **options):
+        path = Path(options["file"])
+        path.write_text(dump_schema(generate_schema()), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"Schema written to {path}"))
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schema import dump_schema, generate_schema, load_stored_schema
+
+
+class Command(BaseCommand):
+    help = "Fail if the stored OpenAPI schema (OPENAPI_SCHEMA_FILE) no longer matches the code."
+
+    def handle(self, *args, **options):
+        stored = load_stored_schema()
+        if stored is None:
+            raise CommandError(f"No stored schema at {settings.OPENAPI_SCHEMA_FILE}; run build_schema.")
+        if dump_schema(stored) != dump_schema(generate_schema()):
+            raise CommandError("The stored schema is stale; run build_schema.")
+        self.stdout.write(self.style.SUCCESS("Stored schema is up to date."))
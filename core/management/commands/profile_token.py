@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.profiling import HEADER, make_token
+
+
+class Command(BaseCommand):
+    help = "Print an X-Profile header value: requests sending it are profiled (see core.profiling)."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{HEADER}: {make_token()}")
+        self.stderr.write(f"Valid for {settings.PROFILING_TOKEN_MAX_AGE} s; profiles go to "
+                          f"{settings.PROFILING_DIR or '(PROFILING_DIR is not set)'}.")
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+
+from core.db_routers import replica_reads
+
+PIN_COOKIE = "db_pin"
+
+
+class ReplicaRoutingMiddleware:
+    """Send safe-method requests to the read replicas, with read-your-writes stickiness.
+
+    After a client makes a write request it is pinned to the primary for ``REPLICA_PIN_SECONDS``:
+    by a cookie and, for clients that drop cookies, by its address in the cache (0 disables pinning).
+    The address pin needs a cache every process sees (``CACHE_SHARED``), and ``X-Forwarded-For`` is
+    only believed when the request comes from one of the ``TRUSTED_PROXIES``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        pin_key = f"db-pin:{self.client_address(request)}" if settings.CACHE_SHARED else None
+        if request.method in SAFE_METHODS:
+            use_replica = PIN_COOKIE not in request.COOKIES and not (pin_key and cache.get(pin_key))
+            with replica_reads(use_replica):
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        pin_seconds = settings.REPLICA_PIN_SECONDS
+        if pin_seconds > 0:
+            if pin_key:
+                cache.set(pin_key, 1, pin_seconds)
+            response.set_cookie(PIN_COOKIE, "1", max_age=pin_seconds, httponly=True, samesite="Lax")
+        return response
+
+    @staticmethod
+    def client_address(request):
+        address = request.META.get("REMOTE_ADDR", "")
+        trusted = settings.TRUSTED_PROXIES
+        if address in trusted:
+            # Each proxy appends the address it got the request from: the last one that isn't ours is
+            # the client; anything before it is whatever the client sent.
+            for hop in reversed(request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")):
+                if hop.strip():
+                    address = hop.strip()
+                    if address not in trusted:
+                        break
+        return address
+
+
+class SiteMiddleware:
+    """Run ``SITE_MIDDLEWARE`` for every path except those under ``API_PATH_PREFIXES``.
+
+    Sessions, CSRF, authentication, messages and static files are for the admin and the API docs; the
+    JSON API is stateless, so its requests skip them (and the session and user queries of a browser that
+    is logged in to the admin). Put last in ``MIDDLEWARE``: the wrapped middleware is built and its
+    ``process_view()``/``process_exception()``/``process_template_response()`` are called the way
+    Django's handler does it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.api_prefixes = tuple(settings.API_PATH_PREFIXES)
+        handler, middleware = get_response, []
+        for path in reversed(settings.SITE_MIDDLEWARE):
+            try:
+                instance = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            middleware.insert(0, instance)
+            handler = convert_exception_to_response(instance)
+        self.site_response = handler
+        self.view_middleware = [mw.process_view for mw in middleware if hasattr(mw, "process_view")]
+        self.exception_middleware = [
+            mw.process_exception for mw in reversed(middleware) if hasattr(mw, "process_exception")
+        ]
+        self.template_response_middleware = [
+            mw.process_template_response for mw in reversed(middleware) if hasattr(mw, "process_template_response")
+        ]
+
+    def is_api(self, request):
+        return request.path_info.startswith(self.api_prefixes)
+
+    def __call__(self, request):
+        if self.is_api(request):
+            return self.get_response(request)
+        return self.site_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_api(request):
+            for process_view in self.view_middleware:
+                response = process_view(request, view_func, view_args, view_kwargs)
+                if response is not None:
+                    return response
+        return None
+
+    def process_exception(self, request, exception):
+        if not self.is_api(request):
+            for process_exception in self.exception_middleware:
+                response = process_exception(request, exception)
+                if response is not None:
+                    return response
+        return None
+
+    def process_template_response(self, request, response):
+        if not self.is_api(request):
+            for process_template_response in self.template_response_middleware:
+                response = process_template_response(request, response)
+        return response
@@ -0,0 +1,29 @@
+from django.db import models, router, transaction
+
+
+class AtomicSaveModel(models.Model):
+    """Model whose ``save()`` runs in a transaction together with its ``post_save`` receivers.
+
+    Django sends ``post_save`` after its own write has been committed in autocommit mode, so rows
+    written by receivers (e.g. the change log) could otherwise be lost or seen without the row.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class IdempotencyLock(models.Model):
+    """A request running with an ``Idempotency-Key`` (``core.idempotency``), one row per key.
+
+    Only the request that inserted the row (``token``) deletes it, with one conditional ``DELETE``; a row
+    left behind by a request that died is taken over once ``expires_at`` has passed.
+    """
+
+    key = models.CharField(max_length=100, primary_key=True)
+    token = models.CharField(max_length=32)
+    expires_at = models.DateTimeField()
@@ -0,0 +1,151 @@
+"""Cache-aside copies of single rows (``OBJECT_CACHE_MODELS``: cats and missions) looked up by primary key.
+
+Two tiers: a per-process LRU of ``OBJECT_CACHE_L1_SIZE`` rows, in front of the default cache, where rows
+are kept ``OBJECT_CACHE_SECONDS`` (0 switches the whole thing off). The default cache has to be the same
+for every process (``CACHE_SHARED``): another process' write could not reach a per-process one, so
+without it every lookup reads the database.
+
+Each row is stored under its own *version*, a random value in the shared cache. An update or delete of
+rows -- post_save/post_delete, ``rows_saved``/``rows_deleted`` -- replaces the versions of those rows
+only (right away, and again when the transaction commits): a copy read before the write is left under a
+version nobody asks for. The writing process drops the rows from its LRU at once; the other processes
+keep a row in theirs at most ``OBJECT_CACHE_L1_CHECK_SECONDS``. Created rows aren't cached as missing,
+so creating one changes nothing.
+
+Meant for read-only lookups that tolerate that much delay -- "does this cat exist", a cat's detail page.
+Writes check what they refer to in the database. Rows read inside a transaction are cached only once it
+commits. ``stats`` counts the lookups per tier (``/metrics/``).
+"""
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+
+from core.signals import rows_deleted, rows_saved
+
+_caches = {}
+
+
+def enabled():
+    return settings.CACHE_SHARED and settings.OBJECT_CACHE_SECONDS > 0
+
+
+class ObjectCache:
+    def __init__(self, model):
+        self.model = model
+        self.label = model._meta.label
+        self.fields = [field.attname for field in model._meta.concrete_fields]
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()
+
+    def version_key(self, pk):
+        return f"object-cache-version:{self.label}:{pk}"
+
+    def version(self, pk):
+        key = self.version_key(pk)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, settings.OBJECT_CACHE_SECONDS)
+            version = cache.get(key)
+        return version
+
+    def get(self, pk):
+        """A fresh instance of the row with ``pk``, or None; ``pk`` is converted like the field does it."""
+        pk = self.model._meta.pk.to_python(pk)
+        if not enabled():
+            self.stats["miss"] += 1
+            return self.model._default_manager.filter(pk=pk).first()
+
+        now = time.monotonic()
+        with self._lock:
+            values, stored_at = self._rows.get(pk, (None, 0))
+            if values is not None and now - stored_at < settings.OBJECT_CACHE_L1_CHECK_SECONDS:
+                self._rows.move_to_end(pk)
+            else:
+                values = None
+        if values is not None:
+            self.stats["l1"] += 1
+        else:
+            key = f"object-cache:{self.label}:{pk}:{self.version(pk)}"
+            values = cache.get(key)
+            if values is not None:
+                self.stats["l2"] += 1
+            else:
+                self.stats["miss"] += 1
+                values = self.model._default_manager.filter(pk=pk).values_list(*self.fields).first()
+                if values is None:
+                    return None
+                # Rows read in a transaction may never be committed: cache them once they are.
+                using = router.db_for_read(self.model)
+                transaction.on_commit(lambda: cache.set(key, values, settings.OBJECT_CACHE_SECONDS), using=using)
+            self._remember(pk, values, now)
+        return self.model.from_db(router.db_for_read(self.model), self.fields, values)
+
+    def _remember(self, pk, values, stored_at):
+        def remember():
+            with self._lock:
+                if not settings.OBJECT_CACHE_L1_SIZE:
+                    return
+                self._rows[pk] = (values, stored_at)
+                self._rows.move_to_end(pk)
+                while len(self._rows) > settings.OBJECT_CACHE_L1_SIZE:
+                    self._rows.popitem(last=False)
+
+        transaction.on_commit(remember, using=router.db_for_read(self.model))
+
+    def invalidate(self, pks, using="default"):
+        """Drop the cached copies of the rows ``pks``, now and once the current transaction commits."""
+        pks = [self.model._meta.pk.to_python(pk) for pk in pks]
+        if not enabled() or not pks:
+            return
+
+        def bump():
+            with self._lock:
+                for pk in pks:
+                    self._rows.pop(pk, None)
+            cache.set_many({self.version_key(pk): uuid.uuid4().hex for pk in pks}, settings.OBJECT_CACHE_SECONDS)
+
+        if transaction.get_connection(using).in_atomic_block:
+            bump()
+        transaction.on_commit(bump, using=using)
+
+    def clear_local(self):
+        with self._lock:
+            self._rows.clear()
+
+    def __len__(self):
+        return len(self._rows)
+
+
+def register(model):
+    """Create the cache of ``model`` and hook it to the model's writes (``CoreConfig.ready()``)."""
+    object_cache = _caches[model._meta.label] = ObjectCache(model)
+
+    def written(sender, instance, using, created=False, **kwargs):
+        if not created:
+            object_cache.invalidate([instance.pk], using)
+
+    def rows_written(sender, pks, using, created=False, **kwargs):
+        if not created:
+            object_cache.invalidate(pks, using)
+
+    uid = f"object-cache-{model._meta.label}"
+    post_save.connect(written, sender=model, weak=False, dispatch_uid=f"{uid}-saved")
+    post_delete.connect(written, sender=model, weak=False, dispatch_uid=f"{uid}-deleted")
+    rows_saved.connect(rows_written, sender=model, weak=False, dispatch_uid=f"{uid}-rows-saved")
+    rows_deleted.connect(rows_written, sender=model, weak=False, dispatch_uid=f"{uid}-rows-deleted")
+    return object_cache
+
+
+def object_cache(model):
+    return _caches[model._meta.label]
+
+
+def all_caches():
+    return list(_caches.values())
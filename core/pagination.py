@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+def planner_estimate(queryset, threshold=None):
+    """PostgreSQL's row estimate for an unfiltered query on a big table, otherwise ``None``.
+
+    ``COUNT(*)`` has to scan the whole table; ``pg_class.reltuples`` (kept up to date by
+    autovacuum/ANALYZE) is used instead once it reaches ``threshold``
+    (``settings.COUNT_ESTIMATE_THRESHOLD`` by default, 0 disables estimates).
+    """
+    if threshold is None:
+        threshold = settings.COUNT_ESTIMATE_THRESHOLD
+    query = queryset.query
+    connection = connections[queryset.db]
+    if (
+        not threshold
+        or connection.vendor != "postgresql"
+        or query.where
+        or query.distinct
+        or query.combinator
+        or query.is_sliced
+    ):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    if row and row[0] >= threshold:
+        return int(row[0])
+    return None
+
+
+def estimated_count(queryset, threshold=None):
+    """``queryset.count()``, or ``planner_estimate`` when there is one."""
+    estimate = planner_estimate(queryset, threshold)
+    return queryset.count() if estimate is None else estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count for an unfiltered big table is the planner's estimate."""
+
+    count_is_estimated = False
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, "query"):
+            estimate = planner_estimate(self.object_list)
+            if estimate is not None:
+                self.count_is_estimated = True
+                return estimate
+        return super().count
+
+
+class EstimatedCountPageNumberPagination(PageNumberPagination):
+    """Page-number pagination that doesn't ``COUNT(*)`` big tables.
+
+    ``count_estimated`` tells clients when ``count`` (and so the last page) is approximate.
+    """
+
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response({
+            "count": self.page.paginator.count,
+            "count_estimated": self.page.paginator.count_is_estimated,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_estimated"] = {"type": "boolean", "example": False}
+        response_schema["required"].append("count_estimated")
+        return response_schema
@@ -0,0 +1,86 @@
+"""cProfile of single requests, on demand.
+
+Switched on by ``PROFILING_DIR``. A request is profiled when it carries a valid ``X-Profile`` header
+(``manage.py profile_token``) or is picked by ``PROFILING_SAMPLE_RATE``; any other request costs a
+header lookup (and a random number while sampling is on). The profile is written to
+``PROFILING_DIR`` -- at most ``PROFILING_MAX_FILES`` are kept, the oldest go first -- and its name is
+returned in ``X-Profile-Id``. Staff users find them at ``/admin/profiles/`` (``core.profiling_views``).
+"""
+import cProfile
+import os
+import random
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+HEADER = "X-Profile"
+ID_HEADER = "X-Profile-Id"
+SALT = "core.profiling"
+FILE_NAME = re.compile(r"^(?P<at>\d{8}T\d{12})-(?P<ms>\d+)ms-(?P<method>[A-Z]+)(?P<path>[\w.-]*)\.prof$")
+
+
+def make_token():
+    """Value of the ``X-Profile`` header, valid for ``PROFILING_TOKEN_MAX_AGE`` seconds."""
+    return signing.TimestampSigner(salt=SALT).sign("profile")
+
+
+def valid_token(value):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(value, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def profile_files():
+    return sorted(Path(settings.PROFILING_DIR).glob("*.prof"))
+
+
+class ProfilingMiddleware:
+    """Profile the requests that ask for it (or are sampled) and store the result."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = Path(settings.PROFILING_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __call__(self, request):
+        token = request.headers.get(HEADER)
+        if token is None:
+            rate = settings.PROFILING_SAMPLE_RATE
+            if not rate or random.random() >= rate:
+                return self.get_response(request)
+        elif not valid_token(token):
+            return self.get_response(request)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active in this thread.
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+        response[ID_HEADER] = self.save(profile, request, time.perf_counter() - start)
+        return response
+
+    def save(self, profile, request, seconds):
+        path = re.sub(r"[^\w.-]+", "_", request.path)[:100]
+        name = f"{timezone.now():%Y%m%dT%H%M%S%f}-{round(seconds * 1000)}ms-{request.method}{path}.prof"
+        temporary = self.directory / f".{name}.tmp"
+        profile.dump_stats(temporary)
+        os.replace(temporary, self.directory / name)
+
+        for old in profile_files()[:-settings.PROFILING_MAX_FILES]:
+            old.unlink(missing_ok=True)
+        return name
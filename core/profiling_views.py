@@ -0,0 +1,48 @@
+"""``/admin/profiles/``: the profiles ``core.profiling`` stored, for staff users.
+
+Only imported by the URLconf when the admin is enabled: it depends on ``django.contrib.admin``, which the
+middleware doesn't, so workers without the admin never load it.
+"""
+import io
+import pstats
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse
+
+from core.profiling import FILE_NAME, profile_files
+
+
+@staff_member_required
+def profile_list(request):
+    """The stored profiles, slowest request first."""
+    if not settings.PROFILING_DIR:
+        raise Http404("Profiling is off (PROFILING_DIR).")
+    rows = [match for match in map(FILE_NAME.match, (path.name for path in profile_files())) if match]
+    rows.sort(key=lambda match: int(match["ms"]), reverse=True)
+    lines = [f"{len(rows)} profiles in {settings.PROFILING_DIR}, slowest first", ""]
+    lines += [
+        f"{match['ms']:>8} ms  {match['at'][:15]}  {match['method']:<7}{match['path'].replace('_', '/'):<50}"
+        f"  {request.path}{match[0]}/"
+        for match in rows
+    ]
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; charset=utf-8")
+
+
+@staff_member_required
+def profile_detail(request, name):
+    """One profile as a pstats report sorted by cumulative time (``?limit=``, ``?download=1``)."""
+    if not settings.PROFILING_DIR:
+        raise Http404("Profiling is off (PROFILING_DIR).")
+    path = Path(settings.PROFILING_DIR) / name
+    if not FILE_NAME.match(name) or not path.is_file():
+        raise Http404("No such profile.")
+    if request.GET.get("download"):
+        return FileResponse(path.open("rb"), as_attachment=True, filename=name)
+
+    report = io.StringIO()
+    stats = pstats.Stats(str(path), stream=report)
+    limit = request.GET.get("limit", "")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(int(limit) if limit.isdigit() else 60)
+    return HttpResponse(report.getvalue(), content_type="text/plain; charset=utf-8")
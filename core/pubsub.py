@@ -0,0 +1,141 @@
+"""Publish/subscribe for pushing events to streaming (SSE) clients.
+
+Publishers are ordinary sync code; subscribers are coroutines on the ASGI event loop. Idle
+subscribers are just a queue each -- no thread, no database connection.
+
+``settings.EVENTS_BROKER`` selects the implementation:
+
+* ``LocalBroker`` -- in-process only: events published by another process are never seen.
+  Fine for a single process and for tests.
+* ``PostgresBroker`` -- ``NOTIFY`` on one channel, and one ``LISTEN`` connection per process
+  that fans out to its local subscribers, so a write in a WSGI worker reaches an ASGI process.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBroker:
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    @asynccontextmanager
+    async def subscribe(self, topic):
+        """Yield an ``asyncio.Queue`` that receives every message published to ``topic``."""
+        entry = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers[topic].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._subscribers[topic].discard(entry)
+                if not self._subscribers[topic]:
+                    del self._subscribers[topic]
+
+    def publish(self, topic, message):
+        self._dispatch(topic, message)
+
+    def _dispatch(self, topic, message):
+        with self._lock:
+            entries = list(self._subscribers.get(topic, ()))
+        queues = defaultdict(list)
+        for loop, queue in entries:
+            queues[loop].append(queue)
+        # One wake-up per event loop, not per subscriber.
+        for loop, loop_queues in queues.items():
+            try:
+                loop.call_soon_threadsafe(_offer, loop_queues, message)
+            except RuntimeError:  # the subscribers' loop is already closed
+                pass
+
+
+def _offer(queues, message):
+    for queue in queues:
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind loses events rather than growing the queue without bound.
+            pass
+
+
+class PostgresBroker(LocalBroker):
+    channel = "spycats_events"
+    reconnect_delay = 1
+
+    def __init__(self, using="default"):
+        super().__init__()
+        self.using = using
+        self._listeners = {}
+
+    @asynccontextmanager
+    async def subscribe(self, topic):
+        loop = asyncio.get_running_loop()
+        if loop not in self._listeners:
+            self._listeners[loop] = loop.create_task(self._listen())
+        async with super().subscribe(topic) as queue:
+            yield queue
+
+    def publish(self, topic, message):
+        payload = json.dumps({"topic": topic, "message": message}, separators=(",", ":"))
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    async def _listen(self):
+        import psycopg
+
+        params = connections[self.using].get_connection_params()
+        for key in ("context", "cursor_factory", "prepare_threshold", "server_side_binding", "pool"):
+            params.pop(key, None)
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(autocommit=True, **params) as conn:
+                    await conn.execute(f"LISTEN {self.channel}")
+                    async for notify in conn.notifies():
+                        event = json.loads(notify.payload)
+                        self._dispatch(event["topic"], event["message"])
+            except (psycopg.Error, OSError):
+                logger.exception("Lost the %s listener connection, reconnecting", self.channel)
+                await asyncio.sleep(self.reconnect_delay)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENTS_BROKER)()
+    return _broker
+
+
+def publish_on_commit(topic, message, using="default"):
+    """Publish ``message`` once the current transaction commits (right away in autocommit).
+
+    A failing broker is logged, never turned into an error for the write that was just committed.
+    """
+    transaction.on_commit(lambda: get_broker().publish(topic, message), using=using, robust=True)
+
+
+@receiver(setting_changed)
+def _reset_broker(*, setting, **kwargs):
+    global _broker
+    if setting == "EVENTS_BROKER":
+        _broker = None
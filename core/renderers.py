@@ -0,0 +1,54 @@
+import decimal
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_fallback_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """Encode what orjson/msgpack can't handle natively, the same way DRF's ``JSONEncoder`` would.
+
+    Decimals are the exception: they are emitted as strings so no precision is lost to ``float``.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    return _fallback_encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Drop-in replacement for ``JSONRenderer`` backed by orjson.
+
+    Datetimes are encoded natively by orjson (full microsecond precision, ``Z`` for UTC).
+    orjson only knows one indentation width, so any requested ``indent`` renders with two spaces.
+    """
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=encode_default, option=options)
+        # Same as JSONRenderer: keep the output a strict javascript subset.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders ``application/msgpack``; dates, decimals etc. are encoded as strings exactly like in JSON."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
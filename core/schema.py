@@ -0,0 +1,86 @@
+"""OpenAPI schema generated once per process (or at build time) instead of on every request.
+
+``manage.py build_schema`` writes the schema to ``settings.OPENAPI_SCHEMA_FILE``; when that file
+exists it is served as is, otherwise the schema is generated on the first request. Every rendering
+is kept in memory together with its ETag, so repeated loads of the docs pages are answered with 304.
+"""
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from drf_spectacular.renderers import OpenApiJsonRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+_lock = threading.Lock()
+_schema = None
+_rendered = {}
+
+
+def generate_schema():
+    """Introspect the API and return the schema as plain JSON data."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    return json.loads(OpenApiJsonRenderer().render(schema))
+
+
+def dump_schema(schema):
+    return json.dumps(schema, indent=2, sort_keys=True, ensure_ascii=False) + "\n"
+
+
+def load_stored_schema():
+    path = settings.OPENAPI_SCHEMA_FILE
+    if path and Path(path).exists():
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    return None
+
+
+def get_schema():
+    global _schema
+    if _schema is None:
+        with _lock:
+            if _schema is None:
+                _schema = load_stored_schema() or generate_schema()
+    return _schema
+
+
+def rendered_schema(renderer, media_type):
+    """Return ``(content, etag)`` of the schema rendered by ``renderer``, computed once per media type."""
+    key = (type(renderer), media_type)
+    if key not in _rendered:
+        content = renderer.render(get_schema(), media_type, {})
+        _rendered[key] = (content, '"%s"' % hashlib.sha256(content).hexdigest()[:32])
+    return _rendered[key]
+
+
+@receiver(setting_changed)
+def _clear_schema_cache(*, setting, **kwargs):
+    global _schema
+    if setting in ("OPENAPI_SCHEMA_FILE", "SPECTACULAR_SETTINGS"):
+        _schema = None
+        _rendered.clear()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    def _get_schema_response(self, request):
+        # Versioned or translated schemas are rare; generate those on demand.
+        if self.api_version or request.version or request.GET.get("version") or request.GET.get("lang"):
+            return super()._get_schema_response(request)
+
+        renderer, media_type = request.accepted_renderer, request.accepted_media_type
+        content, etag = rendered_schema(renderer, media_type)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            content_type = f"{media_type}; charset={renderer.charset}" if renderer.charset else media_type
+            response = HttpResponse(content, content_type=content_type)
+            response["Content-Disposition"] = f'inline; filename="{self._get_filename(request, None)}"'
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        return response
@@ -0,0 +1,10 @@
+from django.db.models.signals import ModelSignal
+
+# Sent (with ``pks`` and ``using``) by code that writes rows without ``Model.save()``/``delete()``
+# -- bulk_create(), queryset update()/delete() -- so receivers that follow post_save/post_delete
+# don't miss those writes. Send them inside the transaction that did the write; ``rows_saved`` with
+# ``created=True`` when the rows were inserted. A sender that already has what receivers would read
+# back may pass it along, e.g. ``parents`` ({pk: (target_id, mission_id, cat_id)}) for notes.
+# ``rows_deleted`` with ``archived=True`` when the rows were moved to the archive rather than deleted.
+rows_saved = ModelSignal(use_caching=True)
+rows_deleted = ModelSignal(use_caching=True)
@@ -0,0 +1,496 @@
+import datetime
+import json
+from decimal import Decimal
+
+import msgpack
+import pytest
+from django.core.management import CommandError, call_command
+
+from core.database import database_config
+from core.pagination import EstimatedCountPaginator, estimated_count
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+
+def test_orjson_renderer_keeps_decimal_and_datetime_exact():
+    data = {
+        "salary": Decimal("12345678.91"),
+        "created_at": datetime.datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+    }
+    assert ORJSONRenderer().render(data) == b'{"salary":"12345678.91","created_at":"2025-01-02T03:04:05.123456Z"}'
+    assert msgpack.unpackb(MessagePackRenderer().render(data)) == {
+        "salary": "12345678.91",
+        "created_at": "2025-01-02T03:04:05.123456Z",
+    }
+
+
+@pytest.mark.django_db
+def test_msgpack_request_and_response(api_client, make_cat):
+    cat = make_cat()
+    payload = {"cat": cat.id, "targets": [{"name": "T1", "country": "UA"}]}
+    r = api_client.post("/missions/create/", payload, format="msgpack", HTTP_ACCEPT="application/msgpack")
+    assert r.status_code == 201
+    assert r["Content-Type"] == "application/msgpack"
+    body = msgpack.unpackb(r.content)
+    assert body["cat"] == cat.id
+    assert body["targets"][0]["country"] == "UA"
+
+
+@pytest.mark.django_db
+def test_json_is_default_response_format(api_client, make_cat):
+    make_cat(salary=Decimal("1234.50"))
+    r = api_client.get("/cats/")
+    assert r["Content-Type"] == "application/json"
+    assert b'"salary":"1234.50"' in r.content
+
+
+def test_database_config_persistent_by_default():
+    config = database_config("postgres://u:p@db:5432/spycats", env={})
+    assert config["CONN_MAX_AGE"] == 600
+    assert config["CONN_HEALTH_CHECKS"] is True
+    assert "pool" not in config["OPTIONS"]
+
+
+def test_database_config_pool_mode():
+    env = {"DB_POOL_MODE": "pool", "DB_POOL_MIN_SIZE": "4", "DB_POOL_MAX_SIZE": "20"}
+    config = database_config("postgres://u:p@db:5432/spycats", env=env)
+    assert config["CONN_MAX_AGE"] == 0
+    assert config["OPTIONS"]["pool"]["min_size"] == 4
+    assert config["OPTIONS"]["pool"]["max_size"] == 20
+    assert config["CONN_HEALTH_CHECKS"] is True
+
+
+def test_database_config_pool_mode_builds_the_pool():
+    from django.db.backends.postgresql.base import DatabaseWrapper
+    from psycopg_pool import ConnectionPool
+
+    config = database_config("postgres://u:p@db:5432/spycats", env={"DB_POOL_MODE": "pool"})
+    wrapper = DatabaseWrapper({**config, "TIME_ZONE": None, "AUTOCOMMIT": True, "ATOMIC_REQUESTS": False,
+                               "TEST": {}}, alias="pool-test")
+    try:
+        pool = wrapper.pool  # Created closed: no server needed.
+        assert pool.max_size == 10
+        assert pool._check == ConnectionPool.check_connection
+    finally:
+        wrapper._connection_pools.pop("pool-test", None)
+
+
+def test_database_config_pgbouncer_mode():
+    config = database_config("postgres://u:p@bouncer:6432/spycats", env={"DB_POOL_MODE": "pgbouncer"})
+    assert config["DISABLE_SERVER_SIDE_CURSORS"] is True
+    assert "prepare_threshold" not in config["OPTIONS"]
+
+
+def test_database_config_ignores_pool_mode_for_sqlite():
+    config = database_config("sqlite:///tmp/db.sqlite3", env={"DB_POOL_MODE": "pool"})
+    assert "pool" not in config["OPTIONS"]
+    assert config["OPTIONS"]["transaction_mode"] == "IMMEDIATE"
+
+
+def test_database_config_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        database_config("postgres://u:p@db:5432/spycats", env={"DB_POOL_MODE": "bogus"})
+
+
+# Transactional: reads inside a transaction on the primary never go to a replica.
+@pytest.mark.django_db(transaction=True)
+def test_safe_requests_read_from_replica(api_client, make_cat, replica_db):
+    cat = make_cat(name="Primary only")
+
+    r = api_client.get("/cats/")
+    assert r.status_code == 200
+    assert r.data["count"] == 0  # served by the (empty) replica
+
+    r = api_client.patch(f"/cats/{cat.id}/", {"salary": "10.00"}, format="json")
+    assert r.status_code == 200  # writes find the row on the primary
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_stick_to_primary_after_write(api_client, make_cat, replica_db, settings):
+    settings.CACHE_SHARED = True
+    cat = make_cat(name="Primary only")
+    api_client.patch(f"/cats/{cat.id}/", {"salary": "10.00"}, format="json")
+
+    r = api_client.get("/cats/")
+    assert r.data["count"] == 1
+
+    api_client.cookies.clear()
+    r = api_client.get("/cats/")
+    assert r.data["count"] == 1  # still pinned by client address
+    # Some other client claiming that address is not believed.
+    r = api_client.get("/cats/", REMOTE_ADDR="198.51.100.1", HTTP_X_FORWARDED_FOR="127.0.0.1")
+    assert r.data["count"] == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_address_pin_behind_trusted_proxy(api_client, make_cat, replica_db, settings):
+    from django.core.cache import cache
+
+    settings.CACHE_SHARED = True
+    settings.TRUSTED_PROXIES = ["127.0.0.1"]
+    cat = make_cat(name="Primary only")
+    api_client.patch(f"/cats/{cat.id}/", {"salary": "10.00"}, format="json",
+                     HTTP_X_FORWARDED_FOR="10.9.9.9, 203.0.113.7")
+    api_client.cookies.clear()
+
+    assert api_client.get("/cats/", HTTP_X_FORWARDED_FOR="203.0.113.7").data["count"] == 1
+    assert api_client.get("/cats/", HTTP_X_FORWARDED_FOR="203.0.113.8").data["count"] == 0
+    assert api_client.get("/cats/", HTTP_X_FORWARDED_FOR="10.9.9.9").data["count"] == 0
+    cache.clear()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_address_pin_needs_a_shared_cache(api_client, make_cat, replica_db, settings):
+    settings.CACHE_SHARED = False
+    cat = make_cat(name="Primary only")
+    api_client.patch(f"/cats/{cat.id}/", {"salary": "10.00"}, format="json")
+    assert api_client.get("/cats/").data["count"] == 1  # the cookie
+
+    api_client.cookies.clear()
+    assert api_client.get("/cats/").data["count"] == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pinning_disabled(api_client, make_cat, replica_db, settings):
+    settings.REPLICA_PIN_SECONDS = 0
+    cat = make_cat(name="Primary only")
+    api_client.patch(f"/cats/{cat.id}/", {"salary": "10.00"}, format="json")
+
+    r = api_client.get("/cats/")
+    assert r.data["count"] == 0
+
+
+@pytest.mark.django_db
+def test_schema_is_served_with_etag(api_client, settings, tmp_path):
+    settings.OPENAPI_SCHEMA_FILE = tmp_path / "missing.json"
+    r1 = api_client.get("/api/schema/", HTTP_ACCEPT="application/vnd.oai.openapi+json")
+    assert r1.status_code == 200
+    assert "/missions/" in json.loads(r1.content)["paths"]
+
+    r2 = api_client.get("/api/schema/", HTTP_ACCEPT="application/vnd.oai.openapi+json", HTTP_IF_NONE_MATCH=r1["ETag"])
+    assert r2.status_code == 304
+
+
+@pytest.mark.django_db
+def test_stored_schema_is_served_and_checked(api_client, settings, tmp_path):
+    settings.OPENAPI_SCHEMA_FILE = tmp_path / "schema.json"
+    call_command("build_schema")
+    call_command("check_schema")
+
+    schema = json.loads(settings.OPENAPI_SCHEMA_FILE.read_text())
+    schema["info"]["title"] = "Stale"
+    settings.OPENAPI_SCHEMA_FILE.write_text(json.dumps(schema))
+    with pytest.raises(CommandError, match="stale"):
+        call_command("check_schema")
+
+    r = api_client.get("/api/schema/", HTTP_ACCEPT="application/vnd.oai.openapi+json")
+    assert json.loads(r.content)["info"]["title"] == "Stale"
+
+
+@pytest.mark.django_db
+def test_estimated_count_is_exact_below_threshold_or_off_postgres(make_cat):
+    from cats.models import SpyCat
+
+    make_cat()
+    make_cat()
+    assert estimated_count(SpyCat.objects.all(), threshold=1) == 2
+    assert EstimatedCountPaginator(SpyCat.objects.order_by("id"), 1).num_pages == 2
+
+
+@pytest.mark.django_db
+def test_idempotency_key_replays_response(api_client, make_cat):
+    from missions.models import Mission
+
+    cat = make_cat()
+    payload = {"cat": cat.id, "targets": [{"name": "T1", "country": "UA"}]}
+    first = api_client.post("/missions/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+    again = api_client.post("/missions/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+    assert first.status_code == again.status_code == 201
+    assert again.json() == first.json()
+    assert again["Idempotent-Replayed"] == "true" and not first.has_header("Idempotent-Replayed")
+    assert Mission.objects.count() == 1
+
+    reused = api_client.post("/missions/create/", {**payload, "targets": []}, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+    assert reused.status_code == 422
+    api_client.post("/missions/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k2")
+    api_client.post("/missions/create/", payload, format="json")
+    assert Mission.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_idempotency_key_does_not_store_server_errors(api_client, monkeypatch):
+    from cats import views
+    from cats.breeds import BreedRegistryUnavailable
+
+    def unavailable(breed):
+        raise BreedRegistryUnavailable()
+
+    payload = {"name": "Tom", "years_of_experience": 2, "breed": "Siamese", "salary": "100.00"}
+    monkeypatch.setattr(views, "is_known_breed", unavailable)
+    assert api_client.post("/cats/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k").status_code == 502
+
+    calls = []
+    monkeypatch.setattr(views, "is_known_breed", lambda breed: calls.append(breed) or True)
+    assert api_client.post("/cats/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k").status_code == 201
+    assert api_client.post("/cats/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k").status_code == 201
+    assert calls == ["Siamese"]
+
+
+@pytest.mark.django_db
+def test_idempotency_key_repeat_waits_for_first_request(api_client, make_cat, settings):
+    import hashlib
+    import threading
+
+    from django.core.cache import caches
+
+    from django.utils import timezone
+
+    from core.idempotency import release, storage_key
+    from core.models import IdempotencyLock
+
+    # Locmem: the "first request" below writes from another thread.
+    settings.CACHES = {**settings.CACHES, "idempotency": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    settings.IDEMPOTENCY_LOCK_SECONDS = 0.5
+    cache = caches["idempotency"]
+    cat = make_cat()
+    path, body = f"/cats/{cat.id}/", b'{"salary":"10.00"}'
+
+    # A first request holds the lock and stores its response a moment later.
+    key = storage_key("PATCH", path, "k", "address:127.0.0.1")
+    expires_at = timezone.now() + datetime.timedelta(minutes=1)
+    IdempotencyLock.objects.create(key=key, token="first", expires_at=expires_at)
+    stored = {"fingerprint": hashlib.sha256(body).hexdigest(), "status": 200, "data": {"id": cat.id}, "headers": {}}
+    threading.Timer(0.1, cache.set, [key, stored]).start()
+    resp = api_client.patch(path, body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="k")
+    assert resp.status_code == 200 and resp.json() == {"id": cat.id}
+    assert resp["Idempotent-Replayed"] == "true"
+
+    # ... or never finishes.
+    stuck = storage_key("PATCH", path, "stuck", "address:127.0.0.1")
+    IdempotencyLock.objects.create(key=stuck, token="first", expires_at=expires_at)
+    resp = api_client.patch(path, body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="stuck")
+    assert resp.status_code == 409
+
+    # Once expired, the lock is taken over; the request that lost it cannot release the new one.
+    IdempotencyLock.objects.filter(key=stuck).update(expires_at=timezone.now())
+    resp = api_client.patch(path, body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="stuck")
+    assert resp.status_code == 200
+    IdempotencyLock.objects.create(key=stuck, token="third", expires_at=expires_at)
+    release(stuck, "first")
+    assert IdempotencyLock.objects.filter(key=stuck, token="third").exists()
+
+
+@pytest.mark.django_db
+def test_idempotency_keys_belong_to_the_client(settings):
+    from rest_framework.test import APIClient
+
+    from missions.models import Mission
+
+    # The same address, told apart by their sessions.
+    clients = [APIClient(), APIClient()]
+    for number, client in enumerate(clients):
+        client.cookies[settings.SESSION_COOKIE_NAME] = f"session-{number}"
+    payload = {"targets": [{"name": "T1", "country": "UA"}]}
+    first, other = (client.post("/missions/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k")
+                    for client in clients)
+    assert first.status_code == other.status_code == 201
+    assert not other.has_header("Idempotent-Replayed") and Mission.objects.count() == 2
+    again = clients[0].post("/missions/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k")
+    assert again["Idempotent-Replayed"] == "true"
+
+
+@pytest.mark.django_db
+def test_batch_runs_operations_with_references(api_client, make_cat):
+    from missions.models import Mission, Note
+
+    cat = make_cat()
+    operations = [
+        {"method": "POST", "path": "/missions/create/",
+         "body": {"targets": [{"name": "T1", "country": "UA"}, {"name": "T2", "country": "US"}]}},
+        {"method": "PATCH", "path": "/missions/$0.id/assign-cat/", "body": {"cat": cat.id}},
+        {"method": "POST", "path": "/missions/targets/$0.targets.0.id/note/create/", "body": {"text": "n1"}},
+        {"method": "POST", "path": "/missions/targets/$0.targets.1.id/note/create/", "body": {"text": "n2"}},
+        {"method": "GET", "path": "/missions/$0.id/?fields=cat,targets.note.text"},
+    ]
+    r = api_client.post("/batch/", {"operations": operations}, format="json")
+    assert r.status_code == 200, r.data
+    assert [result["status"] for result in r.data["results"]] == [201, 200, 201, 201, 200]
+    mission = Mission.objects.get()
+    assert r.data["results"][4]["body"] == {
+        "cat": cat.id, "targets": [{"note": {"text": "n1"}}, {"note": {"text": "n2"}}],
+    }
+    assert mission.cat_id == cat.id and Note.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_batch_rolls_back_when_an_operation_fails(api_client, make_cat):
+    from missions.models import Mission
+
+    operations = [
+        {"method": "POST", "path": "/missions/create/", "body": {"targets": [{"name": "T1", "country": "UA"}]}},
+        {"method": "PATCH", "path": "/missions/$0.id/assign-cat/", "body": {"cat": 999}},
+        {"method": "GET", "path": "/missions/"},
+    ]
+    r = api_client.post("/batch/", {"operations": operations}, format="json")
+    assert r.status_code == 400
+    assert r.data["failed"] == 1 and len(r.data["results"]) == 2
+    assert not Mission.objects.exists()
+
+    bad_reference = [{"method": "PATCH", "path": "/missions/$1.id/assign-cat/", "body": {}}]
+    assert api_client.post("/batch/", {"operations": bad_reference}, format="json").status_code == 400
+    nested = [{"method": "POST", "path": "/batch/", "body": {"operations": []}}]
+    assert api_client.post("/batch/", {"operations": nested}, format="json").status_code == 400
+
+
+@pytest.mark.django_db
+def test_batch_is_throttled_per_operation(api_client, monkeypatch, settings):
+    from django.core.cache import cache
+
+    from core.throttling import AnonRateThrottle
+
+    monkeypatch.setattr(AnonRateThrottle, "rate", "5/min", raising=False)
+    cache.clear()
+    get = {"method": "GET", "path": "/missions/"}
+    assert api_client.post("/batch/", {"operations": [get] * 4}, format="json").status_code == 200
+    # 4 of 5 used: a batch of 2 doesn't fit, a single request still does.
+    assert api_client.post("/batch/", {"operations": [get] * 2}, format="json").status_code == 429
+    assert api_client.get("/missions/").status_code == 200
+    assert api_client.get("/missions/").status_code == 429
+    cache.clear()
+
+    # An oversized batch is charged BATCH_MAX_OPERATIONS, not once per (invalid) operation.
+    settings.BATCH_MAX_OPERATIONS = 3
+    assert api_client.post("/batch/", {"operations": [get] * 5000}, format="json").status_code == 400
+    assert [api_client.get("/missions/").status_code for _ in range(3)] == [200, 200, 429]
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_profiling_header_profiles_the_request(api_client, make_cat, settings, tmp_path, django_user_model):
+    from core.profiling import make_token
+
+    settings.PROFILING_DIR = str(tmp_path)
+    settings.PROFILING_MAX_FILES = 2
+    make_cat()
+
+    r = api_client.get("/cats/")
+    assert r.status_code == 200 and "X-Profile-Id" not in r
+    r = api_client.get("/cats/", HTTP_X_PROFILE="forged:token")
+    assert "X-Profile-Id" not in r
+    for _ in range(3):
+        r = api_client.get("/cats/", HTTP_X_PROFILE=make_token())
+        assert r.status_code == 200
+    name = r["X-Profile-Id"]
+    assert sorted(path.name for path in tmp_path.iterdir())[-1] == name
+    assert len(list(tmp_path.iterdir())) == 2
+
+    r = api_client.get("/admin/profiles/")
+    assert r.status_code == 302
+    api_client.force_login(django_user_model.objects.create_user("admin", is_staff=True))
+    r = api_client.get("/admin/profiles/")
+    assert r.status_code == 200 and name in r.content.decode()
+    r = api_client.get(f"/admin/profiles/{name}/")
+    assert r.status_code == 200 and "cumulative" in r.content.decode()
+    assert api_client.get("/admin/profiles/missing.prof/").status_code == 404
+
+    # Profiling off: nothing to list (not the working directory's files).
+    settings.PROFILING_DIR = ""
+    assert api_client.get("/admin/profiles/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_profiling_sample_rate(api_client, settings, tmp_path):
+    settings.PROFILING_DIR = str(tmp_path)
+    settings.PROFILING_SAMPLE_RATE = 1
+    assert "X-Profile-Id" in api_client.get("/cats/")
+
+
+@pytest.mark.django_db
+def test_api_paths_skip_the_site_middleware(client, make_cat, django_user_model, settings):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    make_cat()
+    client.force_login(django_user_model.objects.create_superuser("admin", password="secret"))
+
+    with CaptureQueriesContext(connection) as ctx:
+        r = client.get("/cats/")
+    assert r.status_code == 200 and "X-Frame-Options" not in r
+    assert not any("django_session" in q["sql"] or "auth_user" in q["sql"] for q in ctx.captured_queries)
+
+    r = client.get("/admin/")
+    assert r.status_code == 200 and r["X-Frame-Options"] == "DENY" and r.context["user"].username == "admin"
+    csrf_client = type(client)(enforce_csrf_checks=True)
+    assert csrf_client.post("/admin/login/", {"username": "admin", "password": "secret"}).status_code == 403
+
+    # Without prefixes every path gets the whole stack again (read when the middleware is loaded).
+    settings.API_PATH_PREFIXES = []
+    client = type(client)()
+    client.force_login(django_user_model.objects.get())
+    with CaptureQueriesContext(connection) as ctx:
+        assert "X-Frame-Options" in client.get("/cats/")
+    assert any("django_session" in q["sql"] for q in ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_object_cache_tiers_and_invalidation(api_client, make_cat, settings, django_capture_on_commit_callbacks,
+                                             django_assert_num_queries):
+    from django.core.cache import cache
+
+    from cats.models import SpyCat
+    from core.objectcache import ObjectCache, object_cache
+
+    settings.CACHE_SHARED = True  # The tests run in one process.
+    cats = object_cache(SpyCat)
+    cats.clear_local()
+    cache.clear()
+    cat, neighbour = make_cat(name="Tom"), make_cat(name="Max")
+    try:
+        with django_capture_on_commit_callbacks(execute=True), django_assert_num_queries(1):
+            assert cats.get(cat.pk).name == "Tom"
+        with django_assert_num_queries(0):
+            assert cats.get(str(cat.pk)).name == "Tom"
+        other_process = ObjectCache(SpyCat)
+        with django_capture_on_commit_callbacks(execute=True), django_assert_num_queries(0):
+            assert other_process.get(cat.pk).name == "Tom"
+        assert cats.get(10 ** 9) is None
+        assert cats.stats["l1"] == 1 and other_process.stats["l2"] == 1
+
+        # A write drops the copies of its row only: in the writing process at once, elsewhere once the
+        # LRU copy is OBJECT_CACHE_L1_CHECK_SECONDS old.
+        with django_capture_on_commit_callbacks(execute=True):
+            neighbour.save()
+        with django_assert_num_queries(0):
+            assert cats.get(cat.pk).name == "Tom"
+        with django_capture_on_commit_callbacks(execute=True):
+            cat.name = "Tim"
+            cat.save()
+        with django_capture_on_commit_callbacks(execute=True):
+            assert cats.get(cat.pk).name == "Tim"
+        assert other_process.get(cat.pk).name == "Tom"
+        settings.OBJECT_CACHE_L1_CHECK_SECONDS = 0
+        assert other_process.get(cat.pk).name == "Tim"
+
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.get(f"/cats/{cat.pk}/")
+        with django_assert_num_queries(0):
+            assert api_client.get(f"/cats/{cat.pk}/").data["name"] == "Tim"
+        assert api_client.get("/cats/999999/").status_code == 404
+
+        # Gone without a signal (e.g. deleted by another process): writes still check the database.
+        SpyCat.objects.filter(pk=neighbour.pk)._raw_delete("default")
+        r = api_client.post("/missions/create/", {"cat": neighbour.pk, "targets": [{"name": "A", "country": "UA"}]},
+                            format="json")
+        assert r.status_code == 400 and "cat" in r.data
+
+        settings.METRICS_TOKEN = "s3cret"
+        r = api_client.get("/metrics/", HTTP_AUTHORIZATION="Bearer s3cret")
+        assert 'object_cache_lookups_total{model="cats.SpyCat",tier="l1"}' in r.content.decode()
+
+        # Without a shared cache every lookup reads the database.
+        settings.CACHE_SHARED = False
+        with django_assert_num_queries(1):
+            assert cats.get(cat.pk).name == "Tim"
+    finally:
+        # Later tests reuse the primary keys.
+        cats.clear_local()
+        cache.clear()
@@ -0,0 +1,39 @@
+"""DRF's user/anon throttles, aware of ``/batch/`` (``core.batch``).
+
+A batch is charged once per operation when it arrives -- all or nothing, so a batch is never cut off
+halfway by the rate limit -- and the operations it then runs are not charged again.
+"""
+from rest_framework import throttling
+
+
+class BatchAwareThrottleMixin:
+    def allow_request(self, request, view):
+        if getattr(request, "batch_operation", False):
+            return True
+        weight = getattr(view, "throttle_weight", 1)
+        if weight == 1:
+            return super().allow_request(request, view)
+
+        # SimpleRateThrottle.allow_request(), recording ``weight`` requests at once.
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.history = self.cache.get(self.key, [])
+        self.now = self.timer()
+        while self.history and self.history[-1] <= self.now - self.duration:
+            self.history.pop()
+        if len(self.history) + weight > self.num_requests:
+            return self.throttle_failure()
+        self.history[:0] = [self.now] * weight
+        self.cache.set(self.key, self.history, self.duration)
+        return True
+
+
+class UserRateThrottle(BatchAwareThrottleMixin, throttling.UserRateThrottle):
+    pass
+
+
+class AnonRateThrottle(BatchAwareThrottleMixin, throttling.AnonRateThrottle):
+    pass
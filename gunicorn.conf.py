@@ -0,0 +1,33 @@
+"""Gunicorn settings: ``gunicorn -c gunicorn.conf.py spyCatsTest.wsgi:application``.
+
+With ``GUNICORN_PRELOAD=1`` the application is imported and warmed up once in the master and every
+worker (including the ones restarted after ``--timeout``) is forked from it, so a new worker serves
+immediately and shares the loaded code and data pages with the master copy-on-write.
+"""
+import gc
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 3))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0") == "1"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+
+    from django.db import connections
+    from django.urls import get_resolver
+    from django_countries import countries
+
+    # Import every view/serializer module and build the lazy tables once, in the master.
+    get_resolver().url_patterns
+    list(countries)
+    # A connection opened while warming up must not be shared by the forked workers.
+    connections.close_all()
+    # Move everything loaded so far out of the GC's reach: collections in the workers would
+    # otherwise touch (and so copy) all of these shared pages.
+    gc.freeze()
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from core.pagination import EstimatedCountPaginator
+from jobs.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_after", "started_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("=id", "^name")
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,54 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs import queue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (jobs.queue) until stopped with SIGINT/SIGTERM."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Tasks run at the same time (threads).")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when idle.")
+        parser.add_argument("--once", action="store_true", help="Exit as soon as no task is due.")
+
+    def handle(self, *args, concurrency, poll_interval, once, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        stopping = threading.Event()
+        if not once:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stopping.set())
+
+        running = set()
+        last_purge = 0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="jobs-worker") as executor:
+            while not stopping.is_set():
+                if time.monotonic() - last_purge > 3600:
+                    queue.purge(settings.JOBS_RETENTION_SECONDS)
+                    last_purge = time.monotonic()
+
+                claimed = queue.claim(worker, concurrency - len(running))
+                running.update(executor.submit(queue.run, task) for task in claimed)
+                if not running:
+                    if once:
+                        break
+                    stopping.wait(poll_interval)
+                    continue
+                if len(running) >= concurrency or not claimed:
+                    done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    running -= done
+                    for future in done:
+                        if future.exception():
+                            logger.error("Worker error", exc_info=future.exception())
+            # Leaving the executor waits for the tasks already running.
+        self.stdout.write(f"Worker {worker} stopped.")
@@ -0,0 +1,118 @@
+"""A small database-backed task queue.
+
+Register a function with ``@task("app.name")`` in an app's ``tasks`` module, queue it with
+``enqueue("app.name", **kwargs)`` (or ``func.enqueue(**kwargs)``) from a view or a signal receiver,
+and run ``manage.py run_worker``. The task row is written in the caller's transaction, so a
+rolled-back request never leaves a job behind.
+"""
+import hashlib
+import json
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name, max_attempts=5):
+    """Register the decorated function as task ``name``; its kwargs must be JSON-serializable."""
+    def decorator(func):
+        registry[name] = func
+        func.task_name = name
+        func.max_attempts = max_attempts
+        func.enqueue = lambda delay=0, unique=False, **kwargs: enqueue(name, delay=delay, unique=unique, **kwargs)
+        return func
+    return decorator
+
+
+def enqueue(name, delay=0, unique=False, **kwargs):
+    """Queue task ``name`` to run ``delay`` seconds from now.
+
+    With ``unique`` nothing is queued (and ``None`` returned) while an identical task is still
+    waiting or running; a partial unique index on ``Task.unique_key`` settles concurrent calls.
+    """
+    func = registry[name]
+    task = Task(
+        name=name,
+        kwargs=kwargs,
+        max_attempts=func.max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    if not unique:
+        task.save()
+        return task
+    task.unique_key = hashlib.sha256(
+        json.dumps([name, kwargs], sort_keys=True, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+    try:
+        with transaction.atomic(using=router.db_for_write(Task)):
+            task.save()
+    except IntegrityError:
+        return None
+    return task
+
+
+def claim(worker, limit):
+    """Mark up to ``limit`` due tasks as running for ``worker`` and return them.
+
+    PostgreSQL skips rows another worker has locked (``FOR UPDATE SKIP LOCKED``); elsewhere
+    (SQLite) the guarded UPDATE alone makes sure a task is claimed only once. Tasks left running
+    for longer than ``JOBS_TIMEOUT`` (a dead worker) are claimed again.
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    due = Q(status=Task.Status.QUEUED, run_after__lte=now) | Q(
+        status=Task.Status.RUNNING, started_at__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT)
+    )
+    using = router.db_for_write(Task)
+    with transaction.atomic(using=using):
+        candidates = Task.objects.using(using).filter(due).order_by("run_after", "id")
+        if connections[using].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list("id", flat=True)[:limit])
+        Task.objects.using(using).filter(due, id__in=ids).update(
+            status=Task.Status.RUNNING, locked_by=worker, started_at=now, attempts=F("attempts") + 1,
+        )
+        return list(Task.objects.using(using).filter(id__in=ids, locked_by=worker, started_at=now))
+
+
+def run(claimed):
+    """Run a claimed task and record the outcome: done, queued again after a backoff, or failed."""
+    close_old_connections()
+    try:
+        registry[claimed.name](**claimed.kwargs)
+    except Exception:
+        logger.exception("Task %s #%s failed (attempt %s)", claimed.name, claimed.pk, claimed.attempts)
+        update = {"last_error": traceback.format_exc()}
+        if claimed.attempts < claimed.max_attempts:
+            update.update(status=Task.Status.QUEUED, run_after=timezone.now() + backoff(claimed.attempts))
+        else:
+            update.update(status=Task.Status.FAILED, finished_at=timezone.now())
+    else:
+        update = {"status": Task.Status.DONE, "finished_at": timezone.now(), "last_error": ""}
+    # Guarded by locked_by/started_at: if the task was reclaimed after a timeout, that run owns it now.
+    Task.objects.filter(pk=claimed.pk, locked_by=claimed.locked_by, started_at=claimed.started_at).update(**update)
+
+
+def backoff(attempts):
+    """Exponential delay before the next attempt, capped at JOBS_MAX_BACKOFF, with ±10% jitter."""
+    delay = min(settings.JOBS_BACKOFF * 2 ** (attempts - 1), settings.JOBS_MAX_BACKOFF)
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def purge(older_than):
+    """Delete finished tasks older than ``older_than`` seconds; failed ones stay for inspection."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return Task.objects.filter(status=Task.Status.DONE, finished_at__lt=cutoff).delete()[0]
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Task
+
+calls = []
+
+
+@queue.task("tests.record", max_attempts=2)
+def record(value):
+    calls.append(value)
+    if value == "boom":
+        raise RuntimeError(value)
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_worker_runs_due_tasks_and_retries_failures(settings):
+    settings.JOBS_BACKOFF = 0
+    ok = record.enqueue(value="ok")
+    later = queue.enqueue("tests.record", delay=60, value="later")
+    failing = record.enqueue(value="boom")
+
+    call_command("run_worker", once=True, concurrency=2, stdout=None)
+
+    assert sorted(calls) == ["boom", "boom", "ok"]
+    ok.refresh_from_db()
+    failing.refresh_from_db()
+    later.refresh_from_db()
+    assert (ok.status, ok.attempts) == (Task.Status.DONE, 1)
+    assert (failing.status, failing.attempts) == (Task.Status.FAILED, 2)
+    assert "RuntimeError: boom" in failing.last_error
+    assert later.status == Task.Status.QUEUED
+
+
+@pytest.mark.django_db
+def test_claim_is_exclusive_and_reclaims_lost_tasks(settings):
+    task = record.enqueue(value="x")
+
+    assert [t.pk for t in queue.claim("worker-1", 10)] == [task.pk]
+    assert queue.claim("worker-2", 10) == []
+
+    Task.objects.filter(pk=task.pk).update(started_at=timezone.now() - timedelta(seconds=settings.JOBS_TIMEOUT + 1))
+    reclaimed = queue.claim("worker-2", 10)
+    assert [(t.pk, t.attempts) for t in reclaimed] == [(task.pk, 2)]
+
+
+@pytest.mark.django_db
+def test_unique_enqueue_skips_pending_duplicates():
+    assert record.enqueue(unique=True, value="x") is not None
+    assert record.enqueue(unique=True, value="x") is None
+    assert record.enqueue(unique=True, value="y") is not None
+
+
+@pytest.mark.django_db
+def test_unique_task_is_pending_once_even_when_the_check_races():
+    first = record.enqueue(unique=True, value="x")
+    # A second enqueue that missed the first row still can't insert a duplicate.
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Task.objects.create(name=first.name, kwargs=first.kwargs, unique_key=first.unique_key)
+
+    Task.objects.filter(pk=first.pk).update(status=Task.Status.DONE)
+    assert record.enqueue(unique=True, value="x") is not None
+
+
+@pytest.mark.django_db
+def test_metrics_require_the_token(client, settings):
+    settings.METRICS_TOKEN = ""
+    assert client.get("/metrics/", HTTP_AUTHORIZATION="Bearer ").status_code == 404
+    settings.METRICS_TOKEN = "s3cret"
+    assert client.get("/metrics/").status_code == 404
+    assert client.get("/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code == 404
+    assert client.get("/metrics/", HTTP_AUTHORIZATION="Bearer s3cret").status_code == 200
+
+
+@pytest.mark.django_db
+def test_metrics_report_queue_depth_and_latency(client, settings):
+    settings.METRICS_TOKEN = "s3cret"
+    record.enqueue(value="waiting")
+    record.enqueue(value="waiting too")
+    Task.objects.create(name="tests.record", status=Task.Status.DONE, run_after=timezone.now() - timedelta(seconds=3),
+                        started_at=timezone.now() - timedelta(seconds=2), finished_at=timezone.now())
+
+    r = client.get("/metrics/", HTTP_AUTHORIZATION="Bearer s3cret")
+    assert r.status_code == 200
+    body = r.content.decode()
+    assert 'jobs_queue_depth{task="tests.record"} 2' in body
+    assert 'jobs_tasks{status="done"} 1' in body
+    assert 'jobs_recent_run_seconds_max{task="tests.record"} 2.0' in body
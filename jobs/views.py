@@ -0,0 +1,69 @@
+import hmac
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Min
+from django.http import HttpResponse, HttpResponseNotFound
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from core.objectcache import all_caches
+from jobs.models import Task
+
+
+def _duration(start, end):
+    return ExpressionWrapper(F(end) - F(start), output_field=DurationField())
+
+
+def _authorized(request):
+    token = settings.METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+
+@require_GET
+def metrics(request):
+    """Queue depth, job latency and object cache lookups in the Prometheus text format.
+
+    Only for requests with ``Authorization: Bearer <METRICS_TOKEN>``; without a token set it is off.
+    """
+    if not _authorized(request):
+        return HttpResponseNotFound()
+    now = timezone.now()
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+    due = (Task.objects.filter(status=Task.Status.QUEUED, run_after__lte=now)
+           .values("name").annotate(depth=Count("id"), oldest=Min("run_after")).order_by("name"))
+    metric("jobs_queue_depth", "gauge", "Tasks due and waiting for a worker.",
+           [(f'{{task="{row["name"]}"}}', row["depth"]) for row in due])
+    metric("jobs_queue_oldest_seconds", "gauge", "How long the oldest due task has been waiting.",
+           [(f'{{task="{row["name"]}"}}', round((now - row["oldest"]).total_seconds(), 3)) for row in due])
+
+    by_status = Task.objects.values("status").annotate(total=Count("id")).order_by("status")
+    metric("jobs_tasks", "gauge", "Tasks in the table by status.",
+           [(f'{{status="{row["status"]}"}}', row["total"]) for row in by_status])
+
+    window = settings.JOBS_METRICS_WINDOW
+    recent = list(Task.objects.filter(status=Task.Status.DONE, finished_at__gte=now - timedelta(seconds=window))
+              .values("name")
+              .annotate(count=Count("id"), wait=Max(_duration("run_after", "started_at")),
+                        run=Max(_duration("started_at", "finished_at")))
+              .order_by("name"))
+    metric("jobs_recent_done", "gauge", f"Tasks finished in the last {window:g} s.",
+           [(f'{{task="{row["name"]}"}}', row["count"]) for row in recent])
+    metric("jobs_recent_wait_seconds_max", "gauge", f"Longest wait from due to started, last {window:g} s.",
+           [(f'{{task="{row["name"]}"}}', row["wait"].total_seconds()) for row in recent])
+    metric("jobs_recent_run_seconds_max", "gauge", f"Longest run time, last {window:g} s.",
+           [(f'{{task="{row["name"]}"}}', row["run"].total_seconds()) for row in recent])
+
+    caches = all_caches()
+    metric("object_cache_lookups_total", "counter", "Object cache lookups in this process, by the tier that answered.",
+           [(f'{{model="{c.label}",tier="{tier}"}}', c.stats[tier]) for c in caches for tier in ("l1", "l2", "miss")])
+    metric("object_cache_l1_rows", "gauge", "Rows in this process's object cache LRU.",
+           [(f'{{model="{c.label}"}}', len(c)) for c in caches])
+
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,7 +1,77 @@
+from django import forms
 from django.contrib import admin
 
+from core.pagination import EstimatedCountPaginator
 from missions.models import Mission, Target, Note
 
-admin.site.register(Mission)
-admin.site.register(Target)
-admin.site.register(Note)
+
+class TargetAdminForm(forms.ModelForm):
+    """Target form that also edits the target's note, since admin inlines can't be nested."""
+
+    note_text = forms.CharField(label="Note", required=False, widget=forms.Textarea(attrs={"rows": 2}))
+
+    class Meta:
+        model = Target
+        fields = ("name", "country", "completed")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        note = getattr(self.instance, "note", None) if self.instance.pk else None
+        if note is not None:
+            self.fields["note_text"].initial = note.text
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        text = self.cleaned_data.get("note_text")
+        if text:
+            Note.objects.update_or_create(target=self.instance, defaults={"text": text})
+        elif "note_text" in self.changed_data:
+            Note.objects.filter(target=self.instance).delete()
+
+
+class TargetInline(admin.TabularInline):
+    model = Target
+    form = TargetAdminForm
+    fields = ("name", "country", "completed", "note_text")
+    extra = 0
+    max_num = 3
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("note")
+
+
+@admin.register(Mission)
+class MissionAdmin(admin.ModelAdmin):
+    list_display = ("id", "cat")
+    list_select_related = ("cat",)
+    list_filter = (("cat", admin.EmptyFieldListFilter),)
+    autocomplete_fields = ("cat",)
+    search_fields = ("=id",)
+    ordering = ("-id",)
+    inlines = (TargetInline,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Target)
+class TargetAdmin(admin.ModelAdmin):
+    form = TargetAdminForm
+    fields = ("mission", "name", "country", "completed", "note_text")
+    list_display = ("id", "name", "country", "completed", "mission")
+    list_select_related = ("mission",)
+    list_filter = ("completed", "country")
+    raw_id_fields = ("mission",)
+    search_fields = ("=id", "^name")
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Note)
+class NoteAdmin(admin.ModelAdmin):
+    list_display = ("id", "target", "created_at")
+    list_select_related = ("target",)
+    raw_id_fields = ("target",)
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,76 @@
+"""Moving completed missions out of the live Mission/Target/Note tables into ``MissionArchive``."""
+from django.db import connections, router, transaction
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+
+from missions.models import Mission, MissionArchive, Target
+from missions.serializers import MissionSerializer
+
+include_archived_parameter = OpenApiParameter(
+    "include_archived", OpenApiTypes.BOOL, OpenApiParameter.QUERY,
+    description="Also return archived (long completed) missions. They can't be expanded.",
+)
+
+
+def include_archived(request):
+    return request.query_params.get("include_archived", "").lower() in ("1", "true", "yes")
+
+
+class LiveThenArchived:
+    """The missions of ``live`` (a queryset), then the archived ones of ``archived`` (``data`` values), as one
+    sequence to paginate.
+
+    The count is two ``COUNT``s and a slice reads only its rows, from one or both queries, rendered with
+    ``render_live``/``render_archived``.
+    """
+
+    def __init__(self, live, archived, render_live, render_archived):
+        self.live, self.archived = live, archived
+        self.render_live, self.render_archived = render_live, render_archived
+
+    @cached_property
+    def live_count(self):
+        return self.live.count()
+
+    def count(self):
+        return self.live_count + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        rows = []
+        if start < self.live_count:
+            rows += self.render_live(list(self.live[start:stop]))
+        if stop is None or stop > self.live_count:
+            archived_stop = None if stop is None else stop - self.live_count
+            rows += self.render_archived(list(self.archived[max(start - self.live_count, 0):archived_stop]))
+        return rows
+
+
+def archive_batch(completed_before, size):
+    """Archive up to ``size`` missions completed before ``completed_before``; return how many.
+
+    One transaction per batch: a mission is either still live or archived, so an interrupted run
+    just continues where it stopped.
+    """
+    using = router.db_for_write(Mission)
+    with transaction.atomic(using=using):
+        candidates = Mission.objects.using(using).filter(completed_at__lt=completed_before).order_by("id")
+        if connections[using].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list("id", flat=True)[:size])
+        if not ids:
+            return 0
+        missions = Mission.objects.using(using).filter(id__in=ids).prefetch_related(
+            Prefetch("targets", queryset=Target.objects.using(using).select_related("note"))
+        )
+        MissionArchive.objects.using(using).bulk_create([
+            MissionArchive(id=m.id, cat_id=m.cat_id, completed_at=m.completed_at, data=MissionSerializer(m).data)
+            for m in missions
+        ], ignore_conflicts=True)
+        Mission.objects.using(using).filter(id__in=ids).bulk_delete(archived=True)
+    return len(ids)
@@ -0,0 +1,120 @@
+"""Automatic assignment of free cats to unassigned missions (``POST /missions/auto-assign/``,
+``manage.py auto_assign``).
+
+Two queries pick the candidates -- free cats (no active mission) and unassigned, incomplete missions,
+each filtered and ordered by the criteria -- and the i-th mission gets the i-th cat: ordering missions
+by open targets and cats by experience gives the hardest missions to the most experienced cats. The
+assignments are written with one ``UPDATE ... CASE`` per ``batch_size`` missions, in one transaction.
+
+The "one active mission per cat" rule holds because every picked cat is free and gets one mission. On
+PostgreSQL the picked cats are locked (``SKIP LOCKED``), so concurrent runs pick different cats, and the
+update only touches missions that are still unassigned and incomplete, for cats that still have no active
+mission; the few a concurrent request assigned or completed in between are reported as skipped.
+"""
+import functools
+import operator
+
+from django.db import connections, router, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.dispatch import Signal
+
+from cats.models import SpyCat
+from core.signals import rows_saved
+from missions.models import Mission, Target
+
+# Sent with ``assignments`` ({mission id: cat id}) and ``using`` once cats were assigned in bulk.
+missions_assigned = Signal()
+
+CAT_ORDERINGS = {
+    "experience": ("-years_of_experience", "pk"),
+    "salary": ("salary", "pk"),
+    "id": ("pk",),
+}
+MISSION_ORDERINGS = {
+    "oldest": ("pk",),
+    "targets": ("-open_targets", "pk"),
+}
+
+
+def free_cats(cat_order="experience", min_experience=None, max_salary=None, breeds=None, using="default"):
+    """Cats without an active mission, in ``CAT_ORDERINGS[cat_order]`` order."""
+    cats = SpyCat.objects.using(using).filter(
+        ~Exists(Mission.objects.filter(cat_id=OuterRef("pk"), completed_at__isnull=True))
+    )
+    if min_experience is not None:
+        cats = cats.filter(years_of_experience__gte=min_experience)
+    if max_salary is not None:
+        cats = cats.filter(salary__lte=max_salary)
+    if breeds:
+        cats = cats.filter(functools.reduce(operator.or_, (Q(breed__iexact=breed.strip()) for breed in breeds)))
+    return cats.order_by(*CAT_ORDERINGS[cat_order])
+
+
+def open_missions(mission_order="oldest", countries=None, using="default"):
+    """Unassigned, incomplete missions (with an open target in one of ``countries``, if given)."""
+    missions = Mission.objects.using(using).filter(cat__isnull=True, completed_at__isnull=True)
+    if countries:
+        missions = missions.filter(Exists(Target.objects.filter(
+            mission_id=OuterRef("pk"), completed=False, country__in=countries,
+        )))
+    if mission_order == "targets":
+        missions = missions.annotate(open_targets=Count("targets", filter=Q(targets__completed=False)))
+    return missions.order_by(*MISSION_ORDERINGS[mission_order])
+
+
+def plan(limit=None, cat_order="experience", mission_order="oldest", countries=None, min_experience=None,
+         max_salary=None, breeds=None, using="default", lock=False):
+    """``[(mission id, cat id)]``: the missions in order, each with the next cat in order."""
+    cats = free_cats(cat_order, min_experience, max_salary, breeds, using)
+    if lock:
+        cats = cats.select_for_update(skip_locked=True, of=("self",))
+    missions = open_missions(mission_order, countries, using)
+    if limit is not None:
+        cats = cats[:limit]
+    cat_ids = list(cats.values_list("pk", flat=True))
+    mission_ids = list(missions.values_list("pk", flat=True)[:len(cat_ids)]) if cat_ids else []
+    return list(zip(mission_ids, cat_ids))
+
+
+def assign(pairs, batch_size=1000, using="default"):
+    """Write ``[(mission id, cat id)]``; return ``{mission id: cat id}`` of the missions that were still open."""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    # Raw SQL: building a 1000-branch Case() per batch costs Django far more than running the statement.
+    # The cat must still be free too: another request may have given it a mission since plan().
+    table = qn(Mission._meta.db_table)
+    sql = (
+        f"UPDATE {table} SET {qn('cat_id')} = CASE {qn('id')} {{whens}} END "
+        f"WHERE {qn('id')} IN ({{ids}}) AND {qn('cat_id')} IS NULL AND {qn('completed_at')} IS NULL "
+        f"AND NOT EXISTS (SELECT 1 FROM {table} active WHERE active.{qn('completed_at')} IS NULL "
+        f"AND active.{qn('cat_id')} = CASE {table}.{qn('id')} {{whens}} END)"
+    )
+    assigned = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), batch_size):
+            batch = dict(pairs[start:start + batch_size])
+            whens = [value for pair in batch.items() for value in pair]
+            cursor.execute(
+                sql.format(whens=" ".join(["WHEN %s THEN %s"] * len(batch)), ids=", ".join(["%s"] * len(batch))),
+                whens + list(batch) + whens,
+            )
+            if cursor.rowcount == len(batch):
+                assigned.update(batch)
+            else:
+                # Some were assigned or completed in the meantime: keep the ones that are now ours.
+                rows = Mission.objects.using(using).filter(pk__in=batch).values_list("pk", "cat_id")
+                assigned.update((pk, cat_id) for pk, cat_id in rows if batch[pk] == cat_id)
+    if assigned:
+        rows_saved.send(sender=Mission, pks=list(assigned), using=using)
+        missions_assigned.send(sender=Mission, assignments=assigned, using=using)
+    return assigned
+
+
+def auto_assign(dry_run=False, batch_size=1000, using=None, **criteria):
+    """Plan and write the assignments; ``(planned pairs, {mission id: cat id} assigned)``."""
+    using = using or router.db_for_write(Mission)
+    if dry_run:
+        return plan(using=using, **criteria), {}
+    with transaction.atomic(using=using):
+        pairs = plan(using=using, lock=True, **criteria)
+        return pairs, assign(pairs, batch_size, using)
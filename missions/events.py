@@ -0,0 +1,124 @@
+"""Mission status events streamed by ``/missions/<id>/events/`` (see ``core.pubsub``)."""
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models.signals import post_save
+
+from core.objectcache import object_cache
+from core.pubsub import get_broker, publish_on_commit
+from core.signals import rows_saved
+from missions.models import Mission, Note, Target
+
+
+def mission_topic(mission_id):
+    return f"mission:{mission_id}"
+
+
+async def event_stream(topic):
+    """The SSE body for ``topic``: one chunk per event, and a comment when idle to keep proxies happy."""
+    async with get_broker().subscribe(topic) as queue:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), settings.EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+def _publish_target(pk, mission_id, completed, using):
+    topic = mission_topic(mission_id)
+    publish_on_commit(topic, {"event": "target", "data": {"id": pk, "completed": completed}}, using)
+    if completed and not Target.objects.using(using).filter(mission_id=mission_id, completed=False).exists():
+        publish_on_commit(topic, {"event": "mission", "data": {"id": mission_id, "is_completed": True}}, using)
+
+
+def _publish_note(pk, target_id, mission_id, using):
+    publish_on_commit(mission_topic(mission_id), {"event": "note", "data": {"id": pk, "target": target_id}}, using)
+
+
+def target_saved(sender, instance, using, **kwargs):
+    _publish_target(instance.pk, instance.mission_id, instance.completed, using)
+
+
+def targets_saved(sender, pks, using, created=False, **kwargs):
+    # Targets are only inserted together with their (new) mission, which nobody streams yet.
+    if created:
+        return
+    for row in Target.objects.using(using).filter(pk__in=pks).values_list("pk", "mission_id", "completed"):
+        _publish_target(*row, using)
+
+
+def note_saved(sender, instance, using, **kwargs):
+    _publish_note(instance.pk, instance.target_id, instance.target.mission_id, using)
+
+
+def notes_saved(sender, pks, using, parents=None, **kwargs):
+    if parents is not None:
+        rows = [(pk, target_id, mission_id) for pk, (target_id, mission_id, _) in parents.items()]
+    else:
+        rows = Note.objects.using(using).filter(pk__in=pks).values_list("pk", "target_id", "target__mission_id")
+    for row in rows:
+        _publish_note(*row, using)
+
+
+post_save.connect(target_saved, sender=Target, dispatch_uid="missions-events-target")
+rows_saved.connect(targets_saved, sender=Target, dispatch_uid="missions-events-targets")
+post_save.connect(note_saved, sender=Note, dispatch_uid="missions-events-note")
+rows_saved.connect(notes_saved, sender=Note, dispatch_uid="missions-events-notes")
+
+
+class MissionEventsApp:
+    """ASGI app that streams ``/missions/<id>/events/`` itself and hands everything else to ``app``.
+
+    Django runs the sync middleware of every ASGI request in a thread that lives as long as the
+    response, i.e. one idle thread per open stream. Here a stream is a coroutine and a queue.
+    """
+
+    path = re.compile(r"^/missions/(?P<pk>\d+)/events/$")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        match = self.path.match(scope["path"]) if scope["type"] == "http" else None
+        if match is None:
+            return await self.app(scope, receive, send)
+        if scope["method"] != "GET":
+            return await self._respond(send, 405, b'{"detail": "Method not allowed."}', [(b"allow", b"GET")])
+        pk = int(match["pk"])
+        if not await sync_to_async(_mission_exists)(pk):
+            return await self._respond(send, 404, b'{"detail": "No Mission matches the given query."}')
+
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no"),
+        ]})
+        streaming = asyncio.ensure_future(self._pump(mission_topic(pk), send))
+        try:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+        finally:
+            streaming.cancel()
+            try:
+                await streaming
+            except (asyncio.CancelledError, OSError):
+                pass
+
+    async def _pump(self, topic, send):
+        async for chunk in event_stream(topic):
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+
+    async def _respond(self, send, status, body, headers=()):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), *headers]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _mission_exists(pk):
+    close_old_connections()
+    return object_cache(Mission).get(pk) is not None
@@ -0,0 +1,329 @@
+"""Bulk import of cats and missions from NDJSON or CSV (``manage.py import_data``).
+
+The input is read as a stream and handled ``chunk_size`` records at a time, so memory depends on the
+chunk size only. A chunk is validated with a few set-based queries and written in one transaction --
+``COPY`` on PostgreSQL, ``bulk_create`` elsewhere -- that also records how far into the source it got
+(``ImportCheckpoint``): a rerun resumes after the last committed chunk. Invalid records are skipped
+and written to the error report. ``rows_saved`` is sent for every chunk, so the change feed, mission
+completion, per-country counts and dashboards follow.
+
+NDJSON, one record per line::
+
+    {"type": "cat", "id": 7, "name": "Tom", "years_of_experience": 3, "breed": "Siamese", "salary": "2500.00"}
+    {"type": "mission", "id": 12, "cat": 7, "targets": [{"name": "Dock", "country": "UA", "completed": true,
+     "note": "..."}]}
+
+CSV holds one kind of record: cats with the columns above, or missions as one row per target
+(``id,cat,name,country,completed,note``) with the rows of a mission next to each other.
+
+Ids are kept, since missions refer to their cat by id: a mission has to come after its cat. On
+PostgreSQL the id sequences are moved past the imported ids after every chunk; import into a
+database that is not taking new cats/missions at the same time.
+"""
+import csv
+from functools import cached_property
+
+import orjson
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from cats.breeds import refresh_breeds
+from cats.models import Breed, SpyCat
+from core.signals import rows_saved
+from missions.models import ImportCheckpoint, Mission, Note, Target
+
+CAT_FIELDS = ("id", "name", "years_of_experience", "breed", "salary")
+TARGET_FIELDS = ("name", "country")
+TRUE, FALSE = ("true", "t", "1", "yes"), ("false", "f", "0", "no", "")
+
+
+class RecordError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def read_ndjson(stream):
+    """``(line number, record)`` of every non-blank line; a line that isn't JSON gives a RecordError."""
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, orjson.loads(line)
+        except orjson.JSONDecodeError as exc:
+            yield number, RecordError({"line": [str(exc)]})
+
+
+def read_csv(stream, kind):
+    """``(line number, record)`` of a CSV of cats or missions; a mission is yielded after its last row."""
+    reader = csv.DictReader(stream)
+    if kind == "cat":
+        for row in reader:
+            yield reader.line_num, {"type": "cat", **row}
+        return
+
+    mission, position = None, 0
+    for row in reader:
+        if mission is not None and row.get("id") != mission["id"]:
+            yield position, mission
+            mission = None
+        if mission is None:
+            mission = {"type": "mission", "id": row.get("id"), "cat": row.get("cat") or None, "targets": []}
+        mission["targets"].append({
+            "name": row.get("name"), "country": row.get("country"),
+            "completed": row.get("completed"), "note": row.get("note") or None,
+        })
+        position = reader.line_num
+    if mission is not None:
+        yield position, mission
+
+
+def _clean(model, name, value, errors, key=None):
+    try:
+        return model._meta.get_field(name).clean(value, None)
+    except ValidationError as exc:
+        errors[key or name] = exc.messages
+
+
+def _clean_id(value, errors, key):
+    value = _clean(Mission, "id", value, errors, key)
+    if key not in errors and (value is None or value < 1):
+        errors[key] = ["A positive integer is required."]
+    return value
+
+
+def _boolean(value, errors, key):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    if str(value).strip().lower() in TRUE + FALSE:
+        return str(value).strip().lower() in TRUE
+    errors[key] = ["Must be true or false."]
+
+
+def validate_cat(record, breeds):
+    """The row of a cat record, or a RecordError."""
+    errors = {}
+    values = {name: _clean(SpyCat, name, record.get(name), errors) for name in CAT_FIELDS[1:]}
+    values["id"] = _clean_id(record.get("id"), errors, "id")
+    if "breed" not in errors and values["breed"].strip().lower() not in breeds:
+        errors["breed"] = ["Unknown breed."]
+    if errors:
+        raise RecordError(errors)
+    return values
+
+
+def validate_mission(record):
+    """The mission of a record with its targets (1 to 3, as the API requires), or a RecordError."""
+    errors = {}
+    mission = {"id": _clean_id(record.get("id"), errors, "id"), "targets": []}
+    mission["cat_id"] = None if record.get("cat") in (None, "") else _clean_id(record["cat"], errors, "cat")
+    targets = record.get("targets")
+    if not isinstance(targets, list) or not 1 <= len(targets) <= 3:
+        errors["targets"] = ["A mission has 1 to 3 targets."]
+        targets = []
+    for index, target in enumerate(targets):
+        key = f"targets.{index}"
+        if not isinstance(target, dict):
+            errors[key] = ["Must be an object."]
+            continue
+        values = {name: _clean(Target, name, target.get(name), errors, f"{key}.{name}") for name in TARGET_FIELDS}
+        values["completed"] = _boolean(target.get("completed"), errors, f"{key}.completed")
+        values["note"] = target.get("note") or None
+        if values["note"] is not None and not isinstance(values["note"], str):
+            errors[f"{key}.note"] = ["Must be a string."]
+        mission["targets"].append(values)
+    if errors:
+        raise RecordError(errors)
+    return mission
+
+
+class Importer:
+    """Imports records from ``read_ndjson()``/``read_csv()`` into the ``using`` database."""
+
+    def __init__(self, source, chunk_size=5000, errors=None, using=None):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.errors = errors
+        self.using = using or router.db_for_write(Mission)
+        self.connection = connections[self.using]
+        self.breeds = None
+        self.counts = {"cats": 0, "missions": 0, "targets": 0, "notes": 0, "errors": 0}
+
+    def position(self):
+        checkpoint = ImportCheckpoint.objects.using(self.using).filter(source=self.source)
+        return checkpoint.values_list("position", flat=True).first() or 0
+
+    def reset(self):
+        ImportCheckpoint.objects.using(self.using).filter(source=self.source).delete()
+
+    def run(self, records, progress=None):
+        """Import the records after the checkpoint of this source; ``progress(counts)`` after each chunk."""
+        start = self.position()
+        chunk = []
+        for position, record in records:
+            if position <= start:
+                continue
+            chunk.append((position, record))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+                if progress:
+                    progress(self.counts)
+        if chunk:
+            self.import_chunk(chunk)
+            if progress:
+                progress(self.counts)
+        return self.counts
+
+    def breed_names(self):
+        if self.breeds is None:
+            if not Breed.objects.using(self.using).exists():
+                refresh_breeds()
+            self.breeds = set(Breed.objects.using(self.using).values_list("name", flat=True))
+        return self.breeds
+
+    def import_chunk(self, chunk):
+        cats, missions, failures = [], [], []
+        for position, record in chunk:
+            try:
+                if isinstance(record, RecordError):
+                    raise record
+                kind = record.get("type") if isinstance(record, dict) else None
+                if kind == "cat":
+                    cats.append((position, record, validate_cat(record, self.breed_names())))
+                elif kind == "mission":
+                    missions.append((position, record, validate_mission(record)))
+                else:
+                    raise RecordError({"type": ["Must be cat or mission."]})
+            except RecordError as exc:
+                failures.append((position, record, exc.errors))
+
+        with transaction.atomic(using=self.using):
+            cats, missions = self.check_references(cats, missions, failures)
+            self.write(cats, missions)
+            ImportCheckpoint.objects.using(self.using).update_or_create(
+                source=self.source, defaults={"position": chunk[-1][0]},
+            )
+            self.report(failures)
+
+    def _existing(self, model, ids):
+        return set(model.objects.using(self.using).filter(pk__in=ids).values_list("pk", flat=True))
+
+    def check_references(self, cats, missions, failures):
+        """Drop (into ``failures``) the records that clash with the database or with each other."""
+
+        def keep(rows, check):
+            kept = []
+            for position, record, values in rows:
+                error = check(values)
+                if error:
+                    failures.append((position, record, error))
+                else:
+                    kept.append((position, record, values))
+            return kept
+
+        existing_cats = self._existing(SpyCat, [values["id"] for _, _, values in cats])
+        new_cats = set()
+
+        def check_cat(values):
+            if values["id"] in existing_cats or values["id"] in new_cats:
+                return {"id": ["A cat with this id already exists."]}
+            new_cats.add(values["id"])
+
+        cats = keep(cats, check_cat)
+
+        cat_ids = {values["cat_id"] for _, _, values in missions if values["cat_id"]} - new_cats
+        known_cats = new_cats | self._existing(SpyCat, cat_ids)
+        busy_cats = set(Mission.objects.using(self.using).filter(
+            cat_id__in=known_cats, completed_at__isnull=True,
+        ).values_list("cat_id", flat=True))
+        existing_missions = self._existing(Mission, [values["id"] for _, _, values in missions])
+        new_missions = set()
+
+        def check_mission(values):
+            if values["id"] in existing_missions or values["id"] in new_missions:
+                return {"id": ["A mission with this id already exists."]}
+            active = not all(target["completed"] for target in values["targets"])
+            if values["cat_id"]:
+                if values["cat_id"] not in known_cats:
+                    return {"cat": ["No such cat (it has to come before its missions)."]}
+                if active and values["cat_id"] in busy_cats:
+                    return {"cat": ["The cat already has an active mission."]}
+                if active:
+                    busy_cats.add(values["cat_id"])
+            new_missions.add(values["id"])
+
+        return cats, keep(missions, check_mission)
+
+    def write(self, cats, missions):
+        now = timezone.now()
+        cat_ids = self.insert(SpyCat, CAT_FIELDS, [tuple(values[name] for name in CAT_FIELDS) for _, _, values in cats])
+        mission_ids = self.insert(Mission, ("id", "cat_id", "completed_at"), [
+            (values["id"], values["cat_id"], now if all(t["completed"] for t in values["targets"]) else None)
+            for _, _, values in missions
+        ])
+        targets = [(values["id"], target) for _, _, values in missions for target in values["targets"]]
+        target_ids = self.insert(Target, ("mission_id", "name", "country", "completed"), [
+            (mission_id, target["name"], target["country"], target["completed"]) for mission_id, target in targets
+        ], generated_ids=True)
+        note_ids = self.insert(Note, ("target_id", "text", "created_at"), [
+            (target_id, target["note"], now) for target_id, (_, target) in zip(target_ids, targets) if target["note"]
+        ], generated_ids=True)
+        if self.copy and (cat_ids or mission_ids):
+            with self.connection.cursor() as cursor:
+                for sql in self.connection.ops.sequence_reset_sql(no_style(), [SpyCat, Mission]):
+                    cursor.execute(sql)
+
+        for model, ids in ((SpyCat, cat_ids), (Mission, mission_ids), (Target, target_ids), (Note, note_ids)):
+            if ids:
+                rows_saved.send(sender=model, pks=ids, using=self.using, created=True)
+        for name, ids in (("cats", cat_ids), ("missions", mission_ids), ("targets", target_ids), ("notes", note_ids)):
+            self.counts[name] += len(ids)
+
+    @cached_property
+    def copy(self):
+        # COPY needs psycopg 3; with psycopg2 (or another database) rows go through bulk_create().
+        if self.connection.vendor != "postgresql":
+            return False
+        with self.connection.cursor() as cursor:
+            return hasattr(cursor.cursor, "copy")
+
+    def insert(self, model, fields, rows, generated_ids=False):
+        """Insert ``rows`` (values of ``fields``) and return their ids (the first field unless ``generated_ids``)."""
+        if not rows:
+            return []
+        if not self.copy:
+            objects = [model(**dict(zip(fields, row))) for row in rows]
+            model.objects.using(self.using).bulk_create(objects, batch_size=1000)
+            return [obj.pk for obj in objects]
+
+        qn = self.connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        with self.connection.cursor() as cursor:
+            if generated_ids:
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                    [model._meta.db_table, len(rows)],
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+                fields, rows = ("id", *fields), [(pk, *row) for pk, row in zip(ids, rows)]
+            else:
+                ids = [row[0] for row in rows]
+            with cursor.cursor.copy(f"COPY {table} ({', '.join(map(qn, fields))}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+        return ids
+
+    def report(self, failures):
+        self.counts["errors"] += len(failures)
+        if self.errors is None:
+            return
+        for position, record, errors in sorted(failures, key=lambda failure: failure[0]):
+            if isinstance(record, RecordError):
+                record = None
+            self.errors.write(orjson.dumps(
+                {"position": position, "record": record, "errors": errors}, default=str,
+            ).decode() + "\n")
+        self.errors.flush()
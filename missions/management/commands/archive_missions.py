@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from missions.archive import archive_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Move missions completed more than ARCHIVE_AFTER_DAYS ago into the archive, in batches, "
+        "pausing between batches. Safe to interrupt and run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=float, default=settings.ARCHIVE_AFTER_DAYS)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--sleep", type=float, default=0.5, help="Seconds to pause between batches.")
+        parser.add_argument("--max-batches", type=int, default=None)
+
+    def handle(self, *args, older_than_days, batch_size, sleep, max_batches, **options):
+        completed_before = timezone.now() - timedelta(days=older_than_days)
+        archived = batches = 0
+        while max_batches is None or batches < max_batches:
+            moved = archive_batch(completed_before, batch_size)
+            if not moved:
+                break
+            archived += moved
+            batches += 1
+            self.stdout.write(f"Archived {archived} missions ({batches} batches)")
+            time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f"Done: {archived} missions archived."))
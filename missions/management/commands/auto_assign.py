@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from missions.assignment import CAT_ORDERINGS, MISSION_ORDERINGS
+from missions.serializers import MissionAutoAssignSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Assign free cats to unassigned, incomplete missions in bulk (see missions.assignment); the same "
+        "as POST /missions/auto-assign/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, help="Assign at most this many cats.")
+        parser.add_argument("--cat-order", choices=list(CAT_ORDERINGS), default="experience")
+        parser.add_argument("--mission-order", choices=list(MISSION_ORDERINGS), default="oldest")
+        parser.add_argument("--country", action="append", dest="countries",
+                            help="Only missions with an open target in this country (repeatable).")
+        parser.add_argument("--min-experience", type=int)
+        parser.add_argument("--max-salary")
+        parser.add_argument("--breed", action="append", dest="breeds", help="Only cats of this breed (repeatable).")
+        parser.add_argument("--dry-run", action="store_true", help="Only print what would be assigned.")
+
+    def handle(self, *args, **options):
+        names = MissionAutoAssignSerializer().fields
+        serializer = MissionAutoAssignSerializer(
+            data={name: value for name, value in options.items() if name in names and value is not None}
+        )
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        result = serializer.save()
+        if options["verbosity"] > 1 or options["dry_run"]:
+            for pair in result["assignments"]:
+                self.stdout.write(f"mission {pair['mission']} <- cat {pair['cat']}")
+        verb = "would be assigned" if options["dry_run"] else "assigned"
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {len(result['assignments'])} missions {verb} ({result['planned']} pairs found)."
+        ))
@@ -0,0 +1,37 @@
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from missions.models import Mission
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete unassigned missions (with their targets and notes) in batches of set-based statements. "
+        "Missions assigned to a cat are never deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Mission IDs to delete.")
+        parser.add_argument("--all-unassigned", action="store_true", help="Delete every unassigned mission.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, ids, all_unassigned, batch_size, sleep, **options):
+        if not ids and not all_unassigned:
+            raise CommandError("Pass mission IDs or --all-unassigned.")
+        missions = Mission.objects.filter(cat__isnull=True)
+        if ids:
+            batches = (missions.filter(id__in=ids[i:i + batch_size]) for i in range(0, len(ids), batch_size))
+        else:
+            batches = itertools.repeat(missions[:batch_size])
+        deleted = 0
+        for batch in batches:
+            count = batch.bulk_delete()
+            if not count and not ids:
+                break
+            deleted += count
+            self.stdout.write(f"Deleted {deleted} missions")
+            time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f"Done: {deleted} missions deleted."))
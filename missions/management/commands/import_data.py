@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cats.breeds import BreedRegistryUnavailable
+from missions.importing import Importer, read_csv, read_ndjson
+
+
+class Command(BaseCommand):
+    help = (
+        "Import cats and missions from an NDJSON or CSV file (see missions.importing), in chunks that "
+        "are committed one by one. Invalid records go to the error report; run again to resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["ndjson", "csv"], help="Default: from the file extension.")
+        parser.add_argument("--kind", choices=["cat", "mission"], help="What the rows of a CSV file are.")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--errors", help="Error report (NDJSON). Default: <path>.errors.ndjson")
+        parser.add_argument("--source", help="Name of the checkpoint to resume from. Default: the resolved path.")
+        parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over.")
+
+    def handle(self, *args, path, format, kind, chunk_size, errors, source, restart, **options):
+        path = Path(path)
+        format = format or ("csv" if path.suffix.lower() == ".csv" else "ndjson")
+        if format == "csv" and not kind:
+            raise CommandError("--kind is required for CSV files.")
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        with path.open(newline="", encoding="utf-8") as stream, \
+                open(errors or f"{path}.errors.ndjson", "w" if restart else "a", encoding="utf-8") as report:
+            importer = Importer(source or str(path.resolve()), chunk_size=chunk_size, errors=report)
+            if restart:
+                importer.reset()
+            elif importer.position():
+                self.stdout.write(f"Resuming after position {importer.position()}")
+            records = read_csv(stream, kind) if format == "csv" else read_ndjson(stream)
+            try:
+                counts = importer.run(records, progress=lambda counts: self.stdout.write(self.summary(counts)))
+            except BreedRegistryUnavailable as exc:
+                raise CommandError(f"The breed registry is empty and TheCatAPI is unavailable: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Done: {self.summary(counts)}."))
+        if counts["errors"]:
+            self.stdout.write(self.style.WARNING(f"{counts['errors']} invalid records, see {report.name}"))
+
+    @staticmethod
+    def summary(counts):
+        return ", ".join(f"{n} {name}" for name, n in counts.items())
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from missions.models import CountryTargetStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the open and completed targets per country (GET /missions/countries/) from the targets "
+        "table. Target writes keep the numbers up to date; this repairs them, e.g. after raw SQL changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("countries", nargs="*", help="Country codes to recount (default: all).")
+
+    def handle(self, *args, countries, **options):
+        counts = CountryTargetStats.recount([country.upper() for country in countries] or None)
+        self.stdout.write(self.style.SUCCESS(f"Done: {len(counts)} countries recounted."))
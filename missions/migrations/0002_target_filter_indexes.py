@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:26
+
+import django_countries.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('missions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='target',
+            name='completed',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AlterField(
+            model_name='target',
+            name='country',
+            field=django_countries.fields.CountryField(db_index=True, max_length=2),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def clear_completed_at_of_active_missions(apps, schema_editor):
+    # The new column starts out as "completed now" everywhere; missions with an unfinished target
+    # are not completed.
+    Mission = apps.get_model("missions", "Mission")
+    Target = apps.get_model("missions", "Target")
+    Mission.objects.filter(
+        models.Exists(Target.objects.filter(mission_id=models.OuterRef("pk"), completed=False))
+    ).update(completed_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('missions', '0002_target_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MissionArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('cat_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('completed_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='mission',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, db_index=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.RunPython(clear_completed_at_of_active_missions, migrations.RunPython.noop),
+    ]
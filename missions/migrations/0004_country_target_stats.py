@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:10
+
+import django_countries.fields
+from django.db import migrations, models
+
+
+def count_targets(apps, schema_editor):
+    Target = apps.get_model("missions", "Target")
+    CountryTargetStats = apps.get_model("missions", "CountryTargetStats")
+    counts = {}
+    for country, completed, n in (Target.objects.using(schema_editor.connection.alias).order_by()
+                                  .values_list("country", "completed").annotate(n=models.Count("pk"))):
+        counts.setdefault(country, [0, 0])[completed] = n
+    CountryTargetStats.objects.using(schema_editor.connection.alias).bulk_create([
+        CountryTargetStats(country=country, open_targets=numbers[0], completed_targets=numbers[1])
+        for country, numbers in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('missions', '0003_mission_completed_at_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountryTargetStats',
+            fields=[
+                ('country', django_countries.fields.CountryField(max_length=2, primary_key=True, serialize=False)),
+                ('open_targets', models.IntegerField(default=0)),
+                ('completed_targets', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='target',
+            name='country',
+            field=django_countries.fields.CountryField(max_length=2),
+        ),
+        migrations.AddIndex(
+            model_name='target',
+            index=models.Index(fields=['country', 'completed', 'id'], name='missions_target_country_idx'),
+        ),
+        migrations.RunPython(count_targets, migrations.RunPython.noop),
+    ]
@@ -1,25 +1,360 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.utils import timezone
 from django_countries.fields import CountryField
 
 from cats.models import SpyCat
+from core.models import AtomicSaveModel
+from core.signals import rows_deleted, rows_saved
 
 
-class Mission(models.Model):
+class MissionQuerySet(models.QuerySet):
+    def with_fieldset(self, fieldset=None, expand=None):
+        """Load only what a ``MissionSerializer`` limited to ``fieldset``/``expand`` is going to read.
+
+        Targets (and their notes) are prefetched only when they are part of the response,
+        and a mission without nested data is loaded with ``.only()``.
+        """
+        expand = expand or {}
+        queryset = self
+        expand_cat = "cat" in expand and (fieldset is None or "cat" in fieldset)
+        if expand_cat:
+            queryset = queryset.select_related("cat")
+        if fieldset is not None and "targets" not in fieldset:
+            if expand_cat:
+                return queryset
+            # cat_id always: a cat's missions prefetch matches them to their cats by it.
+            return queryset.only("id", "cat_id", *(["completed_at"] if "is_completed" in fieldset else []))
+
+        target_fields = None if fieldset is None else fieldset["targets"] or None
+        targets = Target.objects.all()
+        if target_fields is None or "note" in target_fields:
+            targets = targets.select_related("note")
+        return queryset.prefetch_related(models.Prefetch("targets", queryset=targets))
+
+    def bulk_delete(self, archived=False):
+        """Delete these missions with their targets and notes; return how many missions were deleted.
+
+        One ``DELETE ... WHERE ... IN`` per table, children first, instead of ``delete()``'s collector
+        that loads every target and note to cascade in Python. Only ids are read, and only for the
+        ``rows_deleted`` receivers. Slice or batch large querysets: the ids go into the statements.
+        ``archived``: the missions were copied to ``MissionArchive`` (passed on to ``rows_deleted``).
+        """
+        using = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            missions = self.using(using)
+            if connections[using].features.has_select_for_update:
+                missions = missions.select_for_update()
+            ids = list(missions.values_list("pk", flat=True))
+            if not ids:
+                return 0
+            targets = Target.objects.using(using).filter(mission_id__in=ids)
+            notes = Note.objects.using(using).filter(target__mission_id__in=ids)
+            CountryTargetStats.add_targets(targets, sign=-1)
+            for model, queryset in ((Note, notes), (Target, targets)):
+                if rows_deleted.has_listeners(model):
+                    pks = list(queryset.values_list("pk", flat=True))
+                    model.objects.using(using).filter(pk__in=pks)._raw_delete(using)
+                    rows_deleted.send(sender=model, pks=pks, using=using, archived=archived)
+                else:
+                    model.objects.using(using).filter(pk__in=queryset.values("pk"))._raw_delete(using)
+            Mission.objects.using(using).filter(pk__in=ids)._raw_delete(using)
+            rows_deleted.send(sender=Mission, pks=ids, using=using, archived=archived)
+        return len(ids)
+
+
+class Mission(AtomicSaveModel):
     cat = models.ForeignKey(SpyCat, on_delete=models.SET_NULL, related_name='missions', null=True, blank=True)
+    # Set while every target is completed (a mission without targets counts as completed);
+    # kept up to date by missions.signals.
+    completed_at = models.DateTimeField(null=True, blank=True, default=timezone.now, db_index=True)
+
+    objects = MissionQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "cat_id" in instance.__dict__:
+            # The cat the row belongs to, to tell which cats a later save() moves it between.
+            instance.loaded_cat_id = instance.cat_id
+        return instance
 
     @property
     def is_completed(self) -> bool:
-        return not self.targets.filter(completed=False).exists()
+        return self.completed_at is not None
+
+    @classmethod
+    def sync_completed(cls, mission_id, using="default", completed=None):
+        """Set or clear ``completed_at`` of one mission from its targets; return whether it changed.
+
+        ``completed=True``/``False`` only tries to set/clear it: all a completed/open target can cause.
+        """
+        incomplete = models.Exists(Target.objects.filter(mission_id=models.OuterRef("pk"), completed=False))
+        mission = cls.objects.using(using).filter(pk=mission_id)
+        changed = False
+        if completed is not False:
+            changed = mission.filter(~incomplete, completed_at__isnull=True).update(completed_at=timezone.now())
+        if not changed and completed is not True:
+            changed = mission.filter(incomplete, completed_at__isnull=False).update(completed_at=None)
+        return bool(changed)
 
+    @classmethod
+    def sync_completed_many(cls, mission_ids, using="default"):
+        """``sync_completed()`` for any number of missions in four statements; return the changed ids."""
+        incomplete = models.Exists(Target.objects.filter(mission_id=models.OuterRef("pk"), completed=False))
+        missions = cls.objects.using(using).filter(pk__in=mission_ids)
+        to_complete = missions.filter(~incomplete, completed_at__isnull=True)
+        to_reopen = missions.filter(incomplete, completed_at__isnull=False)
+        changed = []
+        for stale, completed_at in ((to_complete, timezone.now()), (to_reopen, None)):
+            ids = list(stale.values_list("pk", flat=True))
+            if ids:
+                # Filtered again: the statement itself decides, as in sync_completed().
+                stale.filter(pk__in=ids).update(completed_at=completed_at)
+                changed += ids
+        return changed
 
-class Target(models.Model):
+
+class Target(AtomicSaveModel):
     mission = models.ForeignKey(Mission, on_delete=models.CASCADE, related_name="targets")
     name = models.CharField(max_length=255)
     country = CountryField()
-    completed = models.BooleanField(default=False)
+    completed = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            # GET /missions/targets/?country=: filter and keyset order (completed, id) in one index.
+            models.Index(fields=["country", "completed", "id"], name="missions_target_country_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What CountryTargetStats counts this row as, to tell what a later save() changes.
+        instance.counted_as = instance.count_key()
+        return instance
+
+    def count_key(self):
+        """``(country, completed)`` of this target, or None when either field is not loaded."""
+        if "country" in self.__dict__ and "completed" in self.__dict__:
+            return (self.country.code, self.completed)
+        return None
+
+    def update_completed(self, completed, using=None):
+        """Set ``completed`` with one ``UPDATE`` guarded on "target open, mission assigned and open".
+
+        Return whether the row was updated. As it writes without ``save()``, it applies the change to the
+        mission's ``completed_at`` and to ``CountryTargetStats`` itself, then sends ``rows_saved``.
+        """
+        using = using or router.db_for_write(Target, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            updated = Target.objects.using(using).filter(
+                pk=self.pk, completed=False, mission__cat__isnull=False, mission__completed_at__isnull=True,
+            ).update(completed=completed)
+            if updated:
+                self.completed = completed
+                if completed:
+                    CountryTargetStats.add({(self.country.code, False): -1, (self.country.code, True): 1}, using)
+                self.counted_as = (self.country.code, completed)
+                if completed and Mission.sync_completed(self.mission_id, using, completed):
+                    rows_saved.send(sender=Mission, pks=[self.mission_id], using=using)
+                rows_saved.send(sender=Target, pks=[self.pk], using=using)
+        return bool(updated)
+
+
+class CountryTargetStats(models.Model):
+    """Open and completed (live) targets per country, updated with every target write.
+
+    Only changes are applied, never totals: ``missions.signals`` adds those of saved, deleted and
+    bulk-created targets, ``MissionQuerySet.bulk_delete`` subtracts the targets it removes. ``recount()``
+    (``manage.py recount_countries``) repairs the numbers from the targets table.
+    """
+
+    country = CountryField(primary_key=True)
+    open_targets = models.IntegerField(default=0)
+    completed_targets = models.IntegerField(default=0)
+
+    @classmethod
+    def _upsert(cls, rows, using, increment):
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        columns = [qn("country"), qn("open_targets"), qn("completed_targets")]
+        assignments = ", ".join(
+            f"{column} = {table}.{column} + excluded.{column}" if increment else f"{column} = excluded.{column}"
+            for column in columns[1:]
+        )
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({columns[0]}) DO UPDATE SET {assignments}"
+        )
+        with connection.cursor() as cursor:
+            for row in rows:
+                cursor.execute(sql, row)
+
+    @classmethod
+    def add(cls, deltas, using="default"):
+        """Apply ``{(country, completed): change}``, one statement per country."""
+        by_country = {}
+        for (country, completed), change in deltas.items():
+            by_country.setdefault(country, [0, 0])[completed] += change
+        cls._upsert([(country, *counts) for country, counts in by_country.items() if any(counts)], using, True)
+
+    @classmethod
+    def add_targets(cls, targets, sign=1):
+        """Count (``sign=-1``: uncount) the targets of a queryset, e.g. before deleting them."""
+        rows = targets.order_by().values_list("country", "completed").annotate(n=models.Count("pk"))
+        cls.add({(country, completed): sign * n for country, completed, n in rows}, targets.db)
+
+    @classmethod
+    def recount(cls, countries=None, using="default"):
+        """Set the numbers of ``countries`` (all of them by default) from the targets table.
+
+        The rows are locked before counting, so a concurrent write either is counted here or applies its
+        change after this commits; countries that have no row yet are not protected that way.
+        """
+        targets = Target.objects.using(using).order_by()
+        stats = cls.objects.using(using)
+        if countries is not None:
+            targets, stats = targets.filter(country__in=countries), stats.filter(country__in=countries)
+        with transaction.atomic(using=using):
+            counts = {country: [0, 0] for country in stats.select_for_update().values_list("country", flat=True)}
+            counts.update({country: [0, 0] for country in countries or ()})
+            for country, completed, n in targets.values_list("country", "completed").annotate(n=models.Count("pk")):
+                counts.setdefault(country, [0, 0])[completed] = n
+            cls._upsert([(country, *numbers) for country, numbers in counts.items()], using, False)
+        return counts
 
 
-class Note(models.Model):
+class NoteQuerySet(models.QuerySet):
+    """Note writes that enforce "target and mission not completed" in the statement itself.
+
+    A check followed by a separate write would let a target completed in between get a note. Neither
+    method calls ``save()``, so they send ``rows_saved`` themselves, in the same transaction, with the
+    ``parents`` (``{pk: (target_id, mission_id, cat_id)}``) the statement returned.
+    """
+
+    def _returning(self, connection):
+        qn = connection.ops.quote_name
+        note, target, mission = (qn(model._meta.db_table) for model in (Note, Target, Mission))
+        return (
+            f"RETURNING {qn('id')}, {qn('target_id')}, {qn('text')}, {qn('created_at')}, "
+            f"(SELECT t.{qn('mission_id')} FROM {target} t WHERE t.{qn('id')} = {note}.{qn('target_id')}) "
+            f"AS mission_id, "
+            f"(SELECT m.{qn('cat_id')} FROM {target} t INNER JOIN {mission} m ON m.{qn('id')} = t.{qn('mission_id')} "
+            f"WHERE t.{qn('id')} = {note}.{qn('target_id')}) AS cat_id"
+        )
+
+    def _write(self, using, sql, params, **kwargs):
+        """Run ``sql`` (which returns the note row) and send ``rows_saved``; return the note or None."""
+        with transaction.atomic(using=using, savepoint=False):
+            # list(): run the statement now, inside the transaction.
+            notes = list(self.using(using).raw(sql, params))
+            note = notes[0] if notes else None
+            if note is not None:
+                rows_saved.send(sender=Note, pks=[note.pk], using=using,
+                                parents={note.pk: (note.target_id, note.mission_id, note.cat_id)}, **kwargs)
+        return note
+
+    def create_if_open(self, target_id, text):
+        """Insert the note of an open target that has none; return it, or None when nothing was inserted."""
+        using = self._db or router.db_for_write(self.model)
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        sql = (
+            f"INSERT INTO {qn(Note._meta.db_table)} ({qn('target_id')}, {qn('text')}, {qn('created_at')}) "
+            f"SELECT t.{qn('id')}, %s, %s FROM {qn(Target._meta.db_table)} t "
+            f"INNER JOIN {qn(Mission._meta.db_table)} m ON m.{qn('id')} = t.{qn('mission_id')} "
+            f"WHERE t.{qn('id')} = %s AND NOT t.{qn('completed')} AND m.{qn('completed_at')} IS NULL "
+            f"ON CONFLICT ({qn('target_id')}) DO NOTHING {self._returning(connection)}"
+        )
+        created_at = Note._meta.get_field("created_at").get_db_prep_value(timezone.now(), connection)
+        return self._write(using, sql, [text, created_at, target_id], created=True)
+
+    def update_if_open(self, target_id, **values):
+        """Update the note of an open target; return ``(note, updated)``, ``note`` None if there is none."""
+        using = self._db or router.db_for_write(self.model)
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        fields = [Note._meta.get_field(name) for name in values]
+        # Without values this still checks the rule (and the existence of the note).
+        assignments = ", ".join(f"{qn(field.column)} = %s" for field in fields) or f"{qn('text')} = {qn('text')}"
+        note_table = qn(Note._meta.db_table)
+        sql = (
+            f"UPDATE {note_table} SET {assignments} WHERE {qn('target_id')} = %s AND EXISTS ("
+            f"SELECT 1 FROM {qn(Target._meta.db_table)} t "
+            f"INNER JOIN {qn(Mission._meta.db_table)} m ON m.{qn('id')} = t.{qn('mission_id')} "
+            f"WHERE t.{qn('id')} = {note_table}.{qn('target_id')} AND NOT t.{qn('completed')} "
+            f"AND m.{qn('completed_at')} IS NULL) {self._returning(connection)}"
+        )
+        params = [field.get_db_prep_save(values[field.name], connection) for field in fields] + [target_id]
+        note = self._write(using, sql, params)
+        if note is not None:
+            return note, True
+        # Only the failure path reads the note, to tell a missing note from a refused update.
+        note = self.using(using).filter(target_id=target_id).only("id", "target_id", "text", "created_at").first()
+        return note, False
+
+
+class Note(AtomicSaveModel):
     target = models.OneToOneField(Target, on_delete=models.CASCADE, related_name="note")
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = NoteQuerySet.as_manager()
+
+
+class JSONSetNull(models.Func):
+    """``expression`` (a JSON object) with its key ``key`` set to null."""
+
+    output_field = models.JSONField()
+
+    def __init__(self, expression, key):
+        super().__init__(expression, key=key)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template=f"JSON_SET(%(expressions)s, '$.{self.extra['key']}', CAST('null' AS JSON))",
+            **extra_context,
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template=f"json_set(%(expressions)s, '$.{self.extra['key']}', json('null'))",
+            **extra_context,
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template=f"jsonb_set(%(expressions)s, '{{{self.extra['key']}}}', 'null')",
+            **extra_context,
+        )
+
+
+class MissionArchiveQuerySet(models.QuerySet):
+    def unassign(self):
+        """Drop the cat of these archived missions, in the column and in ``data``, with one ``UPDATE``."""
+        return self.update(cat_id=None, data=JSONSetNull("data", "cat"))
+
+
+class MissionArchive(models.Model):
+    """A completed mission moved out of the live tables by ``manage.py archive_missions``.
+
+    ``data`` is the mission as ``MissionSerializer`` rendered it (targets and notes included). Deleting
+    a cat unassigns its archived missions too (``SpyCatQuerySet.bulk_delete``, ``missions.signals``).
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    cat_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    completed_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField()
+
+    objects = MissionArchiveQuerySet.as_manager()
+
+
+class ImportCheckpoint(models.Model):
+    """How far ``manage.py import_data`` got into a source: records up to ``position`` are committed."""
+
+    source = models.CharField(max_length=255, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
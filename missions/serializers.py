@@ -1,40 +1,53 @@
-from django.db import transaction, IntegrityError
+import functools
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.translation import get_language
+from django_countries import countries
 from django_countries.serializer_fields import CountryField
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 
 from cats.models import SpyCat
+from cats.serializers import SpyCatSerializer
+from core.fieldsets import SparseFieldsetMixin
+from core.signals import rows_saved
+from missions.assignment import CAT_ORDERINGS, MISSION_ORDERINGS, auto_assign
 from missions.models import Mission, Target, Note
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Creates/updates the note of ``context["target_id"]`` with one conditional statement."""
+
+    completed_error = "Notes cannot be created/updated because the target or the mission is completed."
+
     class Meta:
         model = Note
         fields = ['id', 'text', 'created_at']
         read_only_fields = ["id", "created_at"]
 
-    def validate(self, attrs):
-        target = self._get_target()
-        if target.completed or target.mission.is_completed:
+    def create(self, validated_data):
+        target_id = self.context["target_id"]
+        note = Note.objects.create_if_open(target_id, validated_data["text"])
+        if note is None:
+            # Only the failure path reads the target, to tell which rule refused the note.
+            target = Target.objects.filter(pk=target_id).values(
+                has_note=Exists(Note.objects.filter(target_id=OuterRef("pk")))
+            ).first()
+            if target is None:
+                raise NotFound("No Target matches the given query.")
             raise serializers.ValidationError(
-                {"detail": "Notes cannot be created/updated because the target or the mission is completed."}
+                {"detail": "Note already exists." if target["has_note"] else self.completed_error}
             )
-        return attrs
+        return note
 
-    def create(self, validated_data):
-        target = self._get_target(required=True)
-        if hasattr(target, "note"):
-            raise serializers.ValidationError({"detail": "Note already exists."})
-        try:
-            return Note.objects.create(target=target, **validated_data)
-        except IntegrityError:
-            raise serializers.ValidationError({"detail": "Note already exists."})
-
-
-    def _get_target(self, required=False):
-        target = self.context.get("target") or getattr(self.instance, "target", None)
-        if required and target is None:
-            raise serializers.ValidationError({"detail": "Target context is required."})
-        return target
+    def update(self, instance, validated_data):
+        note, updated = Note.objects.update_if_open(self.context["target_id"], **validated_data)
+        if note is None:
+            raise NotFound("No Note matches the given query.")
+        if not updated:
+            raise serializers.ValidationError({"detail": self.completed_error})
+        return note
 
 
 class TargetCompleteSerializer(serializers.ModelSerializer):
@@ -43,14 +56,17 @@ class TargetCompleteSerializer(serializers.ModelSerializer):
         fields = ["completed"]
 
     def update(self, instance, validated_data):
-        if instance.completed or instance.mission.is_completed:
+        # instance.mission is loaded (and locked) by UpdateTarget; the UPDATE re-checks the rule anyway.
+        if instance.completed or instance.mission.is_completed or (
+            "completed" in validated_data and not instance.update_completed(validated_data["completed"])
+        ):
             raise serializers.ValidationError(
                 "Notes cannot be updated because the target or the mission is completed."
             )
-        return super().update(instance, validated_data)
+        return instance
 
 
-class TargetSerializer(serializers.ModelSerializer):
+class TargetSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     country = CountryField()
     note = NoteSerializer(read_only=True)
 
@@ -68,9 +84,11 @@ class TargetCreateSerializer(serializers.ModelSerializer):
         fields = ["name", "country", "completed"]
 
 
-class MissionSerializer(serializers.ModelSerializer):
+class MissionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     targets = TargetSerializer(many=True)
 
+    expandable_fields = {"cat": (SpyCatSerializer, {})}
+
     class Meta:
         model = Mission
         fields = ['id', 'cat', 'is_completed', 'targets']
@@ -85,24 +103,27 @@ class MissionAssignCatSerializer(serializers.ModelSerializer):
         fields = ['cat']
 
     def validate(self, attrs):
-        mission = self.instance
-        cat = attrs.get("cat")
-
-        if mission.is_completed:
+        if self.instance.is_completed:
             raise serializers.ValidationError("Cannot assign a cat to a completed mission.")
-
-        other_active_exists = (
-            Mission.objects
-            .filter(cat=cat)
-            .exclude(pk=mission.pk)
-            .filter(targets__completed=False)
-            .exists()
-        )
-        if other_active_exists:
-            raise serializers.ValidationError("This cat already has an active mission.")
-
         return attrs
 
+    def update(self, instance, validated_data):
+        cat = validated_data.get("cat")
+        with transaction.atomic():
+            if cat is not None:
+                # Two requests giving the cat a mission take turns: the second sees the first one's.
+                SpyCat.objects.select_for_update().filter(pk=cat.pk).exists()
+            other_active_exists = (
+                Mission.objects
+                .filter(cat=cat)
+                .exclude(pk=instance.pk)
+                .filter(completed_at__isnull=True)
+                .exists()
+            )
+            if other_active_exists:
+                raise serializers.ValidationError("This cat already has an active mission.")
+            return super().update(instance, validated_data)
+
 
 class MissionCreateSerializer(serializers.ModelSerializer):
     cat = serializers.PrimaryKeyRelatedField(queryset=SpyCat.objects.all(), required=False)
@@ -126,7 +147,96 @@ class MissionCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         targets_data = validated_data.pop("targets", [])
         mission = Mission.objects.create(**validated_data)
-        Target.objects.bulk_create([
+        targets = Target.objects.bulk_create([
             Target(mission=mission, **t) for t in targets_data
         ])
-        return mission
\ No newline at end of file
+        rows_saved.send(sender=Target, pks=[t.pk for t in targets], using=mission._state.db, created=True)
+        return mission
+
+
+class MissionBulkDeleteSerializer(serializers.Serializer):
+    max_ids = 1000
+
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=max_ids)
+
+    def validate_ids(self, ids):
+        assigned = sorted(Mission.objects.filter(id__in=ids, cat__isnull=False).values_list("id", flat=True))
+        if assigned:
+            raise serializers.ValidationError(
+                f"Missions {', '.join(map(str, assigned))} cannot be deleted because they are assigned to a cat."
+            )
+        return ids
+
+    def create(self, validated_data):
+        # cat__isnull again: a mission assigned since validation is left alone.
+        deleted = Mission.objects.filter(id__in=validated_data["ids"], cat__isnull=True).bulk_delete()
+        return {"deleted": deleted}
+
+
+class MissionAutoAssignSerializer(serializers.Serializer):
+    """Criteria of ``missions.assignment.auto_assign()``."""
+
+    limit = serializers.IntegerField(min_value=1, required=False, help_text="Assign at most this many cats.")
+    cat_order = serializers.ChoiceField(choices=list(CAT_ORDERINGS), default="experience",
+                                        help_text="Which free cats go first (to the first missions).")
+    mission_order = serializers.ChoiceField(choices=list(MISSION_ORDERINGS), default="oldest",
+                                            help_text="Which missions go first: oldest or most open targets.")
+    countries = serializers.ListField(child=CountryField(), required=False,
+                                      help_text="Only missions with an open target in one of these countries.")
+    min_experience = serializers.IntegerField(min_value=0, required=False)
+    max_salary = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    breeds = serializers.ListField(child=serializers.CharField(), required=False)
+    dry_run = serializers.BooleanField(default=False, help_text="Only return what would be assigned.")
+
+    def create(self, validated_data):
+        planned, assigned = auto_assign(**validated_data)
+        pairs = planned if validated_data["dry_run"] else assigned.items()
+        return {
+            "planned": len(planned),
+            "assigned": len(assigned),
+            "assignments": [{"mission": mission_id, "cat": cat_id} for mission_id, cat_id in pairs],
+        }
+
+
+class AssignmentSerializer(serializers.Serializer):
+    mission = serializers.IntegerField()
+    cat = serializers.IntegerField()
+
+
+class MissionAutoAssignResultSerializer(serializers.Serializer):
+    planned = serializers.IntegerField(help_text="Pairs found; fewer are assigned if missions changed meanwhile.")
+    assigned = serializers.IntegerField()
+    assignments = AssignmentSerializer(many=True, help_text="Made (or, with dry_run, planned) assignments.")
+
+
+@functools.lru_cache(maxsize=None)
+def _country_names(language):
+    return {code: str(name) for code, name in countries}
+
+
+def country_names():
+    """Country code -> name in the active language, built once per language instead of per row."""
+    return _country_names(get_language())
+
+
+# GET /missions/targets/ and /missions/countries/ build plain dicts (see the views); these document them.
+class TargetByCountrySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    country = serializers.CharField()
+    country_name = serializers.CharField()
+    completed = serializers.BooleanField()
+    mission = serializers.IntegerField()
+
+
+class TargetByCountryPageSerializer(serializers.Serializer):
+    cursor = serializers.CharField(allow_null=True, help_text="`after` of the next page, null at the end.")
+    has_more = serializers.BooleanField()
+    results = TargetByCountrySerializer(many=True)
+
+
+class CountryTargetStatsSerializer(serializers.Serializer):
+    country = serializers.CharField()
+    country_name = serializers.CharField()
+    open_targets = serializers.IntegerField()
+    completed_targets = serializers.IntegerField()
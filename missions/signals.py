@@ -0,0 +1,90 @@
+"""Keeps ``Mission.completed_at`` and ``CountryTargetStats`` in step with the targets, whatever path wrote them,
+and the cat of archived missions with the cats."""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from cats.models import SpyCat
+from core.signals import rows_saved
+from missions.models import CountryTargetStats, Mission, MissionArchive, Target
+
+
+def _sync(mission_ids, using, completed=None):
+    for mission_id in set(mission_ids):
+        if Mission.sync_completed(mission_id, using, completed):
+            # Updated with update(): tell post_save followers (e.g. the change feed) about it.
+            rows_saved.send(sender=Mission, pks=[mission_id], using=using)
+
+
+def target_saved(sender, instance, using, **kwargs):
+    _sync([instance.mission_id], using, completed=instance.completed)
+
+
+def target_deleted(sender, instance, using, **kwargs):
+    # Removing a target can only leave the rest all completed, never reopen the mission.
+    _sync([instance.mission_id], using, completed=True)
+
+
+def targets_written(sender, pks, using, created=False, **kwargs):
+    # Inserted rows only, like targets_counted(): code that updates targets without save() (e.g.
+    # Target.update_completed()) knows which way the mission can go and syncs it itself.
+    if not created:
+        return
+    mission_ids = set(Target.objects.using(using).filter(pk__in=pks).values_list("mission_id", flat=True))
+    if len(mission_ids) == 1:
+        return _sync(mission_ids, using)
+    changed = Mission.sync_completed_many(mission_ids, using)
+    if changed:
+        rows_saved.send(sender=Mission, pks=changed, using=using)
+
+
+def _stored_key(pk, using):
+    row = Target.objects.using(using).filter(pk=pk).values_list("country", "completed").first()
+    return tuple(row) if row else None
+
+
+def target_loading(sender, instance, using, **kwargs):
+    # Loaded without country/completed (only()/defer()): read what the row counts as before it changes.
+    if not instance._state.adding and getattr(instance, "counted_as", None) is None:
+        instance.counted_as = _stored_key(instance.pk, using)
+
+
+def target_counted(sender, instance, created, using, update_fields=None, **kwargs):
+    before = None if created else getattr(instance, "counted_as", None)
+    after = instance.count_key()
+    if after is not None and before is not None and update_fields is not None:
+        # Only the fields in update_fields were written; the row keeps the rest.
+        after = tuple(new if name in update_fields else old
+                      for name, new, old in zip(("country", "completed"), after, before))
+    if after is None:
+        # A deferred field is not written by save(): take what the row holds.
+        after = _stored_key(instance.pk, using)
+    if before != after:
+        CountryTargetStats.add({after: 1, **({before: -1} if before else {})}, using)
+    instance.counted_as = after
+
+
+def target_uncounted(sender, instance, using, **kwargs):
+    if instance.counted_as is not None:
+        CountryTargetStats.add({instance.counted_as: -1}, using)
+
+
+def targets_counted(sender, pks, using, created=False, **kwargs):
+    # Inserted rows only: code that updates targets without save() applies the change itself, as only it
+    # knows what the rows were before (see MissionQuerySet.bulk_delete() for deletes).
+    if created:
+        CountryTargetStats.add_targets(Target.objects.using(using).filter(pk__in=pks))
+
+
+def cat_deleted(sender, instance, using, **kwargs):
+    # SpyCat.delete() sets the cat of live missions to NULL; do the same for archived ones.
+    MissionArchive.objects.using(using).filter(cat_id=instance.pk).unassign()
+
+
+post_save.connect(target_saved, sender=Target, dispatch_uid="missions-completed-saved")
+post_delete.connect(target_deleted, sender=Target, dispatch_uid="missions-completed-deleted")
+rows_saved.connect(targets_written, sender=Target, dispatch_uid="missions-completed-rows-saved")
+pre_save.connect(target_loading, sender=Target, dispatch_uid="missions-countries-saving")
+pre_delete.connect(target_loading, sender=Target, dispatch_uid="missions-countries-deleting")
+post_save.connect(target_counted, sender=Target, dispatch_uid="missions-countries-saved")
+post_delete.connect(target_uncounted, sender=Target, dispatch_uid="missions-countries-deleted")
+rows_saved.connect(targets_counted, sender=Target, dispatch_uid="missions-countries-rows-saved")
+post_delete.connect(cat_deleted, sender=SpyCat, dispatch_uid="missions-archive-cat-deleted")
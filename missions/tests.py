@@ -1,3 +1,5 @@
+import io
+
 import pytest
 
 
@@ -191,3 +193,637 @@ def test_update_note_forbidden_if_target_or_mission_completed(api_client, make_m
     make_note(t2, "n2")
     r2 = api_client.patch(f"/missions/targets/{t2.id}/note/update/", {"text": "nY"}, format="json")
     assert r2.status_code == 400
+
+
+@pytest.mark.django_db
+def test_list_missions_sparse_fields_skip_targets(api_client, make_cat, make_mission, make_target,
+                                                   django_assert_max_num_queries):
+    cat = make_cat()
+    m = make_mission(cat=cat)
+    make_target(mission=m, name="T1")
+
+    with django_assert_max_num_queries(2):
+        r = api_client.get("/missions/?fields=id,cat&ordering=id")
+    assert r.status_code == 200
+    assert extract_results(r) == [{"id": m.id, "cat": cat.id}]
+
+
+@pytest.mark.django_db
+def test_retrieve_mission_nested_fields_and_expand_cat(api_client, make_cat, make_mission, make_target, make_note):
+    cat = make_cat(name="Expanded")
+    m = make_mission(cat=cat)
+    t = make_target(mission=m, name="T1")
+    make_note(t, "n1")
+
+    r = api_client.get(f"/missions/{m.id}/?fields=cat.name,targets.name,targets.note.text&expand=cat")
+    assert r.status_code == 200
+    assert r.data == {"cat": {"name": "Expanded"}, "targets": [{"name": "T1", "note": {"text": "n1"}}]}
+
+
+@pytest.mark.django_db
+def test_admin_target_changelist_queries_do_not_grow_with_rows(admin_client, make_mission, make_target):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    make_target(mission=make_mission())
+    with CaptureQueriesContext(connection) as one_row:
+        assert admin_client.get("/admin/missions/target/").status_code == 200
+    for _ in range(10):
+        make_target(mission=make_mission())
+    with CaptureQueriesContext(connection) as many_rows:
+        assert admin_client.get("/admin/missions/target/?completed__exact=0").status_code == 200
+    assert len(many_rows) == len(one_row)
+
+
+@pytest.mark.django_db
+def test_admin_mission_inline_edits_target_note(admin_client, make_mission, make_target, make_note):
+    m = make_mission()
+    t = make_target(mission=m, name="T1")
+    make_note(t, "old")
+
+    r = admin_client.post(f"/admin/missions/mission/{m.id}/change/", {
+        "cat": "",
+        "targets-TOTAL_FORMS": "1",
+        "targets-INITIAL_FORMS": "1",
+        "targets-MIN_NUM_FORMS": "0",
+        "targets-MAX_NUM_FORMS": "3",
+        "targets-0-id": t.id,
+        "targets-0-mission": m.id,
+        "targets-0-name": "T1",
+        "targets-0-country": "UA",
+        "targets-0-note_text": "new",
+    })
+    assert r.status_code == 302, r.context and r.context["inline_admin_formsets"][0].formset.errors
+    t.refresh_from_db()
+    assert t.country == "UA"
+    assert t.note.text == "new"
+
+
+@pytest.mark.django_db
+def test_list_missions_count_is_exact_unless_estimated(api_client, make_mission, monkeypatch):
+    make_mission()
+    make_mission()
+
+    r = api_client.get("/missions/?fields=id")
+    assert (r.data["count"], r.data["count_estimated"]) == (2, False)
+
+    monkeypatch.setattr("core.pagination.planner_estimate", lambda queryset: 25_000_000)
+    r = api_client.get("/missions/?fields=id")
+    assert (r.data["count"], r.data["count_estimated"]) == (25_000_000, True)
+    assert r.data["next"] is not None
+
+
+def _stream_mission_events(path, on_message):
+    """Run ``MissionEventsApp`` for a GET of ``path``; ``on_message(sent)`` after each message sent returns
+    True to disconnect. Returns the messages sent."""
+    import asyncio
+
+    from asgiref.sync import async_to_sync
+
+    from missions.events import MissionEventsApp
+
+    async def request():
+        sent, requested, disconnect = [], False, asyncio.Event()
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b""}
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if await on_message(sent):
+                disconnect.set()
+
+        await asyncio.wait_for(MissionEventsApp(app=None)({"type": "http", "method": "GET", "path": path},
+                                                          receive, send), 1)
+        return sent
+
+    return async_to_sync(request)()
+
+
+# Committed data: the app closes the connection it used (close_old_connections) like a real request.
+@pytest.mark.django_db(transaction=True)
+def test_mission_events_stream_target_note_and_completion(make_cat, make_mission, make_target):
+    from asgiref.sync import sync_to_async
+
+    from missions.models import Note
+
+    m = make_mission(cat=make_cat())
+    t = make_target(mission=m)
+
+    def complete_target_with_note():
+        # What the note and target endpoints do: written without save(), announced with rows_saved.
+        Note.objects.create_if_open(t.id, "seen")
+        t.update_completed(True)
+
+    async def on_message(sent):
+        if len(sent) == 2:
+            assert sent[1]["body"] == b"retry: 3000\n\n"
+            await sync_to_async(complete_target_with_note)()
+        return len(sent) == 5
+
+    sent = _stream_mission_events(f"/missions/{m.id}/events/", on_message)
+    assert (b"content-type", b"text/event-stream") in sent[0]["headers"]
+    note_event, target_event, mission_event = (message["body"] for message in sent[2:])
+    assert note_event.startswith(b"event: note\n")
+    assert target_event == f'event: target\ndata: {{"id": {t.id}, "completed": true}}\n\n'.encode()
+    assert mission_event == f'event: mission\ndata: {{"id": {m.id}, "is_completed": true}}\n\n'.encode()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_mission_events_app_streams_until_disconnect(make_mission):
+    from core.pubsub import get_broker
+
+    m = make_mission()
+
+    async def on_message(sent):
+        if len(sent) == 2:
+            get_broker().publish(f"mission:{m.id}", {"event": "note", "data": {"id": 1, "target": 2}})
+        return len(sent) == 3
+
+    sent = _stream_mission_events(f"/missions/{m.id}/events/", on_message)
+    assert sent[0]["status"] == 200
+    assert sent[2]["body"] == b'event: note\ndata: {"id": 1, "target": 2}\n\n'
+    assert _stream_mission_events("/missions/999/events/", on_message)[0]["status"] == 404
+
+
+@pytest.mark.django_db
+def test_mission_events_are_not_streamed_over_wsgi(client, make_mission):
+    # A sync worker would be held by the endless stream: only the ASGI app serves it.
+    r = client.get(f"/missions/{make_mission().id}/events/")
+    assert r.status_code == 404
+    assert "ASGI" in r.json()["detail"]
+
+
+@pytest.mark.django_db
+def test_completed_at_follows_targets(make_mission, make_target):
+    from missions.models import Mission
+
+    m = make_mission()
+    t1 = make_target(m)
+    t2 = make_target(m, name="Target B", completed=True)
+    assert Mission.objects.get(pk=m.pk).completed_at is None
+
+    t1.completed = True
+    t1.save()
+    completed_at = Mission.objects.get(pk=m.pk).completed_at
+    assert completed_at is not None
+
+    t2.completed = False
+    t2.save()
+    assert Mission.objects.get(pk=m.pk).completed_at is None
+    t2.delete()
+    assert Mission.objects.get(pk=m.pk).completed_at is not None
+
+
+@pytest.mark.django_db
+def test_archive_missions_moves_old_completed_missions(api_client, make_cat, make_mission, make_target, make_note,
+                                                       monkeypatch):
+    from datetime import timedelta
+
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from core.pagination import EstimatedCountPageNumberPagination
+    from missions.models import Mission, MissionArchive, Note, Target
+
+    cat = make_cat()
+    old = [make_mission(cat=cat) for _ in range(3)]
+    for m in old:
+        make_note(make_target(m, completed=True))
+    Mission.objects.filter(pk__in=[m.pk for m in old]).update(completed_at=timezone.now() - timedelta(days=100))
+    recent = make_mission(cat=cat)
+    make_target(recent, completed=True)
+    active = make_mission()
+    make_target(active)
+
+    call_command("archive_missions", "--batch-size", "2", "--sleep", "0", stdout=io.StringIO())
+
+    assert set(Mission.objects.values_list("id", flat=True)) == {recent.id, active.id}
+    assert not Target.objects.filter(mission__in=old).exists()
+    assert not Note.objects.filter(target__mission__in=old).exists()
+    archived = MissionArchive.objects.get(pk=old[0].id)
+    assert archived.cat_id == cat.id
+    assert archived.data["targets"][0]["note"]["text"] == "Observe north perimeter"
+
+    # Rerunning finds nothing left to do.
+    call_command("archive_missions", "--sleep", "0", stdout=io.StringIO())
+    assert MissionArchive.objects.count() == 3
+
+    assert api_client.get(f"/missions/{old[0].id}/").status_code == 404
+    resp = api_client.get(f"/missions/{old[0].id}/?include_archived=true&fields=id,is_completed")
+    assert resp.status_code == 200
+    assert resp.data == {"id": old[0].id, "is_completed": True}
+
+    assert [m["id"] for m in extract_results(api_client.get(f"/cats/{cat.id}/missions/"))] == [recent.id]
+    resp = api_client.get(f"/cats/{cat.id}/missions/?include_archived=1")
+    assert resp.data["count"] == 4
+    assert [m["id"] for m in extract_results(resp)] == [recent.id, *(m.id for m in old)]
+
+    # Paginated in the database: a page reads only its own rows, live and/or archived.
+    monkeypatch.setattr(EstimatedCountPageNumberPagination, "page_size", 2)
+    pages = [api_client.get(f"/cats/{cat.id}/missions/?include_archived=1&fields=id&page={page}") for page in (1, 2)]
+    assert [[m["id"] for m in page.data["results"]] for page in pages] == [
+        [recent.id, old[0].id], [old[1].id, old[2].id],
+    ]
+    assert pages[0].data["count"] == 4 and pages[1].data["next"] is None
+
+    # Deleting the cat unassigns its archived missions as well.
+    assert api_client.delete(f"/cats/{cat.id}/").status_code == 204
+    assert set(MissionArchive.objects.values_list("cat_id", flat=True)) == {None}
+    assert MissionArchive.objects.get(pk=old[0].id).data["cat"] is None
+
+
+@pytest.mark.django_db
+def test_bulk_delete_missions_keeps_assigned_rule(api_client, make_cat, make_mission, make_target, make_note):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from missions.models import Mission, Note, Target
+
+    assigned = make_mission(cat=make_cat())
+    free = [make_mission() for _ in range(3)]
+    for m in free:
+        make_note(make_target(m))
+        make_target(m, name="Target B")
+
+    resp = api_client.post("/missions/bulk-delete/", {"ids": [assigned.id, free[0].id]}, format="json")
+    assert resp.status_code == 400
+    assert Mission.objects.count() == 4
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = api_client.post("/missions/bulk-delete/", {"ids": [m.id for m in free] + [999]}, format="json")
+    assert resp.status_code == 200
+    assert resp.data == {"deleted": 3}
+    assert list(Mission.objects.values_list("id", flat=True)) == [assigned.id]
+    assert not Target.objects.exists() and not Note.objects.exists()
+    # Set-based: a fixed number of statements, however many missions, targets and notes go.
+    deletes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("DELETE")]
+    assert [sql.split('"')[1] for sql in deletes] == ["missions_note", "missions_target", "missions_mission"]
+
+
+@pytest.mark.django_db
+def test_delete_missions_command(make_cat, make_mission, make_target):
+    from django.core.management import CommandError, call_command
+
+    from missions.models import Mission
+
+    assigned = make_mission(cat=make_cat())
+    for _ in range(5):
+        make_target(make_mission())
+
+    with pytest.raises(CommandError):
+        call_command("delete_missions", stdout=io.StringIO())
+    call_command("delete_missions", "--all-unassigned", "--batch-size", "2", stdout=io.StringIO())
+    assert list(Mission.objects.values_list("id", flat=True)) == [assigned.id]
+
+
+@pytest.mark.django_db
+def test_create_note_runs_a_fixed_number_of_queries(api_client, make_mission, make_target,
+                                                    django_assert_num_queries):
+    t = make_target(mission=make_mission())
+    # INSERT ... SELECT ... RETURNING (with the mission and the cat), change log row.
+    with django_assert_num_queries(2):
+        r = api_client.post(f"/missions/targets/{t.id}/note/create/", {"text": "n1"}, format="json")
+    assert r.status_code == 201
+    assert r.data["text"] == "n1" and r.data["id"] == t.note.id and r.data["created_at"]
+
+    done = make_target(mission=make_mission(), completed=True)
+    for target_id, expected in ((t.id, "Note already exists."), (done.id, "completed"), (999, None)):
+        # INSERT ... SELECT, then the target, to tell why nothing was inserted.
+        with django_assert_num_queries(2):
+            r = api_client.post(f"/missions/targets/{target_id}/note/create/", {"text": "n2"}, format="json")
+        if expected is None:
+            assert r.status_code == 404
+        else:
+            assert r.status_code == 400 and expected in str(r.data["detail"])
+
+
+@pytest.mark.django_db
+def test_update_note_runs_a_fixed_number_of_queries(api_client, make_mission, make_target, make_note,
+                                                    django_assert_num_queries):
+    m = make_mission()
+    t = make_target(mission=m)
+    make_note(t, "n1")
+    # Guarded UPDATE ... RETURNING (with the mission and the cat), change log row.
+    with django_assert_num_queries(2):
+        r = api_client.patch(f"/missions/targets/{t.id}/note/update/", {"text": "n2"}, format="json")
+    assert r.status_code == 200 and r.data["text"] == "n2" and r.data["created_at"]
+
+    t.completed = True
+    t.save()
+    # Guarded UPDATE (no row), the note.
+    with django_assert_num_queries(2):
+        r = api_client.patch(f"/missions/targets/{t.id}/note/update/", {"text": "n3"}, format="json")
+    assert r.status_code == 400
+    t.note.refresh_from_db()
+    assert t.note.text == "n2"
+
+    assert api_client.patch(f"/missions/targets/{make_target(m).id}/note/update/", {"text": "x"},
+                            format="json").status_code == 404
+
+
+@pytest.mark.django_db
+def test_complete_target_runs_a_fixed_number_of_queries(api_client, make_cat, make_mission, make_target,
+                                                        django_assert_max_num_queries):
+    from missions.models import Mission
+
+    m = make_mission(cat=make_cat())
+    first, last = make_target(m), make_target(m, name="Target B")
+    for target in (first, last):
+        # Savepoint, lock, UPDATE target, country counts, UPDATE mission, dashboard lookup, event lookup and
+        # check, change log rows for the target and (the last time) the mission, release.
+        with django_assert_max_num_queries(11):
+            r = api_client.patch(f"/missions/targets/{target.id}/", {"completed": True}, format="json")
+        assert r.status_code == 200 and r.data == {"completed": True}
+    assert Mission.objects.get(pk=m.pk).is_completed
+
+    r = api_client.patch(f"/missions/targets/{last.id}/", {"completed": False}, format="json")
+    assert r.status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_clients_completing_the_last_targets(make_cat, make_mission, make_target):
+    import threading
+
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    from missions.models import Mission, Target
+
+    m = make_mission(cat=make_cat())
+    targets = [make_target(m, name=f"T{i}") for i in range(4)]
+    statuses = []
+
+    def complete(target):
+        try:
+            barrier.wait()
+            statuses.append(
+                APIClient().patch(f"/missions/targets/{target.id}/", {"completed": True}, format="json").status_code
+            )
+        finally:
+            connection.close()
+
+    # Every target twice: one of the two requests for a target must lose.
+    threads = [threading.Thread(target=complete, args=(t,)) for t in targets + targets]
+    barrier = threading.Barrier(len(threads))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [200] * 4 + [400] * 4
+    assert not Target.objects.filter(completed=False).exists()
+    assert Mission.objects.get(pk=m.pk).completed_at is not None
+
+
+@pytest.mark.django_db
+def test_list_targets_by_country_with_keyset_pages(api_client, make_mission, make_target):
+    m = make_mission()
+    done = make_target(m, name="Done", country="UA", completed=True)
+    first, second = make_target(m, name="First", country="UA"), make_target(m, name="Second", country="UA")
+    make_target(m, name="Elsewhere", country="US")
+
+    r = api_client.get("/missions/targets/?country=ua&limit=2")
+    assert r.status_code == 200 and r.data["has_more"]
+    assert [t["id"] for t in r.data["results"]] == [first.id, second.id]
+    assert r.data["results"][0] == {"id": first.id, "name": "First", "country": "UA", "country_name": "Ukraine",
+                                    "completed": False, "mission": m.id}
+    r = api_client.get(f"/missions/targets/?country=UA&limit=2&after={r.data['cursor']}")
+    assert [t["id"] for t in r.data["results"]] == [done.id]
+    assert r.data == {**r.data, "has_more": False, "cursor": None}
+
+    r = api_client.get("/missions/targets/?country=UA&completed=false")
+    assert [t["id"] for t in r.data["results"]] == [first.id, second.id]
+    assert api_client.get("/missions/targets/").status_code == 400
+    assert api_client.get("/missions/targets/?country=UA&after=x").status_code == 400
+
+
+@pytest.mark.django_db
+def test_country_counts_follow_target_writes(api_client, make_cat):
+    from django.core.management import call_command
+    from django.db.models import Count
+
+    from missions.models import CountryTargetStats, Mission, Target
+
+    def counts():
+        return {(row.country.code, row.open_targets, row.completed_targets)
+                for row in CountryTargetStats.objects.all() if row.open_targets or row.completed_targets}
+
+    def recounted():
+        numbers = {}
+        for country, completed, n in Target.objects.values_list("country", "completed").annotate(n=Count("pk")):
+            numbers.setdefault(country, [0, 0])[completed] = n
+        return {(country, *values) for country, values in numbers.items()}
+
+    r = api_client.post("/missions/create/", {"targets": [
+        {"name": "A", "country": "UA"}, {"name": "B", "country": "UA"}, {"name": "C", "country": "US"},
+    ]}, format="json")
+    mission = Mission.objects.get(pk=r.data["id"])
+    assert counts() == recounted() == {("UA", 2, 0), ("US", 1, 0)}
+
+    api_client.patch(f"/missions/{mission.id}/assign-cat/", {"cat": make_cat().id}, format="json")
+    target_a = mission.targets.get(name="A")
+    assert api_client.patch(f"/missions/targets/{target_a.id}/", {"completed": True}, format="json").status_code == 200
+    assert counts() == recounted() == {("UA", 1, 1), ("US", 1, 0)}
+
+    target_b = Target.objects.get(name="B")
+    target_b.country = "FR"
+    target_b.save()
+    Target.objects.get(name="C").delete()
+    assert counts() == recounted() == {("UA", 0, 1), ("FR", 1, 0)}
+
+    # Saved without country/completed loaded: the row says what changed.
+    target_b = Target.objects.only("id").get(name="B")
+    target_b.completed = True
+    target_b.save(update_fields=["completed"])
+    target_b.completed = False
+    target_b.save()
+    assert counts() == recounted() == {("UA", 0, 1), ("FR", 1, 0)}
+
+    # Creating targets adds their own numbers: a broken count elsewhere stays broken until recounted.
+    CountryTargetStats.objects.filter(country="UA").update(open_targets=5)
+    r = api_client.post("/missions/create/", {"targets": [{"name": "D", "country": "FR"}]}, format="json")
+    assert r.status_code == 201, r.data
+    assert counts() == {("UA", 5, 1), ("FR", 2, 0)}
+    call_command("recount_countries", stdout=io.StringIO())
+    assert counts() == recounted() == {("UA", 0, 1), ("FR", 2, 0)}
+    Target.objects.get(name="D").mission.delete()
+
+    r = api_client.get("/missions/countries/")
+    assert r.data == [
+        {"country": "FR", "country_name": "France", "open_targets": 1, "completed_targets": 0},
+        {"country": "UA", "country_name": "Ukraine", "open_targets": 0, "completed_targets": 1},
+    ]
+
+    Mission.objects.filter(pk=mission.pk).update(cat=None)
+    Mission.objects.filter(pk=mission.pk).bulk_delete()
+    assert counts() == recounted() == set()
+
+
+@pytest.mark.django_db
+def test_import_data_ndjson_skips_invalid_records_and_resumes(tmp_path, make_cat, make_mission, make_target):
+    import json
+
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from cats.models import Breed, SpyCat
+    from changes.models import Change
+    from missions.models import CountryTargetStats, ImportCheckpoint, Mission, Note, Target
+
+    Breed.objects.create(name="siamese", refreshed_at=timezone.now())
+    busy = make_cat()
+    make_target(make_mission(cat=busy), country="GB")
+    cat = {"type": "cat", "name": "Tom", "years_of_experience": 3, "breed": "Siamese", "salary": "2500.00"}
+    records = [
+        {**cat, "id": 100},
+        {**cat, "id": 101, "breed": "Robot"},
+        {"type": "mission", "id": 200, "cat": 100, "targets": [
+            {"name": "Dock", "country": "UA", "completed": True, "note": "Seen at 6"},
+            {"name": "Bridge", "country": "UA", "completed": False},
+        ]},
+        {"type": "mission", "id": 201, "cat": 100, "targets": [{"name": "Port", "country": "FR"}]},
+        {"type": "mission", "id": 202, "cat": busy.id, "targets": [{"name": "Port", "country": "FR"}]},
+        {"type": "mission", "id": 203, "targets": []},
+        {"type": "mission", "id": 204, "targets": [{"name": "Old", "country": "XX", "completed": "maybe"}]},
+        {"type": "mission", "id": 205, "targets": [{"name": "Done", "country": "US", "completed": "true"}]},
+    ]
+    path = tmp_path / "data.ndjson"
+    path.write_text("\n".join(map(json.dumps, records)) + "\nnot json\n")
+
+    call_command("import_data", str(path), "--chunk-size", "3", stdout=io.StringIO())
+    assert list(SpyCat.objects.filter(pk__gte=100).values_list("pk", flat=True)) == [100]
+    missions = Mission.objects.filter(pk__gte=200).order_by("pk")
+    assert [(mission.pk, mission.completed_at is None) for mission in missions] == [(200, True), (205, False)]
+    assert Note.objects.get().text == "Seen at 6"
+    assert {(row.country.code, row.open_targets, row.completed_targets)
+            for row in CountryTargetStats.objects.all()} == {("GB", 1, 0), ("UA", 1, 1), ("US", 0, 1)}
+    assert Change.objects.filter(resource="target").count() == 1 + 3
+
+    report = [json.loads(line) for line in (tmp_path / "data.ndjson.errors.ndjson").read_text().splitlines()]
+    assert [(row["position"], sorted(row["errors"])) for row in report] == [
+        (2, ["breed"]), (4, ["cat"]), (5, ["cat"]), (6, ["targets"]),
+        (7, ["targets.0.completed", "targets.0.country"]), (9, ["line"]),
+    ]
+    assert ImportCheckpoint.objects.get().position == 9
+
+    # Everything is committed: a second run has nothing left to do.
+    path.write_text(path.read_text() + json.dumps({**cat, "id": 102}) + "\n")
+    call_command("import_data", str(path), stdout=io.StringIO())
+    assert SpyCat.objects.filter(pk__gte=100).count() == 2
+    assert Target.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_import_data_csv_missions(tmp_path, make_cat):
+    from django.core.management import CommandError, call_command
+
+    from missions.models import Mission
+
+    cat = make_cat()
+    path = tmp_path / "missions.csv"
+    path.write_text(
+        "id,cat,name,country,completed,note\n"
+        f"300,{cat.id},A,UA,false,watch\n"
+        f"300,{cat.id},B,US,true,\n"
+        "301,,C,GB,,\n"
+    )
+    with pytest.raises(CommandError):
+        call_command("import_data", str(path), stdout=io.StringIO())
+    call_command("import_data", str(path), "--kind", "mission", stdout=io.StringIO())
+
+    mission = Mission.objects.get(pk=300)
+    assert mission.cat == cat and mission.completed_at is None
+    assert [(t.name, t.completed, getattr(t, "note", None) and t.note.text) for t in mission.targets.order_by("name")] == [
+        ("A", False, "watch"), ("B", True, None),
+    ]
+    assert Mission.objects.get(pk=301).targets.get().country.code == "GB"
+
+
+@pytest.mark.django_db
+def test_auto_assign_matches_free_cats_to_open_missions(api_client, make_cat, make_mission, make_target,
+                                                        django_capture_on_commit_callbacks):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from changes.models import Change
+    from missions.models import Mission
+
+    rookie = make_cat(name="Rookie", years_of_experience=1)
+    veteran = make_cat(name="Veteran", years_of_experience=9)
+    busy = make_cat(name="Busy", years_of_experience=20)
+    make_target(make_mission(cat=busy))
+    make_cat(name="Expensive", years_of_experience=30, salary="9999.00")
+
+    small = make_mission()
+    make_target(small, country="UA")
+    big = make_mission()
+    for name in "ABC":
+        make_target(big, name=name, country="FR")
+    done = make_mission()
+    make_target(done, completed=True)
+    api_client.get(f"/cats/{veteran.id}/dashboard/")
+
+    criteria = {"mission_order": "targets", "max_salary": "5000.00"}
+    r = api_client.post("/missions/auto-assign/", {**criteria, "dry_run": True}, format="json")
+    assert r.status_code == 200
+    assert r.data == {"planned": 2, "assigned": 0, "assignments": [
+        {"mission": big.id, "cat": veteran.id}, {"mission": small.id, "cat": rookie.id},
+    ]}
+    assert not Mission.objects.filter(pk__in=[small.pk, big.pk], cat__isnull=False).exists()
+
+    with CaptureQueriesContext(connection) as ctx, django_capture_on_commit_callbacks(execute=True):
+        r = api_client.post("/missions/auto-assign/", criteria, format="json")
+    assert r.data["assigned"] == 2
+    assert dict(Mission.objects.filter(cat__isnull=False).values_list("pk", "cat_id")) == {
+        big.pk: veteran.pk, small.pk: rookie.pk, Mission.objects.get(cat=busy).pk: busy.pk,
+    }
+    updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "missions_mission"')]
+    assert len(updates) == 1
+    assert set(Change.objects.filter(resource="mission").values_list("object_id", flat=True)) >= {small.pk, big.pk}
+    assert api_client.get(f"/cats/{veteran.id}/dashboard/").data["active_mission"]["id"] == big.id
+
+    # Nobody is free any more.
+    assert api_client.post("/missions/auto-assign/", {}, format="json").data["assigned"] == 0
+    assert api_client.post("/missions/auto-assign/", {"cat_order": "age"}, format="json").status_code == 400
+
+
+@pytest.mark.django_db
+def test_assign_skips_cats_that_got_a_mission_after_planning(make_cat, make_mission, make_target):
+    from missions.assignment import assign
+    from missions.models import Mission
+
+    cat = make_cat()
+    planned, taken = make_mission(), make_mission()
+    make_target(planned)
+    make_target(taken)
+    # Planned as free, then given a mission by another request.
+    Mission.objects.filter(pk=taken.pk).update(cat=cat)
+
+    assert assign([(planned.pk, cat.pk)]) == {}
+    assert Mission.objects.get(pk=planned.pk).cat_id is None
+
+
+@pytest.mark.django_db
+def test_auto_assign_command_filters_by_country(make_cat, make_mission, make_target):
+    from django.core.management import CommandError, call_command
+
+    from missions.models import Mission
+
+    cats = [make_cat(), make_cat()]
+    in_ua, in_fr = make_mission(), make_mission()
+    make_target(in_ua, country="UA")
+    make_target(in_fr, country="FR")
+
+    with pytest.raises(CommandError):
+        call_command("auto_assign", "--country", "XX", stdout=io.StringIO())
+    out = io.StringIO()
+    call_command("auto_assign", "--country", "UA", "--cat-order", "id", stdout=out)
+    assert "1 missions assigned" in out.getvalue()
+    assert Mission.objects.get(pk=in_ua.pk).cat_id == cats[0].id
+    assert Mission.objects.get(pk=in_fr.pk).cat_id is None
@@ -1,13 +1,18 @@
 from django.urls import path
 
 from missions.views import CreateMission, AssignCatToMission, ListAllMissions, RetrieveRemoveMission, UpdateTarget, \
-    CreateNote, UpdateNote
+    CreateNote, UpdateNote, BulkDeleteMissions, AutoAssignMissions, ListTargetsByCountry, ListCountryTargetStats, mission_events
 
 urlpatterns = [
     path("create/", CreateMission.as_view(), name="mission-create"),
     path("<int:pk>/assign-cat/", AssignCatToMission.as_view(), name="mission-assign-cat"),
     path("", ListAllMissions.as_view(), name="mission-list"),
+    path("bulk-delete/", BulkDeleteMissions.as_view(), name="mission-bulk-delete"),
+    path("auto-assign/", AutoAssignMissions.as_view(), name="mission-auto-assign"),
     path("<int:pk>/", RetrieveRemoveMission.as_view(), name="mission-detail"),
+    path("<int:pk>/events/", mission_events, name="mission-events"),
+    path("targets/", ListTargetsByCountry.as_view(), name="target-list"),
+    path("countries/", ListCountryTargetStats.as_view(), name="country-stats"),
     path("targets/<int:pk>/", UpdateTarget.as_view(), name="target-update"),
     path("targets/<int:pk>/note/create/", CreateNote.as_view(), name="target-note-create"),
     path("targets/<int:pk>/note/update/", UpdateNote.as_view(), name="target-note-update"),
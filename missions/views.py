@@ -1,19 +1,29 @@
-from django.db.models import Prefetch
-from django.shortcuts import get_object_or_404
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample, OpenApiParameter
 from rest_framework import generics, status, serializers
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-from missions.models import Mission, Note, Target
+from core.fieldsets import SparseFieldsetViewMixin, fieldset_parameters, restrict_data
+from core.idempotency import IdempotencyMixin, idempotency_key_parameter
+from core.pagination import EstimatedCountPageNumberPagination
+from missions.archive import include_archived, include_archived_parameter
+from missions.models import CountryTargetStats, Mission, MissionArchive, Note, Target
 from missions.serializers import MissionSerializer, MissionCreateSerializer, MissionAssignCatSerializer, NoteSerializer, \
-    TargetCompleteSerializer
+    MissionAutoAssignSerializer, MissionAutoAssignResultSerializer, \
+    TargetCompleteSerializer, MissionBulkDeleteSerializer, TargetByCountryPageSerializer, CountryTargetStatsSerializer, \
+    country_names
 
 
 @extend_schema(
     tags=["Missions"],
     summary="Create a mission with targets",
     description="Creates a mission and up to three targets in a single request.",
+    parameters=[idempotency_key_parameter],
     request=MissionCreateSerializer,
     responses={201: MissionSerializer, 400: OpenApiResponse(description="Validation error")},
     examples=[OpenApiExample(
@@ -28,7 +38,7 @@ from missions.serializers import MissionSerializer, MissionCreateSerializer, Mis
         request_only=True,
     )],
 )
-class CreateMission(generics.CreateAPIView):
+class CreateMission(IdempotencyMixin, generics.CreateAPIView):
     serializer_class = MissionCreateSerializer
 
     def create(self, request, *args, **kwargs):
@@ -47,7 +57,10 @@ class CreateMission(generics.CreateAPIView):
     tags=["Missions"],
     summary="Assign a cat to a mission",
     description="Assigns a cat to a mission. A cat can have only one active (not completed) mission.",
-    parameters=[OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Mission ID")],
+    parameters=[
+        OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Mission ID"),
+        idempotency_key_parameter,
+    ],
     request=MissionAssignCatSerializer,
     responses={
         200: MissionSerializer,
@@ -60,48 +73,62 @@ class CreateMission(generics.CreateAPIView):
         request_only=True,
     )],
 )
-class AssignCatToMission(generics.UpdateAPIView):
+class AssignCatToMission(IdempotencyMixin, generics.UpdateAPIView):
     http_method_names = ["patch"]
-    queryset = Mission.objects.only("id", "cat_id")
+    queryset = Mission.objects.only("id", "cat_id", "completed_at")
     serializer_class = MissionAssignCatSerializer
 
 
 @extend_schema(
     tags=["Missions"],
     summary="List missions",
-    description="Returns a paginated list of missions with embedded targets and their notes.",
+    description=(
+        "Returns a paginated list of missions with embedded targets and their notes. "
+        "Use `fields` to return only some fields and `expand=cat` to embed the assigned cat. "
+        "On very large tables `count` is the database's estimate and `count_estimated` is true."
+    ),
+    parameters=fieldset_parameters(expandable=["cat"]),
     responses={200: MissionSerializer},
 )
-class ListAllMissions(generics.ListAPIView):
-    queryset = Mission.objects.select_related("cat").prefetch_related(
-        Prefetch(
-            "targets",
-            queryset=Target.objects.select_related("note")
-        )
-    )
+class ListAllMissions(SparseFieldsetViewMixin, generics.ListAPIView):
     serializer_class = MissionSerializer
+    pagination_class = EstimatedCountPageNumberPagination
+
+    def get_queryset(self):
+        return Mission.objects.with_fieldset(self.get_fieldset(), self.get_expand())
 
 
-class RetrieveRemoveMission(generics.RetrieveDestroyAPIView):
+class RetrieveRemoveMission(SparseFieldsetViewMixin, generics.RetrieveDestroyAPIView):
     serializer_class = MissionSerializer
 
     def get_queryset(self):
         if self.request.method == "GET":
-            return (Mission.objects
-                    .select_related("cat")
-                    .prefetch_related(Prefetch("targets", queryset=Target.objects.select_related("note"))))
+            return Mission.objects.with_fieldset(self.get_fieldset(), self.get_expand())
 
         return Mission.objects.only("id", "cat_id")
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived = include_archived(request) and MissionArchive.objects.filter(pk=kwargs["pk"]).first()
+            if not archived:
+                raise
+            return Response(restrict_data(archived.data, self.get_fieldset()))
+
     def perform_destroy(self, instance):
         if instance.cat_id:
             raise serializers.ValidationError("Mission cannot be deleted because it is already assigned to a cat.")
-        instance.delete()
+        Mission.objects.filter(pk=instance.pk, cat__isnull=True).bulk_delete()
 
     @extend_schema(
         tags=["Missions"],
         summary="Get a mission",
-        parameters=[OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Mission ID")],
+        parameters=[
+            OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Mission ID"),
+            *fieldset_parameters(expandable=["cat"]),
+            include_archived_parameter,
+        ],
         responses={200: MissionSerializer, 404: OpenApiResponse(description="Not found")},
     )
     def get(self, request, *args, **kwargs):
@@ -122,11 +149,63 @@ class RetrieveRemoveMission(generics.RetrieveDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
+@extend_schema(
+    tags=["Missions"],
+    summary="Delete missions in bulk",
+    description=(
+        "Deletes up to 1000 missions with their targets and notes in a few set-based statements. "
+        "Nothing is deleted if any of them is assigned to a cat; unknown IDs are ignored."
+    ),
+    request=MissionBulkDeleteSerializer,
+    responses={
+        200: OpenApiResponse(response=OpenApiTypes.OBJECT, description="Number of deleted missions",
+                             examples=[OpenApiExample("Deleted", value={"deleted": 2})]),
+        400: OpenApiResponse(description="A mission is assigned to a cat / invalid data"),
+    },
+    examples=[OpenApiExample("Delete missions", value={"ids": [4, 8]}, request_only=True)],
+)
+class BulkDeleteMissions(generics.GenericAPIView):
+    serializer_class = MissionBulkDeleteSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
+
+@extend_schema(
+    tags=["Missions"],
+    summary="Assign free cats to open missions",
+    description=(
+        "Pairs cats without an active mission with unassigned, incomplete missions and assigns them all at "
+        "once. Missions and cats are taken in the given orders (e.g. the most open targets to the most "
+        "experienced cats) and can be filtered; a cat never ends up with two active missions."
+    ),
+    request=MissionAutoAssignSerializer,
+    responses={200: MissionAutoAssignResultSerializer},
+    examples=[OpenApiExample(
+        "Most experienced cats to missions in Ukraine",
+        value={"cat_order": "experience", "mission_order": "targets", "countries": ["UA"], "limit": 50},
+        request_only=True,
+    )],
+)
+class AutoAssignMissions(generics.GenericAPIView):
+    serializer_class = MissionAutoAssignSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
+
 @extend_schema(
     tags=["Targets"],
     summary="Update a target",
     description="Partially updates a target. To mark a target as completed, the mission must be assigned to a cat.",
-    parameters=[OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Target ID")],
+    parameters=[
+        OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Target ID"),
+        idempotency_key_parameter,
+    ],
     request=TargetCompleteSerializer,
     responses={
         200: TargetCompleteSerializer,
@@ -139,37 +218,57 @@ class RetrieveRemoveMission(generics.RetrieveDestroyAPIView):
         request_only=True,
     )],
 )
-class UpdateTarget(generics.UpdateAPIView):
+class UpdateTarget(IdempotencyMixin, generics.UpdateAPIView):
     http_method_names = ["patch"]
-    queryset = Target.objects.select_related("mission").only("id", "completed", "mission_id", "mission__cat_id")
+    queryset = Target.objects.select_related("mission").only(
+        "id", "country", "completed", "mission_id", "mission__cat_id", "mission__completed_at"
+    )
     serializer_class = TargetCompleteSerializer
 
+    def get_queryset(self):
+        # Locks the mission too: two clients closing its last two targets take turns, so the second
+        # sees the first one's target completed and marks the mission completed.
+        queryset = super().get_queryset()
+        if connection.features.has_select_for_update_of:
+            return queryset.select_for_update(of=("self", "mission"))
+        return queryset.select_for_update()
+
     def patch(self, request, *args, **kwargs):
-        target = self.get_object()
+        with transaction.atomic():
+            target = self.get_object()
 
-        if not target.mission.cat_id:
-            return Response({"detail": "Cannot complete the mission while it is not assigned to cat."},
-                            status=status.HTTP_400_BAD_REQUEST)
+            if not target.mission.cat_id:
+                return Response({"detail": "Cannot complete the mission while it is not assigned to cat."},
+                                status=status.HTTP_400_BAD_REQUEST)
 
-        return super().patch(request, *args, **kwargs)
+            serializer = self.get_serializer(target, data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        return Response(serializer.data)
 
 
-class UpdateNote(generics.UpdateAPIView):
+class UpdateNote(IdempotencyMixin, generics.UpdateAPIView):
     http_method_names = ["patch"]
-    queryset = (Note.objects
-                .select_related("target", "target__mission")
-                .only("id", "text", "target"))
     serializer_class = NoteSerializer
 
+    def get_queryset(self):
+        return Note.objects.none()
+
     def get_object(self):
-        target_id = self.kwargs["pk"]
-        return get_object_or_404(Note, target_id=target_id)
+        # Not loaded: NoteSerializer.update() writes with a conditional UPDATE, then reads the note.
+        return Note(target_id=self.kwargs["pk"])
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "target_id": self.kwargs["pk"]}
 
     @extend_schema(
         tags=["Notes"],
         summary="Update a target note",
         description="Updates the note text for a target. Editing is forbidden if the target or its mission is completed.",
-        parameters=[OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Target ID")],
+        parameters=[
+            OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Target ID"),
+            idempotency_key_parameter,
+        ],
         request=NoteSerializer,
         responses={
             200: NoteSerializer,
@@ -182,23 +281,23 @@ class UpdateNote(generics.UpdateAPIView):
         return super().patch(request, *args, **kwargs)
 
 
-class CreateNote(generics.CreateAPIView):
+class CreateNote(IdempotencyMixin, generics.CreateAPIView):
     serializer_class = NoteSerializer
 
     def get_queryset(self):
         return Note.objects.none()
 
     def get_serializer_context(self):
-        ctx = super().get_serializer_context()
-        target = get_object_or_404(Target.objects.select_related("mission"), pk=self.kwargs["pk"])
-        ctx["target"] = target
-        return ctx
+        return {**super().get_serializer_context(), "target_id": self.kwargs["pk"]}
 
     @extend_schema(
         tags=["Notes"],
         summary="Create a target note",
         description="Creates a note for the target. Returns 400 if the note already exists.",
-        parameters=[OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Target ID")],
+        parameters=[
+            OpenApiParameter("pk", OpenApiTypes.INT, OpenApiParameter.PATH, description="Target ID"),
+            idempotency_key_parameter,
+        ],
         request=NoteSerializer,
         responses={
             201: NoteSerializer,
@@ -209,3 +308,100 @@ class CreateNote(generics.CreateAPIView):
     )
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
+
+
+@require_GET
+def mission_events(request, pk):
+    """``/missions/<id>/events/`` reached outside ``MissionEventsApp``, i.e. on a WSGI server.
+
+    The stream never ends: a sync worker (gunicorn sync, runserver) would be held by it for good without
+    flushing a byte. Only the ASGI app (``spyCatsTest.asgi``) streams it; here the path is a 404 saying so.
+    """
+    return JsonResponse(
+        {"detail": "Mission events are served by the ASGI app (spyCatsTest.asgi), not by this server."},
+        status=404,
+    )
+
+
+@extend_schema(
+    tags=["Targets"],
+    summary="List targets of a country",
+    description=(
+        "Targets in `country`, open ones first, then by id. Pages are keyset-paginated: pass the returned "
+        "`cursor` as `after` until `has_more` is false."
+    ),
+    parameters=[
+        OpenApiParameter("country", OpenApiTypes.STR, OpenApiParameter.QUERY, required=True,
+                         description="ISO 3166-1 alpha-2 code, e.g. UA"),
+        OpenApiParameter("completed", OpenApiTypes.BOOL, OpenApiParameter.QUERY, description="Only open/completed"),
+        OpenApiParameter("after", OpenApiTypes.STR, OpenApiParameter.QUERY, description="Cursor of the previous page"),
+        OpenApiParameter("limit", OpenApiTypes.INT, OpenApiParameter.QUERY, description="Page size (default 100, max 1000)"),
+    ],
+    responses={200: TargetByCountryPageSerializer, 400: OpenApiResponse(description="Invalid parameters")},
+)
+class ListTargetsByCountry(generics.GenericAPIView):
+    serializer_class = TargetByCountryPageSerializer
+    pagination_class = None
+    max_limit = 1000
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        names = country_names()
+        country = params.get("country", "").upper()
+        if country not in names:
+            raise ValidationError({"country": "A country code such as UA is required."})
+        targets = Target.objects.filter(country=country)
+
+        completed = params.get("completed")
+        if completed is not None:
+            if completed not in ("true", "false"):
+                raise ValidationError({"completed": "Must be true or false."})
+            targets = targets.filter(completed=completed == "true")
+        if params.get("after"):
+            try:
+                done, last_id = (int(part) for part in params["after"].split("."))
+            except ValueError:
+                raise ValidationError({"after": "Invalid cursor."})
+            targets = targets.filter(Q(completed=bool(done), id__gt=last_id) | Q(completed__gt=bool(done)))
+        try:
+            limit = min(int(params.get("limit", 100)), self.max_limit)
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        if limit < 1:
+            raise ValidationError({"limit": "Must be at least 1."})
+
+        # Rows come in (country, completed, id) index order as tuples; no model or serializer per row.
+        rows = list(targets.order_by("completed", "id").values_list("id", "name", "completed", "mission_id")[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return Response({
+            "cursor": f"{int(rows[-1][2])}.{rows[-1][0]}" if has_more else None,
+            "has_more": has_more,
+            "results": [
+                {"id": pk, "name": name, "country": country, "country_name": names[country],
+                 "completed": done, "mission": mission_id}
+                for pk, name, done, mission_id in rows
+            ],
+        })
+
+
+@extend_schema(
+    tags=["Targets"],
+    summary="Targets per country",
+    description="Open and completed targets of every country that has any. Kept up to date on every write.",
+    responses={200: CountryTargetStatsSerializer(many=True)},
+)
+class ListCountryTargetStats(generics.GenericAPIView):
+    serializer_class = CountryTargetStatsSerializer
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        names = country_names()
+        stats = CountryTargetStats.objects.filter(Q(open_targets__gt=0) | Q(completed_targets__gt=0)).order_by("country")
+        return Response([
+            {"country": country, "country_name": names.get(country, country),
+             "open_targets": open_targets, "completed_targets": completed_targets}
+            for country, open_targets, completed_targets in stats.values_list(
+                "country", "open_targets", "completed_targets"
+            )
+        ])
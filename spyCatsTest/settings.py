@@ -11,7 +11,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
 from pathlib import Path
-import dj_database_url
+
+from core.database import database_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -28,6 +29,11 @@ ALLOWED_HOSTS = os.environ.get("ALLOWED_HOSTS", "127.0.0.1,localhost").split(","
 
 # Application definition
 
+# Production workers can run without the admin and/or the API docs: their apps, middleware and
+# URLs (and everything those import) are then left out, which shortens worker boot.
+ADMIN_ENABLED = os.environ.get("DJANGO_ADMIN_ENABLED", "1") == "1"
+DOCS_ENABLED = os.environ.get("DJANGO_DOCS_ENABLED", "1") == "1"
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -38,20 +44,49 @@ INSTALLED_APPS = [
     'rest_framework',
     'drf_spectacular',
     'drf_spectacular_sidecar',
+    'core',
+    'jobs',
     'cats',
     'missions',
+    'changes',
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'core.middleware.SiteMiddleware',
+]
+
+# Middleware of the admin, the API docs and static files: core.middleware.SiteMiddleware runs it for
+# every path except the API_PATH_PREFIXES (empty: for all paths, as a plain MIDDLEWARE would).
+SITE_MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+API_PATH_PREFIXES = [
+    prefix for prefix in os.environ.get("API_PATH_PREFIXES", "/cats/,/missions/,/changes/,/metrics/,/batch/").split(",")
+    if prefix
+]
+# The admin looks for its middleware in MIDDLEWARE only; it is in SITE_MIDDLEWARE.
+SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
+if not ADMIN_ENABLED:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in (
+        'django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages',
+    )]
+    SITE_MIDDLEWARE = [mw for mw in SITE_MIDDLEWARE if mw not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+    )]
+if not DOCS_ENABLED:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ('drf_spectacular', 'drf_spectacular_sidecar')]
 
 ROOT_URLCONF = 'spyCatsTest.urls'
 
@@ -75,20 +110,39 @@ WSGI_APPLICATION = 'spyCatsTest.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Connection handling (persistent / psycopg pool / PgBouncer) is driven by DB_* variables, see core/database.py.
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 if DATABASE_URL:
     DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600, ssl_require=False)
+        "default": database_config(DATABASE_URL)
     }
 else:
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": str(BASE_DIR / "db.sqlite3"),
+            # Writers queue for the lock up front instead of failing when a read upgrades to a write.
+            "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
+            # A file, not the shared in-memory database: concurrent connections wait for each
+            # other's locks there instead of failing with "database table is locked".
+            "TEST": {"NAME": str(BASE_DIR / "test_db.sqlite3")},
         }
     }
 
+# Read replicas: comma-separated URLs, exposed as replica_1, replica_2, ...
+# Safe-method requests read from them (core.middleware.ReplicaRoutingMiddleware); a client that
+# just wrote is pinned to the primary for REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(",")), start=1):
+    DATABASES[f"replica_{_index}"] = {**database_config(_url.strip()), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica_{_index}")
+
+DATABASE_ROUTERS = ["core.db_routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 5))
+# Addresses of the reverse proxies in front of the site: X-Forwarded-For is only read from requests they pass on.
+TRUSTED_PROXIES = [address.strip() for address in os.environ.get("TRUSTED_PROXIES", "").split(",") if address.strip()]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -135,18 +189,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "core.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "core.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "TEST_REQUEST_RENDERER_CLASSES": [
+        "rest_framework.renderers.MultiPartRenderer",
+        "rest_framework.renderers.JSONRenderer",
+        "core.renderers.MessagePackRenderer",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_FILTER_BACKENDS": [
         "rest_framework.filters.OrderingFilter",
     ],
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.UserRateThrottle",
-        "rest_framework.throttling.AnonRateThrottle",
+        "core.throttling.UserRateThrottle",
+        "core.throttling.AnonRateThrottle",
     ],
+    # An empty THROTTLE_*_RATE switches that limit off (e.g. for benchmarks.loadtest).
     "DEFAULT_THROTTLE_RATES": {
-        "user": "240/min",
-        "anon": "120/min",
+        "user": os.environ.get("THROTTLE_USER_RATE", "240/min") or None,
+        "anon": os.environ.get("THROTTLE_ANON_RATE", "120/min") or None,
     }
 }
 
@@ -156,6 +227,91 @@ SPECTACULAR_SETTINGS = {
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
 }
+if not DOCS_ENABLED:
+    # @extend_schema still subclasses the view schema class; DRF's own is far cheaper to import.
+    REST_FRAMEWORK["DEFAULT_SCHEMA_CLASS"] = "rest_framework.schemas.openapi.AutoSchema"
+
+# Unfiltered counts of tables at least this big come from the planner's estimate (0 = always COUNT(*)).
+COUNT_ESTIMATE_THRESHOLD = int(os.environ.get("COUNT_ESTIMATE_THRESHOLD", 100_000))
+
+# Change feed (/changes/): how long tombstones are kept.
+CHANGES_RETENTION_DAYS = int(os.environ.get("CHANGES_RETENTION_DAYS", 7))
+
+# Pub/sub behind the SSE streams (core.pubsub): LocalBroker is in-process only; PostgresBroker uses
+# LISTEN/NOTIFY so writes in any process reach the ASGI processes holding the streams.
+EVENTS_BROKER = os.environ.get("EVENTS_BROKER", "core.pubsub.LocalBroker")
+EVENTS_KEEPALIVE_SECONDS = float(os.environ.get("EVENTS_KEEPALIVE_SECONDS", 15))
+
+# Background tasks (jobs.queue, manage.py run_worker): a task running longer than JOBS_TIMEOUT is
+# considered lost and claimed again; failures retry after JOBS_BACKOFF * 2**n seconds (capped).
+JOBS_TIMEOUT = int(os.environ.get("JOBS_TIMEOUT", 600))
+JOBS_BACKOFF = float(os.environ.get("JOBS_BACKOFF", 5))
+JOBS_MAX_BACKOFF = float(os.environ.get("JOBS_MAX_BACKOFF", 3600))
+JOBS_RETENTION_SECONDS = int(os.environ.get("JOBS_RETENTION_SECONDS", 86400))
+JOBS_METRICS_WINDOW = float(os.environ.get("JOBS_METRICS_WINDOW", 300))
+# /metrics/ answers requests with "Authorization: Bearer <METRICS_TOKEN>" only (empty = 404 for all).
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# manage.py archive_missions moves missions completed this many days ago out of the live tables.
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", 90))
+
+# Local copy of TheCatAPI breeds (cats.breeds).
+BREEDS_REFRESH_SECONDS = int(os.environ.get("BREEDS_REFRESH_SECONDS", 86400))
+BREEDS_API_URL = os.environ.get("BREEDS_API_URL", "https://api.thecatapi.com/v1/breeds")
+BREEDS_API_TIMEOUT = float(os.environ.get("BREEDS_API_TIMEOUT", 10))
+
+# Idempotency-Key (core.idempotency): responses are replayed for IDEMPOTENCY_TTL seconds; a repeat
+# waits up to IDEMPOTENCY_LOCK_SECONDS for the first request. The store is a database cache table
+# (manage.py createcachetable) holding at most IDEMPOTENCY_MAX_ENTRIES responses.
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", 86400))
+IDEMPOTENCY_LOCK_SECONDS = float(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", 30))
+
+# The default cache holds replica pins, cat dashboards and cached cats/missions: per process unless
+# CACHE_BACKEND points at a shared one (e.g. django.core.cache.backends.redis.RedisCache with CACHE_LOCATION).
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    },
+    "idempotency": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "idempotency_responses",
+        "TIMEOUT": IDEMPOTENCY_TTL,
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 100_000))},
+    },
+}
+# Whether every process serving the site sees the same default cache. What one process drops there has to be
+# gone for all of them, so dashboards and cached cats/missions are only cached, and replica pins only kept by
+# client address, when it is. A per-process cache (LocMemCache) counts only for a site run as a single
+# process: set CACHE_SHARED=1 for that.
+CACHE_SHARED = os.environ.get(
+    "CACHE_SHARED", "0" if CACHES["default"]["BACKEND"].endswith((".LocMemCache", ".DummyCache")) else "1"
+) == "1"
+
+# Single cats/missions by primary key (core.objectcache): a per-process LRU of OBJECT_CACHE_L1_SIZE rows in
+# front of the default cache (OBJECT_CACHE_SECONDS, 0 = off; off unless CACHE_SHARED); other processes'
+# writes reach the LRU within OBJECT_CACHE_L1_CHECK_SECONDS.
+OBJECT_CACHE_MODELS = ["cats.SpyCat", "missions.Mission"]
+OBJECT_CACHE_SECONDS = int(os.environ.get("OBJECT_CACHE_SECONDS", 300))
+OBJECT_CACHE_L1_SIZE = int(os.environ.get("OBJECT_CACHE_L1_SIZE", 10_000))
+OBJECT_CACHE_L1_CHECK_SECONDS = float(os.environ.get("OBJECT_CACHE_L1_CHECK_SECONDS", 1))
+
+# GET /cats/<id>/dashboard/ keeps a built dashboard this long (it is dropped on any change anyway).
+DASHBOARD_CACHE_SECONDS = int(os.environ.get("DASHBOARD_CACHE_SECONDS", 300))
+
+# POST /batch/ (core.batch) runs at most this many operations per request.
+BATCH_MAX_OPERATIONS = int(os.environ.get("BATCH_MAX_OPERATIONS", 20))
+
+# Request profiling (core.profiling), off unless PROFILING_DIR is set: requests with an X-Profile
+# header from manage.py profile_token (valid PROFILING_TOKEN_MAX_AGE seconds) and a PROFILING_SAMPLE_RATE
+# share of all requests are profiled; the newest PROFILING_MAX_FILES profiles are kept.
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_MAX_FILES = int(os.environ.get("PROFILING_MAX_FILES", 200))
+PROFILING_TOKEN_MAX_AGE = int(os.environ.get("PROFILING_TOKEN_MAX_AGE", 3600))
+
+# Pre-built schema served by api/schema/ (manage.py build_schema / check_schema).
+OPENAPI_SCHEMA_FILE = BASE_DIR / "openapi-schema.json"
 
 LOGGING = {
     "version": 1,
@@ -1,12 +1,35 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+
+from core.batch import BatchView
+from jobs.views import metrics
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path("api/schema/swagger/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
-    path("api/schema/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
     path('cats/', include('cats.urls')),
     path('missions/', include('missions.urls')),
+    path('changes/', include('changes.urls')),
+    path('metrics/', metrics, name='metrics'),
+    path('batch/', BatchView.as_view(), name='batch'),
 ]
+
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    from core.profiling_views import profile_detail, profile_list
+
+    urlpatterns += [
+        path('admin/profiles/', profile_list, name='profiles'),
+        path('admin/profiles/<str:name>/', profile_detail, name='profile'),
+        path('admin/', admin.site.urls),
+    ]
+
+if settings.DOCS_ENABLED:
+    from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
+
+    from core.schema import CachedSpectacularAPIView
+
+    urlpatterns += [
+        path("api/schema/", CachedSpectacularAPIView.as_view(), name="schema"),
+        path("api/schema/swagger/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
+        path("api/schema/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
+    ]